@@ -0,0 +1,98 @@
+"""Загрузка книги из файла в БД
+
+Пример:
+    python -m book_import "War and Peace.fb2" --user alice
+"""
+
+import argparse
+import asyncio
+import os
+import posixpath
+import sys
+
+import anyio
+
+from book_import import importer, readers
+from db import users
+from paragraph_store import store as paragraph_store
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        prog="python -m book_import",
+        description="Загрузка книги (.txt/.fb2/.epub) для пользователя",
+    )
+    parser.add_argument("path", help="путь к файлу книги")
+    parser.add_argument("--user", required=True, help="имя пользователя")
+    parser.add_argument(
+        "--name", help="название книги (по умолчанию - имя файла)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="число процессов для разбиения на предложения",
+    )
+    return parser.parse_args()
+
+
+def _print_progress(progress, final=False):
+    percent = (
+        f"{progress.bytes_read * 100 / progress.bytes_total:5.1f}% "
+        if progress.bytes_total
+        else ""
+    )
+    print(
+        f"\r{percent}paragraphs: {progress.paragraphs} "
+        f"sentences: {progress.sentences}",
+        end="\n" if final else "",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+async def _run(args) -> int:
+    # main импортируется здесь, чтобы --help работал без настройки БД
+    from main import SessionLocal
+
+    fmt = readers.detect_format(args.path)
+    book_name = args.name or posixpath.splitext(os.path.basename(args.path))[0]
+    async with SessionLocal() as db:
+        user_id = await users.aget_user_id(db, args.user)
+    if not user_id:
+        print(f"Пользователь '{args.user}' не найден", file=sys.stderr)
+        return 1
+
+    importer.get_pool(args.workers)
+    try:
+        async with SessionLocal() as db:
+            async with await anyio.open_file(args.path, "rb") as f:
+                progress = None
+                async for progress in importer.import_book(
+                    db,
+                    f.wrapped,
+                    fmt,
+                    book_name=book_name,
+                    user_id=user_id,
+                    bytes_total=(await anyio.Path(args.path).stat()).st_size,
+                ):
+                    _print_progress(progress)
+            # как и /api/books/import: книга без предложений не загружается
+            if progress is None or not progress.sentences:
+                await db.rollback()
+            else:
+                await db.commit()
+                await paragraph_store.export_book(db, progress.id_book)
+    finally:
+        importer.shutdown_pool()
+
+    if progress is None or not progress.sentences:
+        print("В книге нет предложений, ничего не загружено", file=sys.stderr)
+        return 1
+    _print_progress(progress, final=True)
+    print(f"id_book: {progress.id_book}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_run(_parse_args())))
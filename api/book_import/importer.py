@@ -0,0 +1,125 @@
+import asyncio
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import AsyncIterator, BinaryIO, Optional
+
+import anyio
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from book_import import readers, segmenter
+from db import books, dto
+
+# Абзацев в одной задаче для пула процессов
+PARAGRAPHS_PER_TASK = 500
+# Предложений в одной пачке COPY
+COPY_BATCH_SIZE = 20_000
+# Процессов в пуле по умолчанию; пул создаётся в каждом воркере uvicorn,
+# поэтому по умолчанию он небольшой
+IMPORT_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+
+
+def get_pool(max_workers: int = IMPORT_WORKERS) -> ProcessPoolExecutor:
+    """Пул процессов для сегментации, создаётся при первом импорте"""
+    global _pool, _pool_workers
+    if _pool is None:
+        # spawn: воркеры не наследуют потоки и соединения приложения
+        _pool = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        _pool_workers = max_workers
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+async def import_book(
+    db: AsyncSession,
+    f: BinaryIO,
+    fmt: str,
+    book_name: str,
+    user_id: int,
+    bytes_total: Optional[int] = None,
+) -> AsyncIterator[dto.BookImportProgress]:
+    """Потоково загружает книгу в текущей транзакции сессии
+
+    Файл читается пачками абзацев, пачки разбиваются на предложения в пуле
+    процессов, предложения пишутся в sentences через COPY. В памяти
+    одновременно находится не больше нескольких пачек, поэтому расход памяти
+    не зависит от размера книги. После каждой записанной пачки отдаёт
+    текущий прогресс; фиксация транзакции - на вызывающей стороне.
+    Прочитанные байты сообщаются только для форматов, читаемых подряд
+    (readers.SEQUENTIAL_FORMATS), для остальных bytes_total - None.
+    """
+    if fmt not in readers.SEQUENTIAL_FORMATS:
+        bytes_total = None
+    pool = get_pool()
+    loop = asyncio.get_running_loop()
+    paragraphs = readers.iter_paragraphs(f, fmt)
+
+    def _next_batch() -> list[str]:
+        return list(islice(paragraphs, PARAGRAPHS_PER_TASK))
+
+    id_book = await books.create_book_for_import(db, user_id, book_name)
+    progress = dto.BookImportProgress(id_book=id_book, bytes_total=bytes_total)
+
+    pending: deque[asyncio.Future] = deque()
+    rows: list[tuple[str, int, int, list[str], list[int]]] = []
+    id_paragraph = 0
+    exhausted = False
+    try:
+        while True:
+            # держим пул занятым, но не читаем файл дальше, чем нужно
+            while not exhausted and len(pending) < _pool_workers * 2:
+                batch = await anyio.to_thread.run_sync(_next_batch)
+                if not batch:
+                    exhausted = True
+                    break
+                pending.append(
+                    loop.run_in_executor(
+                        pool, segmenter.segment_paragraphs, batch
+                    )
+                )
+            if not pending:
+                break
+
+            for sentences in await pending.popleft():
+                if not sentences:
+                    continue
+                id_paragraph += 1
+                rows.extend(
+                    (sentence, id_book, id_paragraph, tokens, starts)
+                    for sentence, tokens, starts in sentences
+                )
+
+            if len(rows) >= COPY_BATCH_SIZE or (exhausted and not pending):
+                if rows:
+                    await books.copy_sentences(db, rows)
+                progress.sentences += len(rows)
+                progress.paragraphs = id_paragraph
+                if bytes_total:
+                    progress.bytes_read = f.tell()
+                rows = []
+                yield progress.model_copy()
+    finally:
+        for future in pending:
+            future.cancel()
+        paragraphs.close()
+
+    await books.finish_book_import(
+        db,
+        id_book=id_book,
+        max_paragraph=id_paragraph,
+        sentences_count=progress.sentences,
+    )
@@ -0,0 +1,179 @@
+import io
+import posixpath
+import zipfile
+from html.parser import HTMLParser
+from typing import BinaryIO, Iterator
+from xml.etree import ElementTree
+
+SUPPORTED_FORMATS = ("txt", "fb2", "epub")
+# Форматы, которые читаются подряд: позиция в файле отражает прогресс
+# (epub - zip-архив, его части читаются вразброс)
+SEQUENTIAL_FORMATS = ("txt", "fb2")
+
+_CHUNK_SIZE = 64 * 1024
+
+
+def detect_format(file_name: str) -> str:
+    """Определяет формат книги по расширению файла"""
+    ext = posixpath.splitext(file_name or "")[1].lower().lstrip(".")
+    if ext not in SUPPORTED_FORMATS:
+        raise ValueError(
+            f"Unsupported book format '{ext}', "
+            f"expected one of: {', '.join(SUPPORTED_FORMATS)}"
+        )
+    return ext
+
+
+def iter_paragraphs(f: BinaryIO, fmt: str) -> Iterator[str]:
+    """Потоково читает абзацы книги из бинарного файла"""
+    if fmt == "txt":
+        return iter_txt_paragraphs(f)
+    if fmt == "fb2":
+        return iter_fb2_paragraphs(f)
+    if fmt == "epub":
+        return iter_epub_paragraphs(f)
+    raise ValueError(f"Unsupported book format '{fmt}'")
+
+
+def iter_txt_paragraphs(f: BinaryIO) -> Iterator[str]:
+    """Абзацы txt разделены пустой строкой или начинаются с отступа"""
+    text = io.TextIOWrapper(f, encoding="utf-8-sig", errors="replace")
+    lines: list[str] = []
+    try:
+        for line in text:
+            if not line.strip():
+                if lines:
+                    yield " ".join(lines)
+                    lines = []
+                continue
+            if lines and line.startswith(("\t", "  ")):
+                yield " ".join(lines)
+                lines = []
+            lines.append(line.strip())
+        if lines:
+            yield " ".join(lines)
+    finally:
+        # файл закрывает вызывающая сторона
+        text.detach()
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def iter_fb2_paragraphs(f: BinaryIO) -> Iterator[str]:
+    """Абзацы <p> из основного <body> fb2 (примечания пропускаются)
+
+    Разобранные элементы сразу очищаются, поэтому память не растёт
+    с размером книги.
+    """
+    in_body = 0
+    skip_body = False
+    for event, elem in ElementTree.iterparse(f, events=("start", "end")):
+        name = _local_name(elem.tag)
+        if event == "start":
+            if name == "body":
+                in_body += 1
+                skip_body = elem.get("name") == "notes"
+            continue
+
+        if name == "body":
+            in_body -= 1
+            skip_body = False
+            elem.clear()
+        elif name == "p":
+            if in_body and not skip_body:
+                paragraph = "".join(elem.itertext()).strip()
+                if paragraph:
+                    yield paragraph
+            elem.clear()
+        elif name in ("section", "binary", "description"):
+            elem.clear()
+
+
+class _EpubTextParser(HTMLParser):
+    """Собирает текст блочных элементов XHTML-документа epub"""
+
+    BLOCK_TAGS = frozenset({"p", "h1", "h2", "h3", "h4", "h5", "h6", "li"})
+    SKIP_TAGS = frozenset({"script", "style", "head"})
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.paragraphs: list[str] = []
+        self._parts: list[str] = []
+        self._in_block = False
+        self._skip = 0
+
+    def _flush(self):
+        paragraph = "".join(self._parts).strip()
+        if paragraph:
+            self.paragraphs.append(paragraph)
+        self._parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip += 1
+        elif tag in self.BLOCK_TAGS:
+            if self._in_block:
+                self._flush()
+            self._in_block = True
+        elif tag == "br" and self._in_block:
+            self._parts.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in self.BLOCK_TAGS and self._in_block:
+            self._flush()
+            self._in_block = False
+
+    def handle_data(self, data):
+        if self._in_block and not self._skip:
+            self._parts.append(data)
+
+    def close(self):
+        super().close()
+        if self._in_block:
+            self._flush()
+            self._in_block = False
+
+
+def _epub_spine(book: zipfile.ZipFile) -> list[str]:
+    """Пути XHTML-документов epub в порядке чтения (spine)"""
+    container = ElementTree.fromstring(book.read("META-INF/container.xml"))
+    rootfile = next(
+        elem.get("full-path")
+        for elem in container.iter()
+        if _local_name(elem.tag) == "rootfile"
+    )
+    opf = ElementTree.fromstring(book.read(rootfile))
+    base = posixpath.dirname(rootfile)
+
+    manifest = {}
+    spine = []
+    for elem in opf.iter():
+        name = _local_name(elem.tag)
+        if name == "item":
+            manifest[elem.get("id")] = elem.get("href")
+        elif name == "itemref":
+            spine.append(elem.get("idref"))
+    return [
+        posixpath.normpath(posixpath.join(base, manifest[idref]))
+        for idref in spine
+        if idref in manifest
+    ]
+
+
+def iter_epub_paragraphs(f: BinaryIO) -> Iterator[str]:
+    """Абзацы epub по документам spine, каждый документ читается потоком"""
+    with zipfile.ZipFile(f) as book:
+        for path in _epub_spine(book):
+            parser = _EpubTextParser()
+            with book.open(path) as doc:
+                text = io.TextIOWrapper(doc, encoding="utf-8", errors="replace")
+                while chunk := text.read(_CHUNK_SIZE):
+                    parser.feed(chunk)
+                    yield from parser.paragraphs
+                    parser.paragraphs.clear()
+            parser.close()
+            yield from parser.paragraphs
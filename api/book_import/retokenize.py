@@ -0,0 +1,99 @@
+"""Заполнение токенов предложений книг, загруженных до их появления
+
+Примеры:
+    python -m book_import.retokenize 12 15
+    python -m book_import.retokenize --all
+"""
+
+import argparse
+import asyncio
+import sys
+
+from sqlalchemy import select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from book_import.segmenter import sentence_tokens
+from db import models
+
+# Предложений в одной пачке UPDATE
+BATCH_SIZE = 5_000
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        prog="python -m book_import.retokenize",
+        description="Заполнение sentences.tokens для уже загруженных книг",
+    )
+    parser.add_argument("id_book", nargs="*", type=int, help="id книг")
+    parser.add_argument(
+        "--all", action="store_true", help="все книги без токенов"
+    )
+    args = parser.parse_args()
+    if not args.id_book and not args.all:
+        parser.error("укажите id книг или --all")
+    return args
+
+
+async def retokenize_book(db: AsyncSession, id_book: int) -> int:
+    """Считает токены предложений книги, у которых их нет, и фиксирует"""
+    total = 0
+    after = 0
+    while True:
+        rows = (
+            await db.execute(
+                select(models.Sentence.id_sentence, models.Sentence.sentence)
+                .where(models.Sentence.id_book == id_book)
+                .where(models.Sentence.tokens.is_(None))
+                .where(models.Sentence.id_sentence > after)
+                .order_by(models.Sentence.id_sentence)
+                .limit(BATCH_SIZE)
+            )
+        ).all()
+        if not rows:
+            return total
+        params = []
+        for id_sentence, sentence in rows:
+            tokens, starts = sentence_tokens(sentence)
+            params.append(
+                {
+                    "id_sentence": id_sentence,
+                    "tokens": tokens,
+                    "token_starts": starts,
+                }
+            )
+        # число предложений и абзацев не меняется, пересчёт не нужен
+        await db.execute(
+            text("SET LOCAL language_helper.skip_book_stats = 'on'")
+        )
+        await db.execute(update(models.Sentence), params)
+        await db.commit()
+        total += len(rows)
+        after = rows[-1][0]
+
+
+async def _run(args) -> int:
+    # main импортируется здесь, чтобы --help работал без настройки БД
+    from main import SessionLocal
+
+    async with SessionLocal() as db:
+        ids = args.id_book
+        if args.all:
+            ids = (
+                (
+                    await db.execute(
+                        select(models.Sentence.id_book)
+                        .where(models.Sentence.tokens.is_(None))
+                        .distinct()
+                    )
+                )
+                .scalars()
+                .all()
+            )
+        for id_book in ids:
+            count = await retokenize_book(db, id_book)
+            print(f"{id_book}: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_run(_parse_args())))
@@ -0,0 +1,106 @@
+import re
+
+# Конец предложения: знаки препинания, за ними закрывающие кавычки/скобки,
+# пробел и начало следующего предложения (заглавная буква, цифра, тире,
+# открывающая кавычка)
+_SENTENCE_END = re.compile(
+    r"[.!?…]+[\"'»”’)\]]*\s+(?=[\"'«“(\[]?[A-ZА-ЯЁ0-9—–-])"
+)
+_WORD_BEFORE = re.compile(r"(\S+?)[.!?…]+[\"'»”’)\]]*\s*$")
+_SPACES = re.compile(r"\s+")
+# Токен текста для сопоставления со словарём пользователя (db.vocabulary)
+TOKEN_RE = re.compile(r"\b[\w'-]+\b")
+
+# Сокращения, после которых точка не завершает предложение
+ABBREVIATIONS = frozenset(
+    {
+        "mr",
+        "mrs",
+        "ms",
+        "dr",
+        "st",
+        "sr",
+        "jr",
+        "prof",
+        "rev",
+        "hon",
+        "gen",
+        "col",
+        "capt",
+        "lt",
+        "sgt",
+        "mt",
+        "no",
+        "vol",
+        "fig",
+        "vs",
+        "etc",
+        "e.g",
+        "i.e",
+    }
+)
+
+
+def _is_abbreviation(chunk: str) -> bool:
+    match = _WORD_BEFORE.search(chunk)
+    if not match:
+        return False
+    word = match.group(1).lstrip("\"'«“([").lower()
+    # инициалы вида "J." тоже не разрывают предложение
+    return word in ABBREVIATIONS or (len(word) == 1 and word.isalpha())
+
+
+def split_sentences(paragraph: str) -> list[str]:
+    """Разбивает абзац на предложения
+
+    Простая эвристика по знакам конца предложения с учётом сокращений
+    и инициалов, без внешних зависимостей.
+    """
+    text = _SPACES.sub(" ", paragraph).strip()
+    if not text:
+        return []
+
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        end = match.end()
+        if _is_abbreviation(text[start:end]):
+            continue
+        sentence = text[start:end].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = end
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+
+def sentence_tokens(sentence: str) -> tuple[list[str], list[int]]:
+    """Токены предложения в нижнем регистре и их смещения в символах"""
+    tokens = []
+    starts = []
+    for match in TOKEN_RE.finditer(sentence):
+        tokens.append(match.group().lower())
+        starts.append(match.start())
+    return tokens, starts
+
+
+def split_paragraphs(paragraphs: list[str]) -> list[list[str]]:
+    """Разбивает пачку абзацев на предложения
+
+    Выполняется в процессе пула, поэтому принимает и возвращает пачку
+    целиком - так на межпроцессную передачу приходится меньше накладных
+    расходов.
+    """
+    return [split_sentences(paragraph) for paragraph in paragraphs]
+
+
+def segment_paragraphs(
+    paragraphs: list[str],
+) -> list[list[tuple[str, list[str], list[int]]]]:
+    """Как split_paragraphs, но с токенами каждого предложения"""
+    return [
+        [(sentence, *sentence_tokens(sentence)) for sentence in sentences]
+        for sentences in split_paragraphs(paragraphs)
+    ]
@@ -1,153 +1,401 @@
-from datetime import datetime
+import html
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
 
-from sqlalchemy import desc, select, func, update
+from sqlalchemy import case, desc, select, func, update, insert, text
 from sqlalchemy.orm import noload
-from sqlalchemy.ext.asyncio import AsyncSession
-from db import models, users, dto
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from book_import.segmenter import sentence_tokens
+from db import models, dto, reading_buffer, paragraph_cache, vocabulary
+from paragraph_store import store as paragraph_store
 
+logger = logging.getLogger(__name__)
 
-async def Get_Max_Paragraph_Number_By_Book(
-    db: AsyncSession, user_name: str, id_book: int
-):
-    user_id = await users.aget_user_id(db, user_name)
-    res = await db.execute(
-        select(models.Sentence.id_paragraph)
-        .join(models.Book, models.Sentence.id_book == models.Book.id_book)
-        .where(models.Book.user_id == user_id)
-        .where(models.Book.id_book == id_book)
-        .order_by(desc(models.Sentence.id_paragraph))
-        .limit(1)
-    )
-    row = res.first()
-    return row[0] if row else None
 
+def _books_with_stats_stmt(user_id: int, id_book: Optional[int] = None):
+    """Запрос книг пользователя со статистикой чтения
 
-async def Get_Min_Paragraph_Number_By_Book(
-    db: AsyncSession, user_name: str, id_book: int
-):
-    user_id = await users.aget_user_id(db, user_name)
-    res = await db.execute(
-        select(models.Sentence.id_paragraph)
-        .join(models.Book, models.Sentence.id_book == models.Book.id_book)
-        .where(models.Book.user_id == user_id)
-        .where(models.Book.id_book == id_book)
-        .order_by(models.Sentence.id_paragraph)
-        .limit(1)
+    Границы абзацев берутся из материализованных полей books, поэтому
+    стоимость запроса зависит от числа книг, а не предложений.
+    """
+    # Paragraphs read in the last 24 hours for each book, summed over
+    # hourly buckets of reading_activity (at most 24 rows per book)
+    now = datetime.utcnow()
+    since = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=23)
+    paragraphs_last_24h = select(
+        models.ReadingActivity.id_book,
+        (
+            func.max(models.ReadingActivity.max_paragraph)
+            - func.min(models.ReadingActivity.min_paragraph)
+        ).label("paragraphs_read_24h"),
+        func.min(models.ReadingActivity.min_paragraph).label("read_from"),
+        func.max(models.ReadingActivity.max_paragraph).label("read_to"),
+    ).where(
+        models.ReadingActivity.user_id == user_id,
+        models.ReadingActivity.hour >= since,
     )
-    row = res.first()
-    return row[0] if row else None
-
-
-async def get_user_books_with_stats(
-    db: AsyncSession, user_name: str
-) -> list[dto.BookWithStatsDTO]:
-    from datetime import datetime, timedelta
-
-    # Subquery to count paragraphs read in the last 24 hours for each book
-    last_24h = datetime.utcnow() - timedelta(hours=24)
-    paragraphs_last_24h = (
-        select(
-            models.ReadingJournal.id_book,
-            (
-                func.max(models.ReadingJournal.id_paragraph)
-                - func.min(models.ReadingJournal.id_paragraph)
-            ).label("paragraphs_read_24h"),
+    if id_book is not None:
+        paragraphs_last_24h = paragraphs_last_24h.where(
+            models.ReadingActivity.id_book == id_book
         )
-        .join(models.User, models.ReadingJournal.user_id == models.User.user_id)
-        .where(
-            models.User.name == user_name, models.ReadingJournal.dt >= last_24h
-        )
-        .group_by(models.ReadingJournal.id_book)
-        .subquery()
-    )
+    paragraphs_last_24h = paragraphs_last_24h.group_by(
+        models.ReadingActivity.id_book
+    ).subquery()
 
     stmt = (
         select(
             models.Book,
-            func.min(models.Sentence.id_paragraph).label("min_p"),
-            func.max(models.Sentence.id_paragraph).label("max_p"),
             func.coalesce(paragraphs_last_24h.c.paragraphs_read_24h, 0).label(
                 "paragraphs_read_24h"
             ),
+            paragraphs_last_24h.c.read_from,
+            paragraphs_last_24h.c.read_to,
         )
-        .join(models.User, models.Book.user_id == models.User.user_id)
-        .outerjoin(
-            models.Sentence, models.Book.id_book == models.Sentence.id_book
-        )
+        .options(noload("*"))
         .outerjoin(
             paragraphs_last_24h,
             models.Book.id_book == paragraphs_last_24h.c.id_book,
         )
-        .where(models.User.name == user_name)
-        .group_by(
-            models.Book.id_book, paragraphs_last_24h.c.paragraphs_read_24h
-        )
+        .where(models.Book.user_id == user_id)
     )
+    if id_book is not None:
+        stmt = stmt.where(models.Book.id_book == id_book)
+    return stmt
+
 
-    results = (await db.execute(stmt)).all()
+def _with_stats(book: models.Book, paragraphs_read_24h: Optional[int]):
+    book.Min_Paragraph_Number = book.min_paragraph
+    book.Max_Paragraph_Number = book.max_paragraph
+    book.paragraphs_read_24h = paragraphs_read_24h or 0
+    return book
+
+
+async def get_user_books_with_stats(
+    db: AsyncSession, user_id: int
+) -> list[dto.BookWithStatsDTO]:
+    results = (await db.execute(_books_with_stats_stmt(user_id))).all()
+    return [_with_stats(row[0], row.paragraphs_read_24h) for row in results]
 
-    books_processed = []
-    for row in results:
-        book = row[0]
-        book.Min_Paragraph_Number = row.min_p
-        book.Max_Paragraph_Number = row.max_p
-        book.paragraphs_read_24h = row.paragraphs_read_24h or 0
-        books_processed.append(book)
 
-    return books_processed
+def _stored_sentences(
+    id_book: int, id_paragraph: int, sentences: list[tuple[int, str]]
+) -> list[dto.SentenceDTO]:
+    return [
+        dto.SentenceDTO(
+            id_sentence=id_sentence,
+            sentence=sentence,
+            id_book=id_book,
+            id_paragraph=id_paragraph,
+        )
+        for id_sentence, sentence in sentences
+    ]
 
 
 async def get_paragraph(
     db: AsyncSession,
     id_book: int,
     id_paragraph: int,
-    user_name: str,
-):
+    user_id: int,
+) -> list[dto.SentenceDTO]:
+    paragraphs = await get_paragraphs_range(
+        db, id_book, id_paragraph, id_paragraph, user_id
+    )
+    return paragraphs[0].sentences if paragraphs else []
+
+
+async def _load_paragraphs_range(
+    db: AsyncSession, id_book: int, id_from: int, id_to: int, user_id: int
+) -> list[dto.ParagraphDTO]:
     res = await db.execute(
         select(models.Sentence)
         .join(models.Book, models.Sentence.id_book == models.Book.id_book)
-        .join(models.User, models.Book.user_id == models.User.user_id)
-        .where(models.User.name == user_name)
-        .where(models.Book.id_book == id_book)
-        .where(models.Sentence.id_paragraph == id_paragraph)
-        .order_by(models.Sentence.id_sentence)
+        .where(models.Book.user_id == user_id)
+        .where(models.Sentence.id_book == id_book)
+        .where(models.Sentence.id_paragraph.between(id_from, id_to))
+        .order_by(models.Sentence.id_paragraph, models.Sentence.id_sentence)
     )
-    return res.scalars().all()
 
+    paragraphs: list[dto.ParagraphDTO] = []
+    for sentence in res.scalars():
+        if (
+            not paragraphs
+            or paragraphs[-1].id_paragraph != sentence.id_paragraph
+        ):
+            paragraphs.append(
+                dto.ParagraphDTO(id_paragraph=sentence.id_paragraph)
+            )
+        paragraphs[-1].sentences.append(
+            dto.SentenceDTO.model_validate(sentence)
+        )
+    return paragraphs
 
-async def save_book_position(
+
+async def get_paragraphs_range(
     db: AsyncSession,
     id_book: int,
-    new_current_paragraph: int,
-    user_name: str,
-):
-    min_p = await Get_Min_Paragraph_Number_By_Book(db, user_name, id_book)
-    max_p = await Get_Max_Paragraph_Number_By_Book(db, user_name, id_book)
+    id_from: int,
+    id_to: int,
+    user_id: int,
+) -> list[dto.ParagraphDTO]:
+    """Возвращает абзацы книги с id_from по id_to включительно
+
+    Предложения сгруппированы по id_paragraph, внутри абзаца - по id_sentence.
+    Источник - файл хранилища абзацев, если книга в него выгружена, иначе
+    кэш абзацев воркера, иначе один запрос к БД.
+    """
+    stored = paragraph_store.read_paragraphs(id_book, id_from, id_to)
+    if stored is not None:
+        owner, stored_paragraphs = stored
+        if owner != user_id:
+            return []
+        return [
+            dto.ParagraphDTO(
+                id_paragraph=id_paragraph,
+                sentences=_stored_sentences(id_book, id_paragraph, sentences),
+            )
+            for id_paragraph, sentences in stored_paragraphs
+        ]
+
+    cache = paragraph_cache.cache
+    paragraphs = cache.get_window(id_book, id_from, id_to, user_id)
+    if paragraphs is None:
+        paragraphs = await _load_paragraphs_range(
+            db, id_book, id_from, id_to, user_id
+        )
+        cache.put_window(id_book, id_from, id_to, user_id, paragraphs)
+    return paragraphs
+
+
+async def prefetch_paragraphs(
+    session_factory: async_sessionmaker,
+    id_book: int,
+    id_from: int,
+    id_to: int,
+) -> None:
+    """Упреждающее чтение окна абзацев в кэш воркера
+
+    Запускается фоном после выдачи окна. Читает только книги, владелец
+    которых уже известен кэшу, и только отсутствующие в нём окна.
+    """
+    if paragraph_store.open_book(id_book) is not None:
+        return
+    cache = paragraph_cache.cache
+    user_id = cache.owner(id_book)
     if (
-        min_p is not None
-        and max_p is not None
-        and (min_p <= new_current_paragraph <= max_p)
+        user_id is None
+        or cache.has_window(id_book, id_from, id_to)
+        or not cache.start_prefetch(id_book, id_from)
     ):
-        await db.execute(
-            update(models.Book)
-            .where(models.Book.id_book == id_book)
-            .values(
-                current_paragraph=new_current_paragraph, dt=datetime.utcnow()
+        return
+    try:
+        async with session_factory() as db:
+            paragraphs = await _load_paragraphs_range(
+                db, id_book, id_from, id_to, user_id
             )
+        cache.put_window(id_book, id_from, id_to, user_id, paragraphs)
+    except Exception:
+        logger.exception(
+            "Failed to prefetch book %s paragraphs %s-%s",
+            id_book,
+            id_from,
+            id_to,
         )
-        user_id = await users.aget_user_id(db, user_name)
-        await save_book_read_event(db, user_id, id_book, new_current_paragraph)
+    finally:
+        cache.finish_prefetch(id_book, id_from)
+
+
+async def get_study_words(
+    db: AsyncSession, id_book: int, id_from: int, id_to: int, user_id: int
+) -> list[dto.StudyWordHit]:
+    """Слова на изучении в окне абзацев [id_from, id_to] со смещениями
+
+    Токены предложений посчитаны при загрузке книги, поэтому из БД
+    читаются только массивы токенов, а сопоставление идёт по
+    скомпилированному словарю пользователя. Текст читается только для
+    предложений без токенов (книги, загруженные до их появления).
+    """
+    matcher = await vocabulary.get_matcher(db, user_id)
+    if not matcher:
+        return []
+    res = await db.execute(
+        select(
+            models.Sentence.id_paragraph,
+            models.Sentence.id_sentence,
+            models.Sentence.tokens,
+            models.Sentence.token_starts,
+            case((models.Sentence.tokens.is_(None), models.Sentence.sentence)),
+        )
+        .join(models.Book, models.Sentence.id_book == models.Book.id_book)
+        .where(models.Book.user_id == user_id)
+        .where(models.Sentence.id_book == id_book)
+        .where(models.Sentence.id_paragraph.between(id_from, id_to))
+        .order_by(models.Sentence.id_paragraph, models.Sentence.id_sentence)
+    )
+    hits = []
+    for id_paragraph, id_sentence, tokens, starts, sentence in res:
+        if tokens is None:
+            tokens, starts = sentence_tokens(sentence)
+        for start, end, syllable in matcher.find(tokens, starts):
+            hits.append(
+                dto.StudyWordHit(
+                    id_paragraph=id_paragraph,
+                    id_sentence=id_sentence,
+                    start=start,
+                    end=end,
+                    syllable_id=syllable.syllable_id,
+                    word=syllable.word,
+                    transcription=syllable.transcription,
+                    translations=syllable.translations,
+                )
+            )
+    return hits
+
+
+async def get_window_tokens(
+    db: AsyncSession, id_book: int, id_from: int, id_to: int, user_id: int
+) -> set[str]:
+    """Уникальные токены окна абзацев [id_from, id_to] книги пользователя
+
+    Токены берутся из файла хранилища абзацев, если книга в него
+    выгружена, иначе из посчитанных при загрузке массивов токенов.
+    """
+    tokens: set[str] = set()
+    stored = paragraph_store.read_paragraphs(id_book, id_from, id_to)
+    if stored is not None:
+        owner, paragraphs = stored
+        if owner == user_id:
+            for _, sentences in paragraphs:
+                for _, sentence in sentences:
+                    tokens.update(sentence_tokens(sentence)[0])
+        return tokens
+    res = await db.execute(
+        select(
+            models.Sentence.tokens,
+            case((models.Sentence.tokens.is_(None), models.Sentence.sentence)),
+        )
+        .join(models.Book, models.Sentence.id_book == models.Book.id_book)
+        .where(models.Book.user_id == user_id)
+        .where(models.Sentence.id_book == id_book)
+        .where(models.Sentence.id_paragraph.between(id_from, id_to))
+    )
+    for stored, sentence in res:
+        tokens.update(
+            stored if stored is not None else sentence_tokens(sentence)[0]
+        )
+    return tokens
+
+
+# Границы найденных слов в ts_headline: управляющие символы, которых нет в
+# тексте книг, - текст экранируется, а затем они заменяются на <mark>
+_MARK_START = "\x02"
+_MARK_STOP = "\x03"
+_HEADLINE_OPTIONS = (
+    f"StartSel={_MARK_START}, StopSel={_MARK_STOP}, MaxWords=35, MinWords=15"
+)
+
+
+def _highlight(snippet: str) -> str:
+    """HTML фрагмента: текст книги экранирован, найденное - в <mark>"""
+    return (
+        html.escape(snippet)
+        .replace(_MARK_START, "<mark>")
+        .replace(_MARK_STOP, "</mark>")
+    )
+
+
+async def search_sentences(
+    db: AsyncSession,
+    user_id: int,
+    query: str,
+    id_book: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: int = 20,
+) -> dto.BookSearchResult:
+    """Полнотекстовый поиск по предложениям книг пользователя
+
+    Использует GIN-индекс ix_sentences_fts. Результаты идут в порядке
+    текста (по id_sentence), пагинация - по курсору after (id_sentence
+    последнего найденного предложения), без OFFSET.
+    """
+    ts_query = func.websearch_to_tsquery(models.SENTENCE_SEARCH_CONFIG, query)
+    stmt = (
+        select(
+            models.Sentence.id_book,
+            models.Book.book_name,
+            models.Sentence.id_paragraph,
+            models.Sentence.id_sentence,
+            func.ts_headline(
+                models.SENTENCE_SEARCH_CONFIG,
+                models.Sentence.sentence,
+                ts_query,
+                _HEADLINE_OPTIONS,
+            ).label("snippet"),
+        )
+        .join(models.Book, models.Sentence.id_book == models.Book.id_book)
+        .where(models.Book.user_id == user_id)
+        .where(models.sentence_tsvector.bool_op("@@")(ts_query))
+    )
+    if id_book is not None:
+        stmt = stmt.where(models.Sentence.id_book == id_book)
+    if after is not None:
+        stmt = stmt.where(models.Sentence.id_sentence > after)
+    stmt = stmt.order_by(models.Sentence.id_sentence).limit(limit + 1)
+
+    rows = (await db.execute(stmt)).all()
+    items = [
+        dto.BookSearchHit.model_validate(
+            {**row._mapping, "snippet": _highlight(row.snippet)}
+        )
+        for row in rows
+    ]
+    next_after = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_after = items[-1].id_sentence
+    return dto.BookSearchResult(items=items, next_after=next_after)
+
+
+async def save_book_position(
+    id_book: int,
+    new_current_paragraph: int,
+    user_id: int,
+):
+    """Запоминает позицию чтения в буфере отложенной записи
+
+    Проверка владельца книги и границ абзацев выполняется при сбросе
+    буфера (см. reading_buffer), в пути запроса к БД не обращается.
+    """
+    reading_buffer.buffer.record(user_id, id_book, new_current_paragraph)
 
 
 async def get_book(
-    db: AsyncSession, id_book: int, user_name: str
-) -> dto.BookWithStatsDTO:
-    books_list = await get_user_books_with_stats(db, user_name)
-    return next(filter(lambda x: x.id_book == id_book, books_list), None)
+    db: AsyncSession, id_book: int, user_id: int
+) -> Optional[dto.BookWithStatsDTO]:
+    row = (await db.execute(_books_with_stats_stmt(user_id, id_book))).first()
+    if row is None:
+        return None
+    book = _with_stats(row[0], row.paragraphs_read_24h)
+    pending = reading_buffer.buffer.pending(user_id, id_book)
+    if pending is None:
+        return book
 
+    # позиция и события, ещё не сброшенные буфером этого воркера; абзацы
+    # вне границ книги буфер при записи отбросит, здесь они тоже не в счёт
+    position, paragraphs = pending
+    low, high = book.min_paragraph, book.max_paragraph
+    if low is None or not low <= position <= high:
+        return book
+    db.expunge(book)
+    book.current_paragraph = position
+    read = [p for p in paragraphs if low <= p <= high]
+    read += [p for p in (row.read_from, row.read_to) if p is not None]
+    if read:
+        book.paragraphs_read_24h = max(read) - min(read)
+    return book
 
-async def last_opened_book(db: AsyncSession, user_name: str):
-    user_id = await users.aget_user_id(db, user_name)
+
+async def last_opened_book(db: AsyncSession, user_id: int):
     res = await db.execute(
         select(models.Book)
         .options(noload("*"))
@@ -158,15 +406,69 @@ async def last_opened_book(db: AsyncSession, user_name: str):
     return res.scalar_one_or_none()
 
 
-async def save_book_read_event(
-    db: AsyncSession, id_user, id_book, id_paragraph
-):
-    db.add(
-        models.ReadingJournal(
-            user_id=id_user,
-            id_book=id_book,
-            id_paragraph=id_paragraph,
-            dt=datetime.utcnow(),
+# ----- Bulk import -----
+async def create_book_for_import(
+    db: AsyncSession, user_id: int, book_name: str
+) -> int:
+    """Создаёт пустую книгу для массовой загрузки и возвращает её id
+
+    В рамках текущей транзакции отключает пересчёт статистики триггером
+    на sentences - её выставляет finish_book_import.
+    """
+    await db.execute(text("SET LOCAL language_helper.skip_book_stats = 'on'"))
+    id_book = (
+        await db.execute(
+            insert(models.Book)
+            .values(
+                book_name=book_name,
+                user_id=user_id,
+                current_paragraph=1,
+                dt=datetime.utcnow(),
+            )
+            .returning(models.Book.id_book)
+        )
+    ).scalar_one()
+    return id_book
+
+
+async def copy_sentences(
+    db: AsyncSession, rows: list[tuple[str, int, int, list[str], list[int]]]
+) -> None:
+    """Записывает пачку предложений через COPY
+
+    Строка - (sentence, id_book, id_paragraph, tokens, token_starts).
+
+    Использует asyncpg-соединение сессии, поэтому COPY идёт в той же
+    транзакции, что и создание книги.
+    """
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        models.Sentence.__tablename__,
+        records=rows,
+        columns=[
+            "sentence",
+            "id_book",
+            "id_paragraph",
+            "tokens",
+            "token_starts",
+        ],
+    )
+
+
+async def finish_book_import(
+    db: AsyncSession,
+    id_book: int,
+    max_paragraph: int,
+    sentences_count: int,
+) -> None:
+    """Выставляет статистику загруженной книги, абзацы нумеруются с 1"""
+    await db.execute(
+        update(models.Book)
+        .where(models.Book.id_book == id_book)
+        .values(
+            min_paragraph=1 if sentences_count else None,
+            max_paragraph=max_paragraph if sentences_count else None,
+            sentences_count=sentences_count,
         )
     )
-    await db.flush()
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, Field, ConfigDict, model_validator
 
@@ -13,6 +13,7 @@ class Phrase(BaseModel):
     user_id: Optional[int] = None
     last_view: Optional[datetime] = None
     dt: Optional[datetime] = None
+    due_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -40,6 +41,7 @@ class Syllable(BaseModel):
     show_count: Optional[int] = 0
     ready: Optional[int] = 0
     last_view: Optional[datetime] = None
+    due_at: Optional[datetime] = None
     user_id: Optional[int] = None
     paragraphs: list[SyllableParagraph]
 
@@ -59,6 +61,35 @@ class SentenceDTO(BaseModel):
         populate_by_name = True
 
 
+class ParagraphDTO(BaseModel):
+    id_paragraph: int
+    sentences: list[SentenceDTO] = Field(default_factory=list)
+
+
+class StudyWordHit(BaseModel):
+    """Слово на изучении в предложении книги, смещения в символах"""
+
+    id_paragraph: int
+    id_sentence: int
+    start: int
+    end: int
+    syllable_id: int
+    word: str
+    transcription: Optional[str] = None
+    translations: Optional[str] = None
+
+
+class ParagraphCacheStats(BaseModel):
+    pid: int
+    hits: int
+    misses: int
+    evictions: int
+    prefetches: int
+    entries: int
+    bytes: int
+    max_bytes: int
+
+
 class BookDTO(BaseModel):
     id_book: Optional[int] = Field(default=None, alias="id_book")
     book_name: str
@@ -84,6 +115,7 @@ class BookWithStatsDTO(BaseModel):
     # Поля из label(...)
     Min_Paragraph_Number: Optional[int] = None
     Max_Paragraph_Number: Optional[int] = None
+    sentences_count: int = 0
     paragraphs_read_24h: int = (
         0  # Количество прочитанных параграфов за последние 24 часа
     )
@@ -110,15 +142,90 @@ class BookWithStatsDTO(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class BookSearchHit(BaseModel):
+    id_book: int
+    book_name: str
+    id_paragraph: int
+    id_sentence: int
+    # HTML фрагмента предложения: текст экранирован, найденные слова
+    # обрамлены <mark>...</mark>
+    snippet: str
+
+
+class BookSearchResult(BaseModel):
+    items: list[BookSearchHit]
+    # курсор следующей страницы (параметр after), None - страниц больше нет
+    next_after: Optional[int] = None
+
+
 class BookPositionIn(BaseModel):
     id_book: int
     id_new_paragraph: int
 
 
+class BookImportProgress(BaseModel):
+    stage: Literal["progress", "done", "error"] = "progress"
+    id_book: Optional[int] = None
+    bytes_read: int = 0
+    bytes_total: Optional[int] = None
+    paragraphs: int = 0
+    sentences: int = 0
+    detail: Optional[str] = None
+
+
+class VocabularyImportResult(BaseModel):
+    kind: Literal["syllables", "phrases"]
+    read: int = 0
+    added: int = 0
+    skipped: int = 0
+
+
+class UserContext(BaseModel):
+    """Авторизованный пользователь текущего запроса"""
+
+    user_id: int
+    name: str
+
+
 class RepeatedToday(BaseModel):
     count: int | None
 
 
+class TodayStats(BaseModel):
+    """Сводка за сегодня (UTC): повторённые фразы и слова, прочитанные абзацы"""
+
+    phrases: int = 0
+    syllables: int = 0
+    paragraphs: int = 0
+
+
+class ReviewIn(BaseModel):
+    """Ответ по карточке: id слова или фразы, оценка SM-2 и время ответа"""
+
+    id: int
+    grade: int = Field(ge=0, le=5)
+    reviewed_at: Optional[datetime] = None
+
+
+class ReviewBatchIn(BaseModel):
+    items: list[ReviewIn] = Field(max_length=1000)
+
+
+class ReviewBatchResult(BaseModel):
+    applied: int
+
+
+class DictionaryLookupIn(BaseModel):
+    words: list[str] = Field(min_length=1, max_length=50)
+
+
+class DictionaryLookupOut(BaseModel):
+    """Статьи найденных слов и слова, которые не удалось загрузить"""
+
+    items: list[Syllable]
+    failed: list[str] = []
+
+
 class SyllablesInTextIn(BaseModel):
     text: str
 
@@ -161,5 +268,6 @@ class RowTileOrderIn(BaseModel):
     tile_id: int
     tile_index: int
 
+
 class SyllableId(BaseModel):
     syllable_id: int
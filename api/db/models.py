@@ -1,5 +1,7 @@
 from sqlalchemy import (
+    Date,
     Integer,
+    Float,
     Text,
     String,
     ForeignKey,
@@ -7,12 +9,16 @@ from sqlalchemy import (
     BigInteger,
     LargeBinary,
     DateTime,
+    Index,
     func,
+    literal_column,
+    text,
 )
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime
 
 from sqlalchemy.orm import DeclarativeBase
 
@@ -35,6 +41,11 @@ class User(Base):
 
     hashed_password: Mapped[Optional[str]] = mapped_column(Text)
 
+    # Растёт при каждом изменении словаря (db/vocabulary.py)
+    vocabulary_version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+
     # Relations
     # lazy="select" является значением по умолчанию, его можно не писать явно,
     # но я оставил комментарии для ясности.
@@ -53,6 +64,10 @@ class User(Base):
 
 class Phrase(Base):
     __tablename__ = "phrases"
+    __table_args__ = (
+        # очередь повторения: следующая карточка - поиск по индексу
+        Index("ix_phrases_due", "user_id", "ready", "due_at"),
+    )
 
     id_phrase: Mapped[int] = mapped_column(primary_key=True)
     phrase: Mapped[Optional[str]] = mapped_column(Text)
@@ -62,10 +77,25 @@ class Phrase(Base):
     user_id: Mapped[Optional[int]] = mapped_column(ForeignKey("users.user_id"))
     last_view: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP)
     dt: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP)
-
-    user: Mapped["User"] = relationship(
-        back_populates="phrases", lazy="selectin"
+    # Интервальное повторение (db.srs): следующий показ, интервал в днях,
+    # коэффициент лёгкости и число успешных повторений подряд
+    due_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP,
+        nullable=False,
+        default=datetime.utcnow,
+        server_default=text("timezone('utc', now())"),
+    )
+    interval_days: Mapped[float] = mapped_column(
+        Float, nullable=False, default=0.0, server_default="0"
+    )
+    ease: Mapped[float] = mapped_column(
+        Float, nullable=False, default=2.5, server_default="2.5"
     )
+    repetitions: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+
+    user: Mapped["User"] = relationship(back_populates="phrases")
 
     def __repr__(self):
         return f"<Phrase(id={self.id_phrase}, phrase='{self.phrase}' translation='{self.translation}')>"
@@ -73,6 +103,27 @@ class Phrase(Base):
 
 class Syllable(Base):
     __tablename__ = "syllables"
+    __table_args__ = (
+        # очередь повторения: следующая карточка - поиск по индексу
+        Index("ix_syllables_due", "user_id", "ready", "due_at"),
+        # список и keyset-пагинация по word
+        Index("ix_syllables_user_ready_word", "user_id", "ready", "word"),
+        # поиск по началу слова (word LIKE 'x%')
+        Index(
+            "ix_syllables_word_prefix",
+            "user_id",
+            "ready",
+            "word",
+            postgresql_ops={"word": "text_pattern_ops"},
+        ),
+        # поиск по подстроке (word LIKE '%x%'), нужен pg_trgm
+        Index(
+            "ix_syllables_word_trgm",
+            "word",
+            postgresql_using="gin",
+            postgresql_ops={"word": "gin_trgm_ops"},
+        ),
+    )
 
     # В оригинале: nullable=False, unique=True
     word: Mapped[str] = mapped_column(Text, unique=True)
@@ -86,6 +137,23 @@ class Syllable(Base):
     user_id: Mapped[Optional[int]] = mapped_column(
         ForeignKey("users.user_id", ondelete="SET NULL")
     )
+    # Интервальное повторение (db.srs): следующий показ, интервал в днях,
+    # коэффициент лёгкости и число успешных повторений подряд
+    due_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP,
+        nullable=False,
+        default=datetime.utcnow,
+        server_default=text("timezone('utc', now())"),
+    )
+    interval_days: Mapped[float] = mapped_column(
+        Float, nullable=False, default=0.0, server_default="0"
+    )
+    ease: Mapped[float] = mapped_column(
+        Float, nullable=False, default=2.5, server_default="2.5"
+    )
+    repetitions: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
 
     user: Mapped["User"] = relationship(back_populates="syllables")
     paragraphs: Mapped[List["SyllableParagraph"]] = relationship(
@@ -102,7 +170,8 @@ class Syllable(Base):
 class SyllableParagraph(Base):
     __tablename__ = "syllables_paragraphs"
 
-    rowid: Mapped[int] = mapped_column(primary_key=True)
+    # В таблице столбец называется rowid
+    paragraph_id: Mapped[int] = mapped_column("rowid", primary_key=True)
 
     syllable_id: Mapped[int] = mapped_column(
         ForeignKey("syllables.syllable_id", ondelete="CASCADE")
@@ -131,6 +200,14 @@ class Book(Base):
     )
     dt: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP, nullable=True)
 
+    # Материализованная статистика по предложениям книги, поддерживается
+    # триггером на sentences (см. migrations/002_books_stats.sql)
+    min_paragraph: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    max_paragraph: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    sentences_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+
     user: Mapped["User"] = relationship(back_populates="books")
     sentences: Mapped[List["Sentence"]] = relationship(
         back_populates="book", cascade="all, delete-orphan"
@@ -146,9 +223,40 @@ class Sentence(Base):
         ForeignKey("books.id_book"), nullable=False
     )
     id_paragraph: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Токены предложения в нижнем регистре и их смещения, считаются при
+    # загрузке книги; NULL у предложений, загруженных раньше
+    tokens: Mapped[Optional[list[str]]] = mapped_column(
+        postgresql.ARRAY(Text), deferred=True
+    )
+    token_starts: Mapped[Optional[list[int]]] = mapped_column(
+        postgresql.ARRAY(Integer), deferred=True
+    )
 
     book: Mapped["Book"] = relationship(back_populates="sentences")
 
+    # Чтение окна абзацев книги идёт по (id_book, id_paragraph) в порядке
+    # id_sentence - индекс покрывает и фильтр, и сортировку
+    __table_args__ = (
+        Index(
+            "ix_sentences_book_paragraph",
+            "id_book",
+            "id_paragraph",
+            "id_sentence",
+        ),
+        Index(
+            "ix_sentences_fts",
+            text("to_tsvector('english', sentence)"),
+            postgresql_using="gin",
+        ),
+    )
+
+
+# Конфигурация полнотекстового поиска по предложениям книг. Выражение
+# в запросах должно совпадать с выражением индекса ix_sentences_fts, иначе
+# индекс не будет использован (см. books.search_sentences)
+SENTENCE_SEARCH_CONFIG = literal_column("'english'")
+sentence_tsvector = func.to_tsvector(SENTENCE_SEARCH_CONFIG, Sentence.sentence)
+
 
 class ReadingJournal(Base):
     __tablename__ = "reading_journal"
@@ -164,6 +272,50 @@ class ReadingJournal(Base):
     dt: Mapped[datetime] = mapped_column(TIMESTAMP, nullable=True)
 
 
+class ReadingActivity(Base):
+    """Почасовые агрегаты ReadingJournal по книге
+
+    Поддерживаются инкрементально при записи журнала, поэтому статистика
+    за 24 часа считается максимум по 24 строкам, а не по всему журналу.
+    """
+
+    __tablename__ = "reading_activity"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.user_id"), primary_key=True
+    )
+    id_book: Mapped[int] = mapped_column(
+        ForeignKey("books.id_book", ondelete="CASCADE"), primary_key=True
+    )
+    # начало часа (UTC)
+    hour: Mapped[datetime] = mapped_column(TIMESTAMP, primary_key=True)
+    min_paragraph: Mapped[int] = mapped_column(Integer, nullable=False)
+    max_paragraph: Mapped[int] = mapped_column(Integer, nullable=False)
+    events: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class LearningActivity(Base):
+    """Дневные счётчики повторённых карточек (db.stats)
+
+    Увеличиваются при первом за день ответе по карточке, поэтому сводка
+    за сегодня читает одну строку вместо подсчёта по всем карточкам.
+    """
+
+    __tablename__ = "learning_activity"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.user_id"), primary_key=True
+    )
+    # день (UTC)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    phrases: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+    syllables: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+
+
 class Tile(Base):
     __tablename__ = "hp_tiles"
     tile_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
@@ -222,3 +374,30 @@ class UserIcon(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
+
+
+class DictionaryCacheEntry(Base):
+    """Разобранная статья Wooordhunt (wooordhunt.cache)"""
+
+    __tablename__ = "dictionary_cache"
+
+    # слово в нижнем регистре (wooordhunt.cache.normalize)
+    word: Mapped[str] = mapped_column(Text, primary_key=True)
+    # wooordhunt.models.DictionaryEntry
+    entry: Mapped[dict] = mapped_column(postgresql.JSONB, nullable=False)
+    fetched_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP,
+        nullable=False,
+        index=True,
+        server_default=text("timezone('utc', now())"),
+    )
+
+
+class DictionaryFetchSlot(Base):
+    """Время следующего фонового запроса к сайту (wooordhunt.prewarm)"""
+
+    __tablename__ = "dictionary_fetch_slot"
+
+    # единственная строка
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    next_at: Mapped[datetime] = mapped_column(TIMESTAMP, nullable=False)
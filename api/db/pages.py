@@ -1,11 +1,9 @@
 from sqlalchemy import select, delete
 from sqlalchemy.ext.asyncio import AsyncSession
-from db import models, users
+from db import models
 
 
-async def get_start_page(db: AsyncSession, user_name: str):
-    ln_user_id = await users.aget_user_id(db, user_name)
-
+async def get_start_page(db: AsyncSession, user_id: int):
     def _to_str(val):
         return "None" if val is None else str(val)
 
@@ -19,7 +17,7 @@ async def get_start_page(db: AsyncSession, user_name: str):
             )
             .join(models.RowTile, models.RowTile.tile_id == models.Tile.tile_id)
             .where(
-                models.RowTile.user_id == ln_user_id,
+                models.RowTile.user_id == user_id,
                 models.RowTile.row_id == row_id,
             )
             .order_by(models.RowTile.tile_index)
@@ -46,7 +44,7 @@ async def get_start_page(db: AsyncSession, user_name: str):
     # Page (по образцу page_id == 1)
     page_res = await db.execute(
         select(models.Page).where(
-            models.Page.user_id == ln_user_id, models.Page.page_id == 1
+            models.Page.user_id == user_id, models.Page.page_id == 1
         )
     )
     page = page_res.scalar_one_or_none()
@@ -67,8 +65,8 @@ async def get_start_page(db: AsyncSession, user_name: str):
         select(models.Row, models.PageRows.row_index)
         .join(models.PageRows, models.PageRows.row_id == models.Row.row_id)
         .where(
-            models.Row.user_id == ln_user_id,
-            models.PageRows.user_id == ln_user_id,
+            models.Row.user_id == user_id,
+            models.PageRows.user_id == user_id,
             models.PageRows.page_id == page.page_id,
         )
         .order_by(models.PageRows.row_index)
@@ -117,7 +115,7 @@ async def get_icon(
 # ----- Mutations for tiles -----
 async def create_tile(
     db: AsyncSession,
-    user_name: str,
+    user_id: int,
     *,
     row_id: int,
     tile_index: int,
@@ -127,9 +125,6 @@ async def create_tile(
     icon: str | None,
     color: str | None,
 ) -> models.Tile:
-    user_id = await users.aget_user_id(db, user_name)
-    if not user_id:
-        raise ValueError("User not found")
 
     tile = models.Tile(
         user_id=user_id,
@@ -154,7 +149,7 @@ async def create_tile(
 
 async def update_tile(
     db: AsyncSession,
-    user_name: str,
+    user_id: int,
     *,
     tile_id: int,
     name: str | None = None,
@@ -163,9 +158,6 @@ async def update_tile(
     icon: str | None = None,
     color: str | None = None,
 ) -> models.Tile:
-    user_id = await users.aget_user_id(db, user_name)
-    if not user_id:
-        raise ValueError("User not found")
     res = await db.execute(
         select(models.Tile).where(
             models.Tile.tile_id == tile_id, models.Tile.user_id == user_id
@@ -188,12 +180,7 @@ async def update_tile(
     return tile
 
 
-async def delete_tile(
-    db: AsyncSession, user_name: str, *, tile_id: int
-) -> None:
-    user_id = await users.aget_user_id(db, user_name)
-    if not user_id:
-        raise ValueError("User not found")
+async def delete_tile(db: AsyncSession, user_id: int, *, tile_id: int) -> None:
     await db.execute(
         delete(models.RowTile).where(
             models.RowTile.user_id == user_id, models.RowTile.tile_id == tile_id
@@ -208,15 +195,12 @@ async def delete_tile(
 
 async def set_row_tile_index(
     db: AsyncSession,
-    user_name: str,
+    user_id: int,
     *,
     row_id: int,
     tile_id: int,
     tile_index: int,
 ) -> None:
-    user_id = await users.aget_user_id(db, user_name)
-    if not user_id:
-        raise ValueError("User not found")
 
     await db.execute(
         delete(models.RowTile).where(
@@ -249,16 +233,13 @@ async def set_row_tile_index(
 
 async def create_row(
     db: AsyncSession,
-    user_name: str,
+    user_id: int,
     *,
     row_name: str,
     row_type: int = 0,
     row_index: int = 0,
     page_id: int = 1,
 ) -> models.Row:
-    user_id = await users.aget_user_id(db, user_name)
-    if not user_id:
-        raise ValueError("User not found")
     row = models.Row(
         user_id=user_id,
         row_name=row_name,
@@ -274,10 +255,7 @@ async def create_row(
     return row
 
 
-async def delete_row(db: AsyncSession, user_name: str, *, row_id: int) -> None:
-    user_id = await users.aget_user_id(db, user_name)
-    if not user_id:
-        raise ValueError("User not found")
+async def delete_row(db: AsyncSession, user_id: int, *, row_id: int) -> None:
     await db.execute(
         delete(models.RowTile).where(
             models.RowTile.user_id == user_id, models.RowTile.row_id == row_id
@@ -0,0 +1,137 @@
+import os
+from collections import OrderedDict
+from typing import Optional
+
+from db import dto
+
+# Бюджет памяти кэша абзацев на один воркер, байт
+MAX_BYTES = int(os.environ.get("PARAGRAPH_CACHE_BYTES", str(64 * 1024 * 1024)))
+# Сколько абзацев вперёд подгружать после выдачи окна
+READ_AHEAD_PARAGRAPHS = int(os.environ.get("READ_AHEAD_PARAGRAPHS", "10"))
+
+# Приблизительные накладные расходы на объект предложения и запись кэша
+_SENTENCE_OVERHEAD = 200
+_ENTRY_OVERHEAD = 150
+
+
+def _size(sentences: list[dto.SentenceDTO]) -> int:
+    return _ENTRY_OVERHEAD + sum(
+        _SENTENCE_OVERHEAD + len(s.sentence) for s in sentences
+    )
+
+
+class ParagraphCache:
+    """LRU-кэш абзацев книг в памяти воркера с ограничением по байтам
+
+    Ключ - (id_book, id_paragraph). Окна кэшируются целиком, включая
+    номера абзацев без предложений, поэтому повторная выдача окна не требует
+    обращения к БД. Владелец книги запоминается отдельно и проверяется при
+    каждом чтении.
+    """
+
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: OrderedDict[
+            tuple[int, int], tuple[list[dto.SentenceDTO], int]
+        ] = OrderedDict()
+        self._owners: dict[int, int] = {}
+        self._prefetching: set[tuple[int, int]] = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.prefetches = 0
+
+    def owner(self, id_book: int) -> Optional[int]:
+        return self._owners.get(id_book)
+
+    def get_window(
+        self, id_book: int, id_from: int, id_to: int, user_id: int
+    ) -> Optional[list[dto.ParagraphDTO]]:
+        """Окно абзацев из кэша или None, если его нет целиком"""
+        if self._owners.get(id_book) != user_id or not self.has_window(
+            id_book, id_from, id_to
+        ):
+            self.misses += 1
+            return None
+        self.hits += 1
+        result = []
+        for id_paragraph in range(id_from, id_to + 1):
+            key = (id_book, id_paragraph)
+            self._entries.move_to_end(key)
+            sentences = self._entries[key][0]
+            if sentences:
+                result.append(
+                    dto.ParagraphDTO(
+                        id_paragraph=id_paragraph, sentences=sentences
+                    )
+                )
+        return result
+
+    def has_window(self, id_book: int, id_from: int, id_to: int) -> bool:
+        return all(
+            (id_book, id_paragraph) in self._entries
+            for id_paragraph in range(id_from, id_to + 1)
+        )
+
+    def put_window(
+        self,
+        id_book: int,
+        id_from: int,
+        id_to: int,
+        user_id: int,
+        paragraphs: list[dto.ParagraphDTO],
+    ) -> None:
+        """Кладёт окно, прочитанное из БД для пользователя user_id
+
+        Пустое окно не доказывает владение книгой, поэтому кэшируется
+        только для уже известного владельца.
+        """
+        if not paragraphs and self._owners.get(id_book) != user_id:
+            return
+        self._owners[id_book] = user_id
+        by_id = {p.id_paragraph: p.sentences for p in paragraphs}
+        for id_paragraph in range(id_from, id_to + 1):
+            self._put((id_book, id_paragraph), by_id.get(id_paragraph, []))
+        self._evict()
+
+    def _put(self, key: tuple[int, int], sentences: list[dto.SentenceDTO]):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old[1]
+        size = _size(sentences)
+        self._entries[key] = (sentences, size)
+        self.bytes += size
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+    def start_prefetch(self, id_book: int, id_from: int) -> bool:
+        """Отмечает начало упреждающего чтения, False - если оно уже идёт"""
+        key = (id_book, id_from)
+        if key in self._prefetching:
+            return False
+        self._prefetching.add(key)
+        self.prefetches += 1
+        return True
+
+    def finish_prefetch(self, id_book: int, id_from: int) -> None:
+        self._prefetching.discard((id_book, id_from))
+
+    def stats(self) -> dto.ParagraphCacheStats:
+        return dto.ParagraphCacheStats(
+            pid=os.getpid(),
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            prefetches=self.prefetches,
+            entries=len(self._entries),
+            bytes=self.bytes,
+            max_bytes=self.max_bytes,
+        )
+
+
+cache = ParagraphCache()
@@ -1,88 +1,122 @@
-from datetime import datetime, timedelta
+from datetime import datetime
+from typing import Optional
 
-from sqlalchemy import select, func
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from db import models
-
-from db import users
+from db import models, dto, srs, stats
 
 
 async def get_phrases_by_user(
-    db: AsyncSession, username: str, ready: int
+    db: AsyncSession, user_id: int, ready: int
 ) -> list[models.Phrase]:
     result = await db.execute(
         select(models.Phrase)
-        .join(models.User)
         .where(models.Phrase.ready == ready)
-        .where(models.User.name == username)
+        .where(models.Phrase.user_id == user_id)
     )
     return result.scalars().all()
 
 
-async def get_phrase_by_id(db: AsyncSession, id_phrase: int, username: str):
+async def get_phrase_by_id(db: AsyncSession, id_phrase: int, user_id: int):
     result = await db.execute(
         select(models.Phrase)
-        .join(models.User)
         .where(models.Phrase.id_phrase == id_phrase)
-        .where(models.User.name == username)
+        .where(models.Phrase.user_id == user_id)
     )
     return result.scalar_one_or_none()
 
 
 async def set_phrase_status(
-    db: AsyncSession, id_phrase: int, status: int, username: str
+    db: AsyncSession, id_phrase: int, status: int, user_id: int
 ):
     result = await db.execute(
         select(models.Phrase)
-        .join(models.User)
         .where(models.Phrase.id_phrase == id_phrase)
-        .where(models.User.name == username)
+        .where(models.Phrase.user_id == user_id)
     )
     phrase = result.scalar_one_or_none()
     if phrase:
         phrase.ready = status
+        if not status:
+            phrase.due_at = datetime.utcnow()
         db.add(phrase)
 
 
-async def set_phrase_as_viewed(db: AsyncSession, id_phrase: int, username: str):
+async def set_phrase_as_viewed(
+    db: AsyncSession,
+    id_phrase: int,
+    user_id: int,
+    grade: int,
+):
+    """Отмечает показ фразы и планирует следующий по оценке ответа"""
     result = await db.execute(
         select(models.Phrase)
-        .join(models.User)
         .where(models.Phrase.id_phrase == id_phrase)
-        .where(models.User.name == username)
+        .where(models.Phrase.user_id == user_id)
     )
     phrase = result.scalar_one_or_none()
     if phrase:
-        phrase.last_view = datetime.utcnow()
-        phrase.show_count += 1
+        now = datetime.utcnow()
+        if srs.review(phrase, grade, now):
+            await stats.add_reviews(db, user_id, "phrases", {now.date(): 1})
         db.add(phrase)
         await db.flush()
 
 
 async def get_next_phrase(
-    db: AsyncSession, current_phrase_id: int, username: str
+    db: AsyncSession,
+    current_phrase_id: int,
+    user_id: int,
+    grade: int,
 ):
+    """Оценивает текущую фразу и возвращает фразу с ближайшим due_at"""
     if current_phrase_id:
-        await set_phrase_as_viewed(db, current_phrase_id, username)
+        await set_phrase_as_viewed(db, current_phrase_id, user_id, grade)
 
     result = await db.execute(
         select(models.Phrase)
-        .join(models.User)
         .where(models.Phrase.ready == 0)
-        .where(models.User.name == username)
-        .order_by(models.Phrase.last_view)
+        .where(models.Phrase.user_id == user_id)
+        .order_by(models.Phrase.due_at)
         .limit(1)
     )
     return result.scalar_one_or_none()
 
 
-async def save_phrase(db: AsyncSession, phrase: models.Phrase, username: str):
+async def get_phrases_queue(
+    db: AsyncSession,
+    user_id: int,
+    limit: int,
+    exclude: Optional[list[int]] = None,
+) -> list[models.Phrase]:
+    """Следующие limit фраз по due_at, exclude - уже в очереди клиента"""
+    stmt = (
+        select(models.Phrase)
+        .where(models.Phrase.ready == 0)
+        .where(models.Phrase.user_id == user_id)
+        .order_by(models.Phrase.due_at)
+        .limit(limit)
+    )
+    if exclude:
+        stmt = stmt.where(models.Phrase.id_phrase.not_in(exclude))
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+
+async def submit_reviews(
+    db: AsyncSession, user_id: int, reviews: list[dto.ReviewIn]
+) -> int:
+    """Применяет пачку ответов по фразам (см. srs.apply_reviews)"""
+    return await srs.apply_reviews(db, models.Phrase, user_id, reviews)
+
+
+async def save_phrase(db: AsyncSession, phrase: models.Phrase, user_id: int):
     if phrase.id_phrase:
         result = await db.execute(
             select(models.Phrase)
-            .join(models.User)
             .where(models.Phrase.id_phrase == phrase.id_phrase)
-            .where(models.User.name == username)
+            .where(models.Phrase.user_id == user_id)
         )
         phrase_db = result.scalar_one_or_none()
         if not phrase_db:
@@ -91,7 +125,6 @@ async def save_phrase(db: AsyncSession, phrase: models.Phrase, username: str):
         phrase_db.translation = phrase.translation
         db.add(phrase_db)
     else:
-        user_id = await users.aget_user_id(db, username)
         phrase_db = models.Phrase(
             phrase=phrase.phrase,
             translation=phrase.translation,
@@ -107,16 +140,47 @@ async def save_phrase(db: AsyncSession, phrase: models.Phrase, username: str):
     return phrase_db
 
 
-async def get_phrases_count_repeated_today(
-    db: AsyncSession, username: str
+async def add_phrases(
+    db: AsyncSession, user_id: int, rows: list[tuple[str, str]]
 ) -> int:
-    user_id = await users.aget_user_id(db, username)
-    result = await db.execute(
-        select(func.count(models.Phrase.id_phrase))
+    """Добавляет пачку фраз (phrase, translation), которых ещё нет
+
+    Дубликаты отсекаются одним SELECT по всей пачке, новые фразы пишутся
+    одним многострочным INSERT. Возвращает число добавленных фраз.
+    """
+    new = {}
+    for phrase, translation in rows:
+        new.setdefault(phrase, translation)
+    if not new:
+        return 0
+    existing = await db.execute(
+        select(models.Phrase.phrase)
         .where(models.Phrase.user_id == user_id)
-        .where(
-            models.Phrase.last_view
-            >= datetime.utcnow().date() - timedelta(days=1)
+        .where(models.Phrase.phrase.in_(new.keys()))
+    )
+    for (phrase,) in existing:
+        new.pop(phrase, None)
+    if not new:
+        return 0
+    now = datetime.utcnow()
+    result = await db.execute(
+        pg_insert(models.Phrase)
+        .values(
+            [
+                {
+                    "phrase": phrase,
+                    "translation": translation,
+                    "show_count": 0,
+                    "ready": 0,
+                    "last_view": now,
+                    "dt": now,
+                    "due_at": now,
+                    "user_id": user_id,
+                }
+                for phrase, translation in new.items()
+            ]
         )
+        .on_conflict_do_nothing()
+        .returning(models.Phrase.id_phrase)
     )
-    return result.scalar_one()
+    return len(result.all())
@@ -0,0 +1,219 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import (
+    Integer,
+    TIMESTAMP,
+    and_,
+    column,
+    func,
+    insert,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy import values as sql_values
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from db import models
+
+logger = logging.getLogger(__name__)
+
+# Как часто фоновая задача сбрасывает накопленные позиции в БД, секунд
+FLUSH_INTERVAL = 2.0
+# Предел несброшенных событий журнала (если БД долго недоступна)
+MAX_PENDING_EVENTS = 100_000
+# Строк VALUES в одном операторе (asyncpg ограничивает число параметров)
+ROWS_PER_STATEMENT = 5_000
+
+
+class ReadingPositionBuffer:
+    """Буфер отложенной записи позиций чтения и событий ReadingJournal
+
+    Перелистывание страницы только кладёт позицию в память процесса.
+    Частые сохранения по одной книге схлопываются до последней позиции,
+    события журнала копятся и пишутся одной пачкой при сбросе.
+    """
+
+    def __init__(self):
+        # (user_id, id_book) -> (id_paragraph, dt)
+        self._positions: dict[tuple[int, int], tuple[int, datetime]] = {}
+        # (user_id, id_book, id_paragraph, dt)
+        self._events: list[tuple[int, int, int, datetime]] = []
+        # то, что сейчас пишется в БД, - видно в pending до конца сброса
+        self._writing: tuple[dict, list] = ({}, [])
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._positions)
+
+    def record(self, user_id: int, id_book: int, id_paragraph: int) -> None:
+        dt = datetime.utcnow()
+        self._positions[(user_id, id_book)] = (id_paragraph, dt)
+        self._events.append((user_id, id_book, id_paragraph, dt))
+        if len(self._events) > MAX_PENDING_EVENTS:
+            del self._events[: len(self._events) - MAX_PENDING_EVENTS]
+
+    def pending(
+        self, user_id: int, id_book: int
+    ) -> Optional[tuple[int, list[int]]]:
+        """Ещё не записанные позиция книги и абзацы событий журнала
+
+        None, если несброшенной позиции у книги нет.
+        """
+        key = (user_id, id_book)
+        position = self._positions.get(key) or self._writing[0].get(key)
+        if position is None:
+            return None
+        paragraphs = [
+            id_paragraph
+            for events in (self._writing[1], self._events)
+            for event_user, event_book, id_paragraph, _ in events
+            if event_user == user_id and event_book == id_book
+        ]
+        return position[0], paragraphs
+
+    async def flush(self, db: AsyncSession) -> int:
+        """Записывает накопленное в БД и фиксирует транзакцию
+
+        Возвращает число обновлённых книг. При ошибке несброшенные данные
+        возвращаются в буфер (более свежие позиции не перетираются).
+        """
+        async with self._lock:
+            positions, self._positions = self._positions, {}
+            events, self._events = self._events, []
+            if not positions:
+                return 0
+            self._writing = (positions, events)
+            try:
+                await _write_positions(db, positions, events)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                for key, value in positions.items():
+                    self._positions.setdefault(key, value)
+                self._events[:0] = events
+                raise
+            finally:
+                self._writing = ({}, [])
+            return len(positions)
+
+
+def _valid_rows(rows, name: str):
+    """VALUES-таблица, соединённая с books для проверки владельца и границ"""
+    v = sql_values(
+        column("user_id", Integer),
+        column("id_book", Integer),
+        column("id_paragraph", Integer),
+        column("dt", TIMESTAMP),
+        name=name,
+    ).data(rows)
+    condition = and_(
+        models.Book.id_book == v.c.id_book,
+        models.Book.user_id == v.c.user_id,
+        v.c.id_paragraph.between(
+            models.Book.min_paragraph, models.Book.max_paragraph
+        ),
+    )
+    return v, condition
+
+
+async def _write_positions(
+    db: AsyncSession,
+    positions: dict[tuple[int, int], tuple[int, datetime]],
+    events: list[tuple[int, int, int, datetime]],
+) -> None:
+    position_rows = [
+        (user_id, id_book, id_paragraph, dt)
+        for (user_id, id_book), (id_paragraph, dt) in positions.items()
+    ]
+    # UPDATE ... FROM (VALUES ...) на все книги пачки; у каждого воркера
+    # свой буфер, поэтому позицию, записанную другим воркером позже,
+    # запоздавший сброс не перетирает
+    for start in range(0, len(position_rows), ROWS_PER_STATEMENT):
+        v, condition = _valid_rows(
+            position_rows[start : start + ROWS_PER_STATEMENT], "positions"
+        )
+        await db.execute(
+            update(models.Book)
+            .where(condition)
+            .where(or_(models.Book.dt.is_(None), models.Book.dt < v.c.dt))
+            .values(current_paragraph=v.c.id_paragraph, dt=v.c.dt)
+        )
+
+    # События журнала и почасовые агрегаты пишутся одним оператором:
+    # INSERT в reading_journal ... RETURNING, из которого группировкой
+    # по часу обновляется reading_activity
+    for start in range(0, len(events), ROWS_PER_STATEMENT):
+        v, condition = _valid_rows(
+            events[start : start + ROWS_PER_STATEMENT], "events"
+        )
+        journal = (
+            insert(models.ReadingJournal)
+            .from_select(
+                ["user_id", "id_book", "id_paragraph", "dt"],
+                select(v.c.user_id, v.c.id_book, v.c.id_paragraph, v.c.dt).join(
+                    models.Book, condition
+                ),
+            )
+            .returning(
+                models.ReadingJournal.user_id,
+                models.ReadingJournal.id_book,
+                models.ReadingJournal.id_paragraph,
+                models.ReadingJournal.dt,
+            )
+            .cte("journal")
+        )
+        hour = func.date_trunc("hour", journal.c.dt)
+        stmt = pg_insert(models.ReadingActivity).from_select(
+            [
+                "user_id",
+                "id_book",
+                "hour",
+                "min_paragraph",
+                "max_paragraph",
+                "events",
+            ],
+            select(
+                journal.c.user_id,
+                journal.c.id_book,
+                hour,
+                func.min(journal.c.id_paragraph),
+                func.max(journal.c.id_paragraph),
+                func.count(),
+            ).group_by(journal.c.user_id, journal.c.id_book, hour),
+        )
+        activity = models.ReadingActivity.__table__.c
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["user_id", "id_book", "hour"],
+                set_={
+                    "min_paragraph": func.least(
+                        activity.min_paragraph, stmt.excluded.min_paragraph
+                    ),
+                    "max_paragraph": func.greatest(
+                        activity.max_paragraph, stmt.excluded.max_paragraph
+                    ),
+                    "events": activity.events + stmt.excluded.events,
+                },
+            )
+        )
+
+
+buffer = ReadingPositionBuffer()
+
+
+async def flush_periodically(
+    session_factory: async_sessionmaker, interval: float = FLUSH_INTERVAL
+) -> None:
+    """Фоновая задача: сбрасывает буфер раз в interval секунд"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_factory() as db:
+                await buffer.flush(db)
+        except Exception:
+            logger.exception("Failed to flush reading positions")
@@ -0,0 +1,195 @@
+"""Интервальное повторение карточек (слов и фраз) по алгоритму SM-2
+
+Карточка хранит интервал в днях, коэффициент лёгкости и число успешных
+повторений подряд; следующая карточка - с наименьшим due_at, её выбирает
+индекс (user_id, ready, due_at).
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import Float, Integer, TIMESTAMP, column, select, update
+from sqlalchemy import values as sql_values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import dto, stats
+
+# Оценка ответа 0..5 как в SM-2: < 3 - не вспомнил
+GRADE_AGAIN = 1
+GRADE_GOOD = 4
+MIN_GRADE = 0
+MAX_GRADE = 5
+PASSING_GRADE = 3
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+# Забытая карточка возвращается в очередь через несколько минут
+RELEARN_INTERVAL = timedelta(minutes=10)
+
+
+def next_schedule(
+    interval: float,
+    ease: float,
+    repetitions: int,
+    due_at: Optional[datetime],
+    grade: int,
+    now: datetime,
+) -> tuple[float, float, int, Optional[datetime]]:
+    """Новые (interval, ease, repetitions, due_at) после ответа с оценкой grade
+
+    Верный ответ раньше срока (now < due_at) расписание не меняет: интервал,
+    лёгкость, число повторений и срок остаются прежними, иначе листание
+    карточек подряд раздувало бы интервалы. Забытая карточка сбрасывается
+    в любой момент.
+    """
+    grade = min(max(grade, MIN_GRADE), MAX_GRADE)
+    if grade >= PASSING_GRADE and (
+        repetitions > 0 and due_at is not None and now < due_at
+    ):
+        return interval, ease, repetitions, due_at
+
+    ease = max(
+        MIN_EASE,
+        ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02),
+    )
+    if grade < PASSING_GRADE:
+        return 0.0, ease, 0, now + RELEARN_INTERVAL
+    if repetitions == 0:
+        interval = 1.0
+    elif repetitions == 1:
+        interval = 6.0
+    else:
+        interval = max(1.0, interval * ease)
+    return interval, ease, repetitions + 1, now + timedelta(days=interval)
+
+
+def first_of_day(
+    last_view: Optional[datetime], show_count: Optional[int], now: datetime
+) -> bool:
+    """Первый ответ по карточке за день now - для дневных счётчиков"""
+    return not show_count or last_view is None or last_view.date() < now.date()
+
+
+def review(card, grade: int, now: Optional[datetime] = None) -> bool:
+    """Применяет ответ к карточке (models.Syllable или models.Phrase)
+
+    Возвращает True, если это первый ответ по карточке за день.
+    """
+    now = now or datetime.utcnow()
+    first = first_of_day(card.last_view, card.show_count, now)
+    card.interval_days, card.ease, card.repetitions, card.due_at = (
+        next_schedule(
+            card.interval_days or 0.0,
+            card.ease or DEFAULT_EASE,
+            card.repetitions or 0,
+            card.due_at,
+            grade,
+            now,
+        )
+    )
+    card.last_view = now
+    card.show_count = (card.show_count or 0) + 1
+    return first
+
+
+def _naive_utc(dt: Optional[datetime], now: datetime) -> datetime:
+    if dt is None:
+        return now
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    # время клиента не может быть в будущем
+    return min(dt, now)
+
+
+async def apply_reviews(
+    db: AsyncSession, model, user_id: int, reviews: list[dto.ReviewIn]
+) -> int:
+    """Применяет пачку ответов к карточкам пользователя двумя операторами
+
+    model - models.Syllable или models.Phrase. Состояние карточек читается
+    одним SELECT, ответы применяются по времени, результат пишется одним
+    UPDATE ... FROM (VALUES ...). Ответ не новее last_view карточки
+    считается уже применённым, поэтому повторная отправка пачки безопасна.
+    Первые за день ответы прибавляются к дневным счётчикам (db.stats).
+    Возвращает число применённых ответов.
+    """
+    if not reviews:
+        return 0
+    pk = model.__mapper__.primary_key[0]
+    rows = await db.execute(
+        select(
+            pk,
+            model.interval_days,
+            model.ease,
+            model.repetitions,
+            model.last_view,
+            model.show_count,
+            model.due_at,
+        )
+        .where(pk.in_({review.id for review in reviews}))
+        .where(model.user_id == user_id)
+    )
+    cards = {row[0]: list(row[1:]) for row in rows}
+    changed = set()
+
+    now = datetime.utcnow()
+    applied = 0
+    days: Counter = Counter()
+    timed = [(_naive_utc(r.reviewed_at, now), r) for r in reviews]
+    for reviewed_at, review in sorted(timed, key=lambda item: item[0]):
+        card = cards.get(review.id)
+        if card is None:
+            continue
+        interval, ease, repetitions, last_view, show_count, due_at = card
+        if last_view is not None and reviewed_at <= last_view:
+            continue
+        if first_of_day(last_view, show_count, reviewed_at):
+            days[reviewed_at.date()] += 1
+        interval, ease, repetitions, due_at = next_schedule(
+            interval or 0.0,
+            ease or DEFAULT_EASE,
+            repetitions or 0,
+            due_at,
+            review.grade,
+            reviewed_at,
+        )
+        cards[review.id] = [
+            interval,
+            ease,
+            repetitions,
+            reviewed_at,
+            (show_count or 0) + 1,
+            due_at,
+        ]
+        changed.add(review.id)
+        applied += 1
+    if not applied:
+        return 0
+
+    v = sql_values(
+        column("id", Integer),
+        column("interval_days", Float),
+        column("ease", Float),
+        column("repetitions", Integer),
+        column("last_view", TIMESTAMP),
+        column("show_count", Integer),
+        column("due_at", TIMESTAMP),
+        name="reviews",
+    ).data([(id_, *card) for id_, card in cards.items() if id_ in changed])
+    await db.execute(
+        update(model)
+        .where(pk == v.c.id)
+        .where(model.user_id == user_id)
+        .values(
+            interval_days=v.c.interval_days,
+            ease=v.c.ease,
+            repetitions=v.c.repetitions,
+            last_view=v.c.last_view,
+            show_count=v.c.show_count,
+            due_at=v.c.due_at,
+        )
+    )
+    # имена таблиц совпадают со столбцами счётчиков
+    await stats.add_reviews(db, user_id, model.__tablename__, days)
+    return applied
@@ -0,0 +1,101 @@
+"""Дневные счётчики обучения и сводка за сегодня (/api/stats/today)"""
+
+import time
+from datetime import date, datetime
+from typing import Literal
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import dto, models
+
+# Сводка пользователя в памяти воркера; после ответа в этом воркере
+# сбрасывается сразу, изменения из других воркеров видны через TTL
+STATS_TTL = 15.0
+STATS_CACHE_SIZE = 10_000
+_today: dict[int, tuple[date, dto.TodayStats, float]] = {}
+
+
+def invalidate(user_id: int) -> None:
+    _today.pop(user_id, None)
+
+
+async def add_reviews(
+    db: AsyncSession,
+    user_id: int,
+    kind: Literal["phrases", "syllables"],
+    days: dict[date, int],
+) -> None:
+    """Прибавляет к счётчикам kind число карточек, впервые повторённых
+    в каждый из дней days, одним INSERT ... ON CONFLICT"""
+    days = {day: count for day, count in days.items() if count}
+    if not days:
+        return
+    activity = models.LearningActivity
+    stmt = pg_insert(activity).values(
+        [
+            {"user_id": user_id, "day": day, kind: count}
+            for day, count in days.items()
+        ]
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["user_id", "day"],
+            set_={kind: getattr(activity, kind) + stmt.excluded[kind]},
+        )
+    )
+    invalidate(user_id)
+
+
+async def get_today(db: AsyncSession, user_id: int) -> dto.TodayStats:
+    """Счётчики за сегодня одним запросом, с кэшем на STATS_TTL секунд"""
+    now = datetime.utcnow()
+    today = now.date()
+    cached = _today.get(user_id)
+    if (
+        cached is not None
+        and cached[0] == today
+        and cached[2] > time.monotonic()
+    ):
+        return cached[1]
+
+    activity = models.LearningActivity
+    reading = models.ReadingActivity
+    # абзацы по книгам, как paragraphs_read_24h, но с начала дня
+    per_book = (
+        select(
+            (
+                func.max(reading.max_paragraph)
+                - func.min(reading.min_paragraph)
+            ).label("paragraphs")
+        )
+        .where(reading.user_id == user_id)
+        .where(reading.hour >= datetime.combine(today, datetime.min.time()))
+        .group_by(reading.id_book)
+        .subquery()
+    )
+    paragraphs = select(func.sum(per_book.c.paragraphs)).scalar_subquery()
+
+    def _counter(column):
+        return (
+            select(column)
+            .where(activity.user_id == user_id)
+            .where(activity.day == today)
+            .scalar_subquery()
+        )
+
+    row = (
+        await db.execute(
+            select(
+                func.coalesce(_counter(activity.phrases), 0),
+                func.coalesce(_counter(activity.syllables), 0),
+                func.coalesce(paragraphs, 0),
+            )
+        )
+    ).one()
+    stats = dto.TodayStats(phrases=row[0], syllables=row[1], paragraphs=row[2])
+    if len(_today) >= STATS_CACHE_SIZE:
+        _today.clear()
+    _today[user_id] = (today, stats, time.monotonic() + STATS_TTL)
+    return stats
@@ -1,21 +1,29 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Optional
-import re
 
 from sqlalchemy.orm import selectinload
-from sqlalchemy import func, select, delete
+from sqlalchemy import (
+    Integer,
+    Text,
+    bindparam,
+    cast,
+    column,
+    insert,
+    select,
+    delete,
+    update,
+)
+from sqlalchemy import values as sql_values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from db import models, dto
-from db import users
+from db import models, dto, srs, stats, vocabulary
 
 
-async def get_syllable(db: AsyncSession, syllable_id: int, username: str):
-    user_id = await users.aget_user_id(db, username)
+async def get_syllable(db: AsyncSession, syllable_id: int, user_id: int):
     result = await db.execute(
         select(models.Syllable)
-        .join(models.User)
         .where(models.Syllable.syllable_id == syllable_id)
-        .where(models.User.user_id == user_id)
+        .where(models.Syllable.user_id == user_id)
         .options(selectinload(models.Syllable.paragraphs))
         .limit(1)
     )
@@ -23,70 +31,16 @@ async def get_syllable(db: AsyncSession, syllable_id: int, username: str):
 
 
 async def save_syllable(
-    db: AsyncSession, syllable: models.Syllable, username: str
-) -> models.Syllable:
-    # existing syllable
-    if syllable.syllable_id:
-        user_id = await users.aget_user_id(db, username)
-        result = await db.execute(
-            select(models.Syllable)
-            .where(models.Syllable.syllable_id == syllable.syllable_id)
-            .where(models.Syllable.user_id == user_id)
-        )
-        syllable_db = result.scalar_one_or_none()
-        syllable_db.word = syllable.word
-        syllable_db.transcription = syllable.transcription
-        syllable_db.translations = syllable.translations
-        syllable_db.examples = syllable.examples
-
-        # update existing paragraphs
-        for paragraph in list(syllable_db.paragraphs):
-            result = await db.execute(
-                select(models.SyllableParagraph)
-                .where(
-                    models.SyllableParagraph.paragraph_id
-                    == paragraph.paragraph_id
-                )
-                .where(
-                    models.SyllableParagraph.syllable_id == syllable.syllable_id
-                )
-            )
-            paragraph_db = result.scalar_one_or_none()
-            if not paragraph_db:
-                continue
-            paragraph_db.example = paragraph.example
-            paragraph_db.translate = paragraph.translate
-            paragraph_db.sequence = paragraph.sequence
-
-        # delete absent paragraphs
-        for paragraph in list(syllable_db.paragraphs):
-            if paragraph.paragraph_id not in [
-                p.paragraph_id for p in syllable.paragraphs
-            ]:
-                await db.execute(
-                    delete(models.SyllableParagraph).where(
-                        models.SyllableParagraph.paragraph_id
-                        == paragraph.paragraph_id,
-                        models.SyllableParagraph.syllable_id
-                        == syllable.syllable_id,
-                    )
-                )
+    db: AsyncSession, syllable: dto.Syllable, user_id: int
+) -> Optional[models.Syllable]:
+    """Сохраняет слово с примерами за постоянное число запросов
 
-        # add new paragraphs
-        for paragraph in syllable.paragraphs:
-            if paragraph.paragraph_id not in [
-                p.paragraph_id for p in syllable_db.paragraphs
-            ]:
-                paragraph_db = models.SyllableParagraph(
-                    example=paragraph.example,
-                    translate=paragraph.translate,
-                    sequence=paragraph.sequence,
-                    syllable_id=syllable.syllable_id,
-                )
-                db.add(paragraph_db)
+    Для существующего слова: UPDATE слова, один DELETE примеров, которых
+    больше нет, один UPDATE ... FROM (VALUES ...) оставшихся и один
+    многострочный INSERT новых. None - слово не найдено у пользователя.
+    """
     # new syllable
-    else:
-        user_id = await users.aget_user_id(db, username)
+    if not syllable.syllable_id:
         syllable_db = models.Syllable(
             word=syllable.word,
             transcription=syllable.transcription,
@@ -96,51 +50,186 @@ async def save_syllable(
             ready=0,
             last_view=datetime.utcnow(),
             user_id=user_id,
+            paragraphs=[
+                models.SyllableParagraph(
+                    example=paragraph.example,
+                    translate=paragraph.translate,
+                    sequence=paragraph.sequence,
+                )
+                for paragraph in syllable.paragraphs
+            ],
         )
         db.add(syllable_db)
         await db.flush()
+        vocabulary.invalidate(db, user_id)
+        return syllable_db
+
+    # existing syllable
+    syllable_id = (
+        await db.execute(
+            update(models.Syllable)
+            .where(models.Syllable.syllable_id == syllable.syllable_id)
+            .where(models.Syllable.user_id == user_id)
+            .values(
+                word=syllable.word,
+                transcription=syllable.transcription,
+                translations=syllable.translations,
+                examples=syllable.examples,
+            )
+            .returning(models.Syllable.syllable_id)
+        )
+    ).scalar_one_or_none()
+    if syllable_id is None:
+        return None
+
+    kept = [p for p in syllable.paragraphs if p.paragraph_id]
+    added = [p for p in syllable.paragraphs if not p.paragraph_id]
+    paragraph = models.SyllableParagraph
+
+    # delete absent paragraphs
+    await db.execute(
+        delete(paragraph)
+        .where(paragraph.syllable_id == syllable_id)
+        .where(paragraph.paragraph_id.not_in({p.paragraph_id for p in kept}))
+    )
 
-        for paragraph in syllable.paragraphs:
-            paragraph_db = models.SyllableParagraph(
-                example=paragraph.example,
-                translate=paragraph.translate,
-                sequence=paragraph.sequence,
-                syllable_id=syllable_db.syllable_id,
+    # update existing paragraphs; чужие id отсекает условие по syllable_id
+    if kept:
+        v = sql_values(
+            column("paragraph_id", Integer),
+            column("example", Text),
+            column("translate", Text),
+            column("sequence", Integer),
+            name="kept",
+        ).data(
+            [(p.paragraph_id, p.example, p.translate, p.sequence) for p in kept]
+        )
+        await db.execute(
+            update(paragraph)
+            .where(paragraph.paragraph_id == v.c.paragraph_id)
+            .where(paragraph.syllable_id == syllable_id)
+            .values(
+                example=v.c.example,
+                translate=v.c.translate,
+                # NULL в VALUES PostgreSQL считает text
+                sequence=cast(v.c.sequence, Integer),
             )
-            db.add(paragraph_db)
+        )
 
-    await db.flush()
-    return syllable_db
+    # add new paragraphs
+    if added:
+        await db.execute(
+            insert(paragraph).values(
+                [
+                    {
+                        "syllable_id": syllable_id,
+                        "example": p.example,
+                        "translate": p.translate,
+                        "sequence": p.sequence,
+                    }
+                    for p in added
+                ]
+            )
+        )
+
+    vocabulary.invalidate(db, user_id)
+    result = await db.execute(
+        select(models.Syllable)
+        .where(models.Syllable.syllable_id == syllable_id)
+        .options(selectinload(models.Syllable.paragraphs))
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one()
+
+
+async def add_syllables(
+    db: AsyncSession,
+    user_id: int,
+    rows: list[tuple[str, str, Optional[str]]],
+) -> int:
+    """Добавляет пачку слов (word, translations, transcription) без примеров
+
+    Слова, которые уже есть у пользователя, отсекаются одним SELECT по всей
+    пачке, новые пишутся одним многострочным INSERT (ON CONFLICT DO NOTHING
+    на случай уникального word). Возвращает число добавленных слов.
+    """
+    new = {}
+    for word, translations, transcription in rows:
+        new.setdefault(word, (translations, transcription))
+    if not new:
+        return 0
+    existing = await db.execute(
+        select(models.Syllable.word)
+        .where(models.Syllable.user_id == user_id)
+        .where(models.Syllable.word.in_(new.keys()))
+    )
+    for (word,) in existing:
+        new.pop(word, None)
+    if not new:
+        return 0
+    now = datetime.utcnow()
+    result = await db.execute(
+        pg_insert(models.Syllable)
+        .values(
+            [
+                {
+                    "word": word,
+                    "translations": translations,
+                    "transcription": transcription,
+                    "show_count": 0,
+                    "ready": 0,
+                    "last_view": now,
+                    "due_at": now,
+                    "user_id": user_id,
+                }
+                for word, (translations, transcription) in new.items()
+            ]
+        )
+        .on_conflict_do_nothing()
+        .returning(models.Syllable.syllable_id)
+    )
+    added = len(result.all())
+    if added:
+        vocabulary.invalidate(db, user_id)
+    return added
 
 
 async def set_syllable_as_viewed(
-    db: AsyncSession, sillable_id: int, username: str
+    db: AsyncSession,
+    sillable_id: int,
+    user_id: int,
+    grade: int,
 ):
+    """Отмечает показ слова и планирует следующий по оценке ответа"""
     result = await db.execute(
         select(models.Syllable)
-        .join(models.User)
         .where(models.Syllable.syllable_id == sillable_id)
-        .where(models.User.name == username)
+        .where(models.Syllable.user_id == user_id)
     )
     syllable = result.scalar_one_or_none()
-    syllable.last_view = datetime.utcnow()
-    syllable.show_count += 1
-    await db.flush()
+    if syllable:
+        now = datetime.utcnow()
+        if srs.review(syllable, grade, now):
+            await stats.add_reviews(db, user_id, "syllables", {now.date(): 1})
+        await db.flush()
 
 
 async def get_next_syllable(
-    db: AsyncSession, current_syllable_id: int, username: str
+    db: AsyncSession,
+    current_syllable_id: int,
+    user_id: int,
+    grade: int,
 ) -> Optional[dto.Syllable]:
+    """Оценивает текущее слово и возвращает слово с ближайшим due_at"""
     if current_syllable_id:
-        await set_syllable_as_viewed(db, current_syllable_id, username)
+        await set_syllable_as_viewed(db, current_syllable_id, user_id, grade)
 
     result = await db.execute(
         select(models.Syllable)
-        .join(models.User)
         .where(models.Syllable.ready == 0)
-        .where(models.User.name == username)
+        .where(models.Syllable.user_id == user_id)
         .options(selectinload(models.Syllable.paragraphs))
-        .order_by(models.Syllable.last_view)
+        .order_by(models.Syllable.due_at)
         .limit(1)
     )
     syllable = result.scalar_one_or_none()
@@ -152,111 +241,127 @@ async def get_next_syllable(
     return dto.Syllable.model_validate(syllable, from_attributes=True)
 
 
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
 async def get_syllables_by_word_part(
     db: AsyncSession,
-    user_name: str,
+    user_id: int,
     ready: int,
     word_part: str = "",
     offset: int = 0,
     limit: int = 100,
+    after: Optional[str] = None,
+    prefix: bool = False,
 ):
     """Возвращает список слогов по подстроке слова, только для слов на изучении
 
-    используется для поиска слов среди добавленных на изучение
+    используется для поиска слов среди добавленных на изучение.
+    prefix=True ищет только по началу слова (btree text_pattern_ops),
+    иначе по подстроке (GIN pg_trgm). after - последнее слово предыдущей
+    страницы, с ним offset не учитывается и глубокие страницы не
+    замедляются.
     """
 
     base = (
         select(models.Syllable)
-        .join(models.User)
         .where(models.Syllable.ready == ready)
-        .where(models.User.name == user_name)
+        .where(models.Syllable.user_id == user_id)
     )
 
     if word_part:
-        base = base.where(models.Syllable.word.contains(word_part))
+        pattern = _like_escape(word_part) + "%"
+        if not prefix:
+            pattern = "%" + pattern
+        # шаблон подставляется в SQL литералом: с параметром подготовленного
+        # запроса общий план не может взять индекс по началу слова
+        pattern = bindparam("word_pattern", pattern, literal_execute=True)
+        base = base.where(models.Syllable.word.like(pattern, escape="\\"))
+    if after is not None:
+        base = base.where(models.Syllable.word > after)
+    else:
+        base = base.offset(offset)
 
-    result = await db.execute(
-        base.order_by(models.Syllable.word).offset(offset).limit(limit)
-    )
+    result = await db.execute(base.order_by(models.Syllable.word).limit(limit))
     return result.scalars().all()
 
 
-async def get_syllables_count_repeated_today(
-    db: AsyncSession, username: str
-) -> int:
-    user_id = await users.aget_user_id(db, username)
-    result = await db.execute(
-        select(func.count(models.Syllable.syllable_id))
-        .where(
-            models.Syllable.last_view
-            >= datetime.utcnow().date() - timedelta(days=1)
-        )
+async def get_syllables_queue(
+    db: AsyncSession,
+    user_id: int,
+    limit: int,
+    exclude: Optional[list[int]] = None,
+) -> list[models.Syllable]:
+    """Следующие limit слов по due_at вместе с примерами, двумя запросами
+
+    exclude - слова, которые уже есть в очереди клиента.
+    """
+    stmt = (
+        select(models.Syllable)
+        .where(models.Syllable.ready == 0)
         .where(models.Syllable.user_id == user_id)
+        .options(selectinload(models.Syllable.paragraphs))
+        .order_by(models.Syllable.due_at)
+        .limit(limit)
     )
-    return result.scalar_one()
+    if exclude:
+        stmt = stmt.where(models.Syllable.syllable_id.not_in(exclude))
+    result = await db.execute(stmt)
+    return result.scalars().all()
 
 
-async def get_user_syllables_in_text(
-    db: AsyncSession, text: str, username: str
-):
+async def submit_reviews(
+    db: AsyncSession, user_id: int, reviews: list[dto.ReviewIn]
+) -> int:
+    """Применяет пачку ответов по словам (см. srs.apply_reviews)"""
+    return await srs.apply_reviews(db, models.Syllable, user_id, reviews)
+
+
+async def get_user_syllables_in_text(db: AsyncSession, text: str, user_id: int):
     """
     Возвращает список слов (Syllable) пользователя на изучении (ready == 0),
-    которые встречаются в переданном тексте. Реляции paragraphs подгружаются
-    так же, как это делается в get_syllable (см. options(selectinload(...))).
+    которые встречаются в переданном тексте.
 
-    Сопоставление слов выполняется по регистронезависимому сравнению
+    Сопоставление выполняется по регистронезависимому сравнению
     с учётом границ слов: из текста извлекаются токены вида [\w'-]+.
+    Словарь пользователя компилируется один раз и кэшируется в памяти
+    воркера (см. db.vocabulary), поэтому БД читается только при промахе.
     """
-
-    # Извлекаем слова из текста и нормализуем к нижнему регистру
-    tokens = set(
-        w.lower() for w in re.findall(r"\b[\w'-]+\b", text, flags=re.UNICODE)
-    )
-    if not tokens:
-        return []
-
-    user_id = await users.aget_user_id(db, username)
-
-    result = await db.execute(
-        select(models.Syllable)
-        .where(models.Syllable.user_id == user_id)
-        .where(models.Syllable.ready == 0)
-        .where(func.lower(models.Syllable.word).in_(tokens))
-        .options(selectinload(models.Syllable.paragraphs))
-        .order_by(models.Syllable.word)
-    )
-    return result.scalars().all()
+    matcher = await vocabulary.get_matcher(db, user_id)
+    return matcher.match(text)
 
 
 async def set_syllable_as_learned(
-    db: AsyncSession, syllable_id: int, username: str
+    db: AsyncSession, syllable_id: int, user_id: int
 ):
     """Помечает слово как изученное"""
 
     result = await db.execute(
         select(models.Syllable)
-        .join(models.User)
         .where(models.Syllable.syllable_id == syllable_id)
-        .where(models.User.name == username)
+        .where(models.Syllable.user_id == user_id)
     )
     syllable = result.scalar_one_or_none()
     if syllable:
         syllable.ready = 1
         await db.flush()
+        vocabulary.invalidate(db, user_id)
 
 
 async def set_syllable_as_unlearned(
-    db: AsyncSession, syllable_id: int, username: str
+    db: AsyncSession, syllable_id: int, user_id: int
 ):
     """Помечает слово как не изученное"""
 
     result = await db.execute(
         select(models.Syllable)
-        .join(models.User)
         .where(models.Syllable.syllable_id == syllable_id)
-        .where(models.User.name == username)
+        .where(models.Syllable.user_id == user_id)
     )
     syllable = result.scalar_one_or_none()
     if syllable:
         syllable.ready = 0
+        syllable.due_at = datetime.utcnow()
         await db.flush()
+        vocabulary.invalidate(db, user_id)
@@ -1,3 +1,5 @@
+import time
+
 from sqlalchemy.orm import Session
 
 from db import models
@@ -26,12 +28,34 @@ async def aget_user(db: AsyncSession, username: str):
     return result.scalar_one_or_none()
 
 
+# Кэш имя -> user_id в памяти воркера. Хранятся только найденные
+# пользователи, поэтому только что зарегистрированный виден сразу
+USER_ID_TTL = 300.0
+USER_ID_CACHE_SIZE = 10_000
+_user_ids: dict[str, tuple[int, float]] = {}
+
+
+def invalidate_user_id(username: str) -> None:
+    """Сбрасывает кэш user_id (регистрация, переименование, удаление)"""
+    _user_ids.pop(username, None)
+
+
 async def aget_user_id(db: AsyncSession, username: str):
+    if not username:
+        return None
+    cached = _user_ids.get(username)
+    if cached is not None and cached[1] > time.monotonic():
+        return cached[0]
+
     result = await db.execute(
         select(models.User.user_id).where(models.User.name == username)
     )
     user_id = result.scalar_one_or_none()
     if user_id is not None:
+        if len(_user_ids) >= USER_ID_CACHE_SIZE:
+            _user_ids.clear()
+        _user_ids[username] = (user_id, time.monotonic() + USER_ID_TTL)
         return user_id
     else:
+        _user_ids.pop(username, None)
         return None
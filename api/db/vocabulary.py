@@ -0,0 +1,244 @@
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+
+from book_import.segmenter import TOKEN_RE
+from db import models, dto
+from language.lemmatizer import lemma, lemmas
+
+# Сколько пользователей держать в памяти воркера
+MAX_USERS = 1_000
+
+
+def tokenize(text: str) -> list[str]:
+    """Токены текста в нижнем регистре, как их сопоставляет словарь"""
+    return TOKEN_RE.findall(text.lower())
+
+
+class VocabularyMatcher:
+    """Словарь пользователя, скомпилированный для поиска в тексте
+
+    Однословные записи ищутся по хеш-таблице уникальных токенов текста,
+    многословные - автоматом Ахо-Корасик по последовательности токенов,
+    поэтому совпадение всегда приходится на границы слов. И записи, и
+    токены текста приводятся к ключу словоформы (language.lemmatizer),
+    так что "ran" находит "run", а "gave up" - "give up".
+    """
+
+    def __init__(self, syllables: list[dto.Syllable]):
+        self.words: dict[str, list[dto.Syllable]] = {}
+        # узел автомата: переходы, суффиксная ссылка, найденные записи
+        # вместе с их длиной в токенах
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[tuple[dto.Syllable, int]]] = [[]]
+        for syllable in syllables:
+            tokens = lemmas(tokenize(syllable.word or ""))
+            if len(tokens) == 1:
+                self.words.setdefault(tokens[0], []).append(syllable)
+            elif tokens:
+                self._add_phrase(tokens, syllable)
+        self._build_links()
+
+    def _add_phrase(self, tokens: list[str], syllable: dto.Syllable):
+        node = 0
+        for token in tokens:
+            nxt = self._goto[node].get(token)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][token] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((syllable, len(tokens)))
+
+    def _build_links(self):
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for token, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(token, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    @property
+    def has_phrases(self) -> bool:
+        return len(self._goto) > 1
+
+    def __bool__(self) -> bool:
+        return bool(self.words) or self.has_phrases
+
+    def _phrases(self, tokens: list[str]):
+        """(индекс последнего токена, запись, длина в токенах) фраз"""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, token in enumerate(tokens):
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            for syllable, length in out[node]:
+                yield i, syllable, length
+
+    def match(self, text: str) -> list[dto.Syllable]:
+        """Записи словаря, встречающиеся в тексте, по алфавиту"""
+        tokens = tokenize(text)
+        found: dict[int, dto.Syllable] = {}
+        for token in set(tokens):
+            for syllable in self.words.get(lemma(token), ()):
+                found[syllable.syllable_id] = syllable
+        if self.has_phrases:
+            for _, syllable, _ in self._phrases(lemmas(tokens)):
+                found[syllable.syllable_id] = syllable
+        return sorted(found.values(), key=lambda s: s.word)
+
+    def find(
+        self, tokens: list[str], starts: list[int]
+    ) -> list[tuple[int, int, dto.Syllable]]:
+        """Вхождения записей в уже разбитом на токены предложении
+
+        Возвращает (начало, конец, запись) в символах предложения.
+        """
+        spans = []
+        words = self.words
+        for token, start in zip(tokens, starts):
+            for syllable in words.get(lemma(token), ()):
+                spans.append((start, start + len(token), syllable))
+        if self.has_phrases:
+            for i, syllable, length in self._phrases(lemmas(tokens)):
+                start = starts[i - length + 1]
+                spans.append((start, starts[i] + len(tokens[i]), syllable))
+        spans.sort(key=lambda span: (span[0], -span[1]))
+        return spans
+
+
+class VocabularyCache:
+    """Скомпилированные словари пользователей, LRU по числу пользователей
+
+    Словарь хранится вместе с версией (users.vocabulary_version), из
+    которой он собран, и отдаётся только для той же версии: так воркер
+    видит изменения, сделанные в других воркерах.
+    """
+
+    def __init__(self, max_users: int = MAX_USERS):
+        self.max_users = max_users
+        self._matchers: OrderedDict[int, tuple[VocabularyMatcher, int]] = (
+            OrderedDict()
+        )
+
+    def get(self, user_id: int, version: int) -> Optional[VocabularyMatcher]:
+        entry = self._matchers.get(user_id)
+        if entry is None or entry[1] != version:
+            return None
+        self._matchers.move_to_end(user_id)
+        return entry[0]
+
+    def put(
+        self, user_id: int, version: int, matcher: VocabularyMatcher
+    ) -> None:
+        self._matchers[user_id] = (matcher, version)
+        self._matchers.move_to_end(user_id)
+        while len(self._matchers) > self.max_users:
+            self._matchers.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        self._matchers.pop(user_id, None)
+
+
+cache = VocabularyCache()
+
+
+async def get_matcher(db: AsyncSession, user_id: int) -> VocabularyMatcher:
+    """Словарь пользователя из кэша или собранный из слов на изучении
+
+    Версия читается до слов, поэтому собранный словарь не старше неё.
+    """
+    version = await db.scalar(
+        select(models.User.vocabulary_version).where(
+            models.User.user_id == user_id
+        )
+    )
+    matcher = cache.get(user_id, version)
+    if matcher is not None:
+        return matcher
+    result = await db.execute(
+        select(models.Syllable)
+        .where(models.Syllable.user_id == user_id)
+        .where(models.Syllable.ready == 0)
+        .options(selectinload(models.Syllable.paragraphs))
+    )
+    matcher = VocabularyMatcher(
+        [
+            dto.Syllable.model_validate(s, from_attributes=True)
+            for s in result.scalars()
+        ]
+    )
+    cache.put(user_id, version, matcher)
+    return matcher
+
+
+async def unknown_words(
+    db: AsyncSession, user_id: int, words: list[str]
+) -> list[str]:
+    """Слова (в нижнем регистре), которых нет в словаре пользователя
+
+    Отсеиваются совпадения с любой записью, в том числе выученной, и
+    словоформы слов на изучении ("ran" при записи "run").
+    """
+    if not words:
+        return []
+    lowered = func.lower(models.Syllable.word)
+    known = set(
+        await db.scalars(
+            select(lowered)
+            .where(models.Syllable.user_id == user_id)
+            .where(lowered.in_(words))
+        )
+    )
+    matcher = await get_matcher(db, user_id)
+    return [
+        word
+        for word in words
+        if word not in known and lemma(word) not in matcher.words
+    ]
+
+
+def invalidate(db: AsyncSession, user_id: int) -> None:
+    """Сбрасывает словарь сразу и ещё раз после фиксации транзакции
+
+    Перед фиксацией в той же транзакции увеличивается версия словаря,
+    и остальные воркеры пересоберут его при следующем обращении.
+    Повторный сброс нужен, чтобы параллельный запрос не закэшировал
+    словарь, прочитанный до фиксации изменений.
+    """
+    cache.invalidate(user_id)
+    db.sync_session.info.setdefault("vocabulary_users", set()).add(user_id)
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_version(session: Session):
+    users = session.info.get("vocabulary_users")
+    if users:
+        session.execute(
+            update(models.User)
+            .where(models.User.user_id.in_(users))
+            .values(vocabulary_version=models.User.vocabulary_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session):
+    for user_id in session.info.pop("vocabulary_users", ()):
+        cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session: Session):
+    session.info.pop("vocabulary_users", None)
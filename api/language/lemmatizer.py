@@ -0,0 +1,323 @@
+"""Приведение английских словоформ к общему ключу для поиска по словарю
+
+Правила без внешних зависимостей: таблица неправильных форм и отсечение
+окончаний -s/-es/-ies, -ed/-ied, -ing со снятием удвоенной согласной и
+возвратом отброшенного -e (hoped -> hope). Ключ не обязан быть словарной
+формой - важно лишь, что "run", "ran", "running" и "runs" дают один и тот
+же ключ, поэтому к нему приводятся и слова словаря, и токены текста.
+Слово без окончания ключом служит само, так что "not" не совпадает с
+"note".
+"""
+
+from functools import lru_cache
+
+# Сколько разных токенов помнить (на процесс)
+LEMMA_CACHE_SIZE = 200_000
+
+_VOWELS = frozenset("aeiouy")
+
+# Неправильные формы -> исходная форма
+_IRREGULAR_VERBS = {
+    "be": "was were been being am is are",
+    "have": "has had having",
+    "do": "does did done doing",
+    "go": "went gone goes",
+    "say": "said says",
+    "make": "made",
+    "take": "took taken",
+    "come": "came",
+    "see": "saw seen",
+    "know": "knew known",
+    "get": "got gotten",
+    "give": "gave given",
+    "find": "found",
+    "think": "thought",
+    "tell": "told",
+    "become": "became",
+    "leave": "left",
+    "feel": "felt",
+    "bring": "brought",
+    "begin": "began begun",
+    "keep": "kept",
+    "hold": "held",
+    "write": "wrote written",
+    "stand": "stood",
+    "hear": "heard",
+    "mean": "meant",
+    "meet": "met",
+    "run": "ran",
+    "pay": "paid",
+    "sit": "sat",
+    "speak": "spoke spoken",
+    "lead": "led",
+    "grow": "grew grown",
+    "lose": "lost",
+    "fall": "fell fallen",
+    "send": "sent",
+    "build": "built",
+    "understand": "understood",
+    "draw": "drew drawn",
+    "break": "broke broken",
+    "spend": "spent",
+    "rise": "risen",
+    "drive": "drove driven",
+    "buy": "bought",
+    "wear": "wore worn",
+    "choose": "chose chosen",
+    "seek": "sought",
+    "throw": "threw thrown",
+    "catch": "caught",
+    "deal": "dealt",
+    "win": "won",
+    "forget": "forgot forgotten",
+    "sell": "sold",
+    "fight": "fought",
+    "teach": "taught",
+    "eat": "ate eaten",
+    "sing": "sang sung",
+    "swim": "swam swum",
+    "drink": "drank drunk",
+    "ring": "rang rung",
+    "fly": "flew flown flies",
+    "forgive": "forgave forgiven",
+    "freeze": "froze frozen",
+    "hide": "hid hidden",
+    "ride": "rode ridden",
+    "shake": "shook shaken",
+    "steal": "stole stolen",
+    "strike": "struck stricken",
+    "swear": "swore sworn",
+    "tear": "tore torn",
+    "wake": "woke woken",
+    "bite": "bitten",
+    "blow": "blew blown",
+    "dig": "dug",
+    "feed": "fed",
+    "flee": "fled",
+    "hang": "hung",
+    "light": "lit",
+    "shoot": "shot",
+    "sleep": "slept",
+    "slide": "slid",
+    "stick": "stuck",
+    "sting": "stung",
+    "swing": "swung",
+    "weep": "wept",
+    "bend": "bent",
+    "breed": "bred",
+    "creep": "crept",
+    "kneel": "knelt",
+    "lend": "lent",
+    "shine": "shone",
+    "spin": "spun",
+    "sweep": "swept",
+    "swell": "swollen",
+    "tread": "trod trodden",
+    "weave": "wove woven",
+    "use": "used uses using",
+    "lie": "lying lain",
+    "die": "dying",
+    "tie": "tied tying",
+}
+_IRREGULAR_NOUNS = {
+    "man": "men",
+    "woman": "women",
+    "child": "children",
+    "foot": "feet",
+    "tooth": "teeth",
+    "goose": "geese",
+    "mouse": "mice",
+    "person": "people",
+    "wife": "wives",
+    "knife": "knives",
+    "wolf": "wolves",
+    "half": "halves",
+    "self": "selves",
+    "shelf": "shelves",
+    "thief": "thieves",
+}
+IRREGULAR = {
+    form: base
+    for table in (_IRREGULAR_VERBS, _IRREGULAR_NOUNS)
+    for base, forms in table.items()
+    for form in forms.split()
+}
+# Слова, похожие на форму, но ею не являющиеся: не изменяются
+INVARIANT = frozenset(
+    {
+        "news",
+        "always",
+        "perhaps",
+        "series",
+        "species",
+        "means",
+        "whereas",
+        "yes",
+        "this",
+        "his",
+        "its",
+        "us",
+        "thus",
+        "plus",
+        "gas",
+        "bus",
+        "lens",
+        "during",
+        "evening",
+        "morning",
+        "nothing",
+        "something",
+        "anything",
+        "everything",
+        "ceiling",
+        "bring",
+        "thing",
+        "king",
+        "sing",
+        "ring",
+        "spring",
+        "string",
+        "wing",
+        "sibling",
+        "pudding",
+        "building",
+        "need",
+        "seed",
+        "speed",
+        "feed",
+        "bleed",
+        "breed",
+        "greed",
+        "proceed",
+        "succeed",
+        "exceed",
+        "indeed",
+        "bed",
+        "red",
+        "shed",
+        "wed",
+        "hundred",
+    }
+)
+
+
+def _undouble(stem: str) -> str:
+    """stopp -> stop, runn -> run (кроме ll, ss, zz и коротких add, egg)"""
+    if (
+        len(stem) > 3
+        and stem[-1] == stem[-2]
+        and stem[-1] not in _VOWELS
+        and stem[-1] not in "lsz"
+    ):
+        return stem[:-1]
+    return stem
+
+
+def _has_vowel(stem: str) -> bool:
+    return any(ch in _VOWELS for ch in stem)
+
+
+def _vowels(word: str) -> list[bool]:
+    """Гласные по позициям; y - гласная только после согласной (try, но
+    yes, play)"""
+    result = []
+    for i, ch in enumerate(word):
+        result.append(
+            ch in "aeiou" or (ch == "y" and i > 0 and not result[i - 1])
+        )
+    return result
+
+
+def _single_syllable_cvc(stem: str) -> bool:
+    """Один слог на согласная-гласная-согласная: hop, writ, но не open"""
+    if len(stem) < 3 or stem[-1] in "wxy":
+        return False
+    vowels = _vowels(stem)
+    if vowels[-3:] != [False, True, False]:
+        return False
+    groups = sum(
+        vowel and (i == 0 or not vowels[i - 1])
+        for i, vowel in enumerate(vowels)
+    )
+    return groups == 1
+
+
+def _restore_e(stem: str) -> str:
+    """Возвращает -e, отброшенное перед -ed/-ing: hop -> hope, believ ->
+    believe, settl -> settle, continu -> continue, educat -> educate"""
+    if (
+        stem.endswith(("v", "u", "c", "dg", "rg", "z"))
+        or (stem.endswith("s") and not stem.endswith(("ss", "us")))
+        or (
+            stem.endswith("l")
+            and stem[-2] not in _VOWELS
+            and stem[-2] not in "lrw"
+        )
+        or (
+            # relat -> relate, но treat, float
+            stem.endswith("at") and len(stem) > 4 and stem[-3] not in _VOWELS
+        )
+        or _single_syllable_cvc(stem)
+    ):
+        return stem + "e"
+    return stem
+
+
+def _strip_ending(stem: str) -> str:
+    """Основа без -ed/-ing: удвоенная согласная снимается, -e
+    возвращается"""
+    undoubled = _undouble(stem)
+    if undoubled != stem:
+        return undoubled
+    return _restore_e(stem)
+
+
+def _strip_suffix(token: str) -> str:
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if (
+        token.endswith("es")
+        and (
+            token[:-2].endswith(("ss", "x", "zz", "ch", "sh"))
+            # buses -> bus, lenses -> lens
+            or (token.endswith("ses") and token[:-2] in INVARIANT)
+        )
+    ):
+        return token[:-2]
+    if (
+        token.endswith("s")
+        and not token.endswith(("ss", "us", "is"))
+        and len(token) > 3
+    ):
+        return token[:-1]
+    if token.endswith("ied"):
+        # died -> die, studied -> study
+        return token[:-1] if len(token) == 4 else token[:-3] + "y"
+    if token.endswith("eed") and len(token) > 4:
+        # agreed -> agree, freed -> free
+        return token[:-1]
+    if token.endswith("ed") and len(token) > 4 and _has_vowel(token[:-2]):
+        return _strip_ending(token[:-2])
+    if token.endswith("ing") and len(token) > 5 and _has_vowel(token[:-3]):
+        return _strip_ending(token[:-3])
+    return token
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemma(token: str) -> str:
+    """Ключ словоформы (токен в нижнем регистре) для поиска по словарю
+
+    Токен без окончания остаётся как есть, поэтому "not" и "note",
+    "her" и "here" - разные ключи.
+    """
+    if token.endswith("'s"):
+        token = token[:-2]
+    elif token.endswith("'"):
+        token = token[:-1]
+    if not token.isalpha() or token in INVARIANT:
+        return token
+    return IRREGULAR.get(token) or _strip_suffix(token)
+
+
+def lemmas(tokens: list[str]) -> list[str]:
+    return [lemma(token) for token in tokens]
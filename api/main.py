@@ -1,6 +1,18 @@
+from contextlib import asynccontextmanager
 from typing import Literal, Optional
 
-from fastapi import FastAPI, Request, Form, Depends, HTTPException, Response
+from fastapi import (
+    FastAPI,
+    Request,
+    Form,
+    Depends,
+    HTTPException,
+    Response,
+    Query,
+    UploadFile,
+    File,
+    BackgroundTasks,
+)
 from datetime import datetime, timezone
 import hashlib
 from fastapi.responses import StreamingResponse, JSONResponse
@@ -15,18 +27,56 @@ from sqlalchemy.ext.asyncio import (
 )
 from sqlalchemy.exc import OperationalError, DBAPIError
 
-from db import syllables, books, phrases, models, dto, pages
+from db import (
+    syllables,
+    books,
+    phrases,
+    models,
+    dto,
+    pages,
+    srs,
+    stats,
+    users,
+    reading_buffer,
+    paragraph_cache,
+)
 from pydantic import BaseModel
 from io import BytesIO
 import gtts
 import httpx
 import json
+import logging
 import anyio
+import asyncio
 
 from db.dto import SyllablesInTextIn
-from wooordhunt import parser
+from wooordhunt import cache as dictionary_cache, fetcher, prewarm
+from wooordhunt.models import DictionaryEntry
+from book_import import importer, readers
+from vocabulary_import import importer as vocabulary_importer
+from vocabulary_import import readers as vocabulary_readers
+from paragraph_store import store as paragraph_store
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    flush_task = asyncio.create_task(
+        reading_buffer.flush_periodically(SessionLocal)
+    )
+    prewarm_task = asyncio.create_task(prewarm.prewarmer.run(SessionLocal))
+    yield
+    flush_task.cancel()
+    prewarm_task.cancel()
+    # при остановке сбрасываем то, что не успело записаться
+    async with SessionLocal() as db:
+        await reading_buffer.buffer.flush(db)
+    importer.shutdown_pool()
+    await fetcher.close()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -129,27 +179,42 @@ async def dbapi_error_handler(request: Request, exc: DBAPIError):
 from sqlalchemy import select
 
 
-async def get_current_user(
-    request: Request, db: AsyncSession = Depends(get_db)
-):
+async def _resolve_user(request: Request) -> Optional[dto.UserContext]:
+    username = request.session.get("user")
+    if not username:
+        return None
+    # сессия подключается к БД только при промахе кэша user_id
+    async with SessionLocal() as db:
+        user_id = await users.aget_user_id(db, username)
+    if not user_id:
+        return None
+    return dto.UserContext(user_id=user_id, name=username)
+
+
+async def get_user_context(request: Request) -> dto.UserContext:
+    """Пользователь сессии, разрешается один раз на запрос"""
     username = request.session.get("user")
     if not username:
         raise HTTPException(status_code=401, detail="Требуется авторизация")
-    result = await db.execute(
-        select(models.User).where(models.User.name == username)
-    )
-    user = result.scalar_one_or_none()
-    if not user:
+    user = await _resolve_user(request)
+    if user is None:
         raise HTTPException(status_code=401, detail="Пользователь не найден")
     return user
 
 
+async def get_optional_user_context(
+    request: Request,
+) -> Optional[dto.UserContext]:
+    """Как get_user_context, но без авторизации возвращает None"""
+    return await _resolve_user(request)
+
+
 # --- API ---
 @app.post("/api/set_password")
 async def set_password(
     target_username: str = Form(...),
     new_password: str = Form(...),
-    current_user: models.User = Depends(get_current_user),
+    current_user: dto.UserContext = Depends(get_user_context),
     db: AsyncSession = Depends(get_db_autocommit),
 ):
     # ищем пользователя, чьё имя указано
@@ -194,6 +259,7 @@ async def register(
     new_user = models.User(name=username, hashed_password=hashed_password)
     db.add(new_user)
     await db.commit()
+    users.invalidate_user_id(username)
     return {"message": "Регистрация успешна"}
 
 
@@ -222,22 +288,16 @@ async def logout(request: Request):
 
 
 @app.get("/api/secret")
-async def secret(user: models.User = Depends(get_current_user)):
+async def secret(user: dto.UserContext = Depends(get_user_context)):
     return {"message": f"Секретная страница, {user.name}!"}
 
 
 # --- Доп.эндпоинт для проверки сессии ---
 @app.get("/api/me")
-async def me(request: Request, db: AsyncSession = Depends(get_db)):
-    username = request.session.get("user")
-    if not username:
-        return {"authenticated": False}
-    user = (
-        await db.execute(
-            select(models.User).where(models.User.name == username)
-        )
-    ).scalar_one_or_none()
-    if not user:
+async def me(
+    user: Optional[dto.UserContext] = Depends(get_optional_user_context),
+):
+    if user is None:
         return {"authenticated": False}
     return {
         "authenticated": True,
@@ -248,125 +308,187 @@ async def me(request: Request, db: AsyncSession = Depends(get_db)):
 
 @app.get("/api/phrases", response_model=list[dto.Phrase])
 async def phrases_list(
-    request: Request,
     ready: Literal["0", "1"] = "0",
+    user: dto.UserContext = Depends(get_user_context),
     db: AsyncSession = Depends(get_db),
 ):
-    return await phrases.get_phrases_by_user(
-        db, request.session.get("user"), int(ready)
-    )
+    return await phrases.get_phrases_by_user(db, user.user_id, int(ready))
 
 
 @app.get("/api/phrase", response_model=dto.Phrase)
 async def get_phrase_by_id(
-    request: Request, id_phrase: int, db: AsyncSession = Depends(get_db)
+    id_phrase: int,
+    user: dto.UserContext = Depends(get_user_context),
+    db: AsyncSession = Depends(get_db),
 ):
-    if request.session.get("user"):
-        return await phrases.get_phrase_by_id(
-            db, id_phrase, request.session.get("user")
-        )
-    else:
-        raise HTTPException(status_code=401, detail="Требуется авторизация")
+    return await phrases.get_phrase_by_id(db, id_phrase, user.user_id)
 
 
 @app.post("/api/phrase/status")
 async def set_phrase_status(
-    request: Request,
     id_phrase: int,
     status: Literal["0", "1"],
+    user: dto.UserContext = Depends(get_user_context),
     db: AsyncSession = Depends(get_db_autocommit),
 ):
-    if request.session.get("user"):
-        await phrases.set_phrase_status(
-            db, id_phrase, int(status), request.session.get("user")
-        )
-    else:
-        raise HTTPException(status_code=401, detail="Требуется авторизация")
+    await phrases.set_phrase_status(db, id_phrase, int(status), user.user_id)
 
 
 @app.get("/api/phrase/next", response_model=dto.Phrase)
 async def get_next_phrase(
-    request: Request,
     current_phrase_id: int,
+    grade: int = Query(ge=srs.MIN_GRADE, le=srs.MAX_GRADE),
+    user: dto.UserContext = Depends(get_user_context),
     db: AsyncSession = Depends(get_db_autocommit),
 ):
-    if request.session.get("user"):
-        return await phrases.get_next_phrase(
-            db, current_phrase_id, request.session.get("user")
-        )
-    else:
-        raise HTTPException(status_code=401, detail="Требуется авторизация")
+    """Оценивает текущую фразу (grade 0..5, SM-2) и возвращает следующую
+
+    Оценка обязательна: показ без оценки не должен засчитываться как
+    верный ответ.
+    """
+    return await phrases.get_next_phrase(
+        db, current_phrase_id, user.user_id, grade
+    )
+
+
+# Сколько карточек отдаётся в очередь клиента за один запрос
+MAX_QUEUE_CARDS = 100
+
+
+@app.get("/api/phrases/queue", response_model=list[dto.Phrase])
+async def get_phrases_queue(
+    limit: int = Query(20, ge=1, le=MAX_QUEUE_CARDS),
+    exclude: list[int] = Query([]),
+    user: dto.UserContext = Depends(get_user_context),
+    db: AsyncSession = Depends(get_db),
+):
+    """Следующие фразы к повторению по расписанию одним ответом
+
+    Для дозаполнения очереди клиент передаёт в exclude id фраз, которые
+    у него уже есть или ответы по которым ещё не отправлены.
+    """
+    return await phrases.get_phrases_queue(db, user.user_id, limit, exclude)
+
+
+@app.post("/api/phrases/reviews", response_model=dto.ReviewBatchResult)
+async def submit_phrase_reviews(
+    payload: dto.ReviewBatchIn,
+    user: dto.UserContext = Depends(get_user_context),
+    db: AsyncSession = Depends(get_db_autocommit),
+):
+    """Пачка ответов по фразам за сессию одной транзакцией
+
+    Можно отправлять после работы без сети: reviewed_at - время ответа,
+    уже применённые ответы при повторной отправке пропускаются.
+    """
+    applied = await phrases.submit_reviews(db, user.user_id, payload.items)
+    return dto.ReviewBatchResult(applied=applied)
 
 
 @app.post("/api/phrase", response_model=dto.Phrase)
 async def phrase(
-    request: Request,
     phrase: dto.Phrase,
+    user: dto.UserContext = Depends(get_user_context),
     db: AsyncSession = Depends(get_db_autocommit),
 ):
-    if request.session.get("user"):
-        return await phrases.save_phrase(
-            db, phrase, request.session.get("user")
-        )
-    else:
-        raise HTTPException(status_code=401, detail="Требуется авторизация")
+    return await phrases.save_phrase(db, phrase, user.user_id)
+
+
+@app.get("/api/stats/today", response_model=dto.TodayStats)
+async def get_today_stats(
+    user: dto.UserContext = Depends(get_user_context),
+    db: AsyncSession = Depends(get_db),
+):
+    """Повторённые сегодня фразы и слова и прочитанные абзацы"""
+    return await stats.get_today(db, user.user_id)
 
 
 @app.get("/api/phrase/repeated_today", response_model=dto.RepeatedToday)
 async def get_phrases_repeated_today(
-    request: Request, db: AsyncSession = Depends(get_db)
+    user: dto.UserContext = Depends(get_user_context),
+    db: AsyncSession = Depends(get_db),
 ):
-    if request.session.get("user"):
-        count = await phrases.get_phrases_count_repeated_today(
-            db, request.session.get("user")
-        )
-        return dto.RepeatedToday(count=count)
-    else:
-        raise HTTPException(status_code=401, detail="Требуется авторизация")
+    today = await stats.get_today(db, user.user_id)
+    return dto.RepeatedToday(count=today.phrases)
 
 
 @app.get("/api/syllable", response_model=dto.Syllable)
 async def get_syllable(
-    request: Request,
     syllable_id: int = None,
+    user: dto.UserContext = Depends(get_user_context),
     db: AsyncSession = Depends(get_db),
 ):
-    return await syllables.get_syllable(
-        db, syllable_id, request.session.get("user")
-    )
+    return await syllables.get_syllable(db, syllable_id, user.user_id)
 
 
 @app.post("/api/syllable", response_model=dto.Syllable)
 async def save_syllable(
-    request: Request,
     syllable_dto: dto.Syllable,
+    user: dto.UserContext = Depends(get_user_context),
     db: AsyncSession = Depends(get_db_autocommit),
 ):
-    return await syllables.save_syllable(
-        db, syllable_dto, request.session.get("user")
-    )
+    syllable = await syllables.save_syllable(db, syllable_dto, user.user_id)
+    if syllable is None:
+        raise HTTPException(status_code=404, detail="Syllable not found.")
+    return syllable
 
 
 @app.get("/api/syllable/next", response_model=Optional[dto.Syllable])
 async def get_next_syllable(
-    request: Request,
     current_syllable_id: int,
+    grade: int = Query(ge=srs.MIN_GRADE, le=srs.MAX_GRADE),
+    user: dto.UserContext = Depends(get_user_context),
     db: AsyncSession = Depends(get_db_autocommit),
 ):
-    username = request.session.get("user")
-    if not username:
-        raise HTTPException(status_code=401, detail="Not authenticated")
+    """Оценивает текущее слово (grade 0..5, SM-2) и возвращает следующее
+
+    Оценка обязательна: показ без оценки не должен засчитываться как
+    верный ответ.
+    """
+    return await syllables.get_next_syllable(
+        db, current_syllable_id, user.user_id, grade
+    )
+
+
+@app.get("/api/syllables/queue", response_model=list[dto.Syllable])
+async def get_syllables_queue(
+    limit: int = Query(20, ge=1, le=MAX_QUEUE_CARDS),
+    exclude: list[int] = Query([]),
+    user: dto.UserContext = Depends(get_user_context),
+    db: AsyncSession = Depends(get_db),
+):
+    """Следующие слова к повторению по расписанию вместе с примерами
 
-    return await syllables.get_next_syllable(db, current_syllable_id, username)
+    Для дозаполнения очереди клиент передаёт в exclude id слов, которые
+    у него уже есть или ответы по которым ещё не отправлены.
+    """
+    return await syllables.get_syllables_queue(db, user.user_id, limit, exclude)
+
+
+@app.post("/api/syllables/reviews", response_model=dto.ReviewBatchResult)
+async def submit_syllable_reviews(
+    payload: dto.ReviewBatchIn,
+    user: dto.UserContext = Depends(get_user_context),
+    db: AsyncSession = Depends(get_db_autocommit),
+):
+    """Пачка ответов по словам за сессию одной транзакцией
+
+    Можно отправлять после работы без сети: reviewed_at - время ответа,
+    уже применённые ответы при повторной отправке пропускаются.
+    """
+    applied = await syllables.submit_reviews(db, user.user_id, payload.items)
+    return dto.ReviewBatchResult(applied=applied)
 
 
 @app.get("/api/syllables/search", response_model=list[dto.Syllable])
 async def get_syllables_by_word_part_endpoint(
-    request: Request,
     ready: Literal["0", "1"] = "0",
     word_part: str = "",
+    prefix: bool = False,
+    after: Optional[str] = None,
     offset: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=500),
+    user: dto.UserContext = Depends(get_user_context),
     db: AsyncSession = Depends(get_db),
 ):
     """Возвращает список слогов по подстроке слова и признаку готовности.
@@ -374,50 +496,75 @@ async def get_syllables_by_word_part_endpoint(
     Параметры:
     - ready: "0" или "1" — фильтр выученности
     - word_part: подстрока для поиска в поле word
+    - prefix: искать word_part только в начале слова
+    - after: последнее слово предыдущей страницы (keyset-пагинация)
     - offset, limit: пагинация
     """
-    username = request.session.get("user")
-    if not username:
-        raise HTTPException(status_code=401, detail="Требуется авторизация")
-
     return await syllables.get_syllables_by_word_part(
         db=db,
-        user_name=username,
+        user_id=user.user_id,
         ready=int(ready),
         word_part=word_part,
         offset=offset,
         limit=limit,
+        after=after,
+        prefix=prefix,
     )
 
 
 @app.get("/api/syllable/repeated_today", response_model=dto.RepeatedToday)
 async def get_syllables_repeated_today(
-    request: Request, db: AsyncSession = Depends(get_db)
+    user: dto.UserContext = Depends(get_user_context),
+    db: AsyncSession = Depends(get_db),
 ):
-    if request.session.get("user"):
-        count = await syllables.get_syllables_count_repeated_today(
-            db, request.session.get("user")
-        )
-        return dto.RepeatedToday(count=count)
-    else:
-        raise HTTPException(status_code=401, detail="Требуется авторизация")
+    today = await stats.get_today(db, user.user_id)
+    return dto.RepeatedToday(count=today.syllables)
 
 
 @app.get("/api/books", response_model=list[dto.BookWithStatsDTO])
-async def get_books(request: Request, db: AsyncSession = Depends(get_db)):
-    return await books.get_user_books_with_stats(
-        db, request.session.get("user")
+async def get_books(
+    user: dto.UserContext = Depends(get_user_context),
+    db: AsyncSession = Depends(get_db),
+):
+    return await books.get_user_books_with_stats(db, user.user_id)
+
+
+@app.get("/api/books/search", response_model=dto.BookSearchResult)
+async def search_books(
+    q: str,
+    id_book: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    user: dto.UserContext = Depends(get_user_context),
+    db: AsyncSession = Depends(get_db),
+):
+    """Поиск фразы в книгах пользователя
+
+    Параметры:
+    - q: поисковый запрос (синтаксис websearch: "фраза", -исключить, or)
+    - id_book: искать только в этой книге
+    - after, limit: пагинация по курсору next_after из предыдущего ответа
+    """
+    if not q.strip():
+        return dto.BookSearchResult(items=[])
+
+    return await books.search_sentences(
+        db,
+        user_id=user.user_id,
+        query=q,
+        id_book=id_book,
+        after=after,
+        limit=limit,
     )
 
 
 @app.get("/api/book", response_model=dto.BookWithStatsDTO)
 async def get_book_information(
-    request: Request, book_id: int, db: AsyncSession = Depends(get_db)
+    book_id: int,
+    user: dto.UserContext = Depends(get_user_context),
+    db: AsyncSession = Depends(get_db),
 ):
-    if not request.session.get("user"):
-        raise HTTPException(status_code=401, detail="User not authenticated")
-
-    book = await books.get_book(db, book_id, request.session.get("user"))
+    book = await books.get_book(db, book_id, user.user_id)
 
     if book is None:
         raise HTTPException(status_code=404, detail="Book not found.")
@@ -427,40 +574,197 @@ async def get_book_information(
 
 @app.get("/api/book/last", response_model=dto.BookDTO)
 async def get_last_opened_book(
-    request: Request, db: AsyncSession = Depends(get_db)
+    user: dto.UserContext = Depends(get_user_context),
+    db: AsyncSession = Depends(get_db),
 ):
-    if not request.session.get("user"):
-        raise HTTPException(status_code=401, detail="User not authenticated")
-
-    return await books.last_opened_book(db, request.session.get("user"))
+    return await books.last_opened_book(db, user.user_id)
 
 
 @app.get("/api/book/paragraph", response_model=list[dto.SentenceDTO])
 async def get_book_paragraph(
-    request: Request,
     id_book: int,
     id_paragraph: int,
+    user: dto.UserContext = Depends(get_user_context),
     db: AsyncSession = Depends(get_db),
 ):
     return await books.get_paragraph(
         db,
         id_book=id_book,
         id_paragraph=id_paragraph,
-        user_name=request.session.get("user"),
+        user_id=user.user_id,
     )
 
 
+# Ограничение размера окна, чтобы один запрос не выгружал всю книгу
+MAX_PARAGRAPHS_WINDOW = 100
+
+
+@app.get("/api/book/paragraphs", response_model=list[dto.ParagraphDTO])
+async def get_book_paragraphs(
+    background_tasks: BackgroundTasks,
+    id_book: int,
+    id_from: int = Query(alias="from"),
+    id_to: int = Query(alias="to"),
+    user: dto.UserContext = Depends(get_user_context),
+    db: AsyncSession = Depends(get_db),
+):
+    """Возвращает окно абзацев книги [from, to] за один запрос"""
+    if id_to < id_from:
+        raise HTTPException(status_code=400, detail="'to' must be >= 'from'")
+    if id_to - id_from + 1 > MAX_PARAGRAPHS_WINDOW:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Window is limited to {MAX_PARAGRAPHS_WINDOW} paragraphs",
+        )
+
+    paragraphs = await books.get_paragraphs_range(
+        db,
+        id_book=id_book,
+        id_from=id_from,
+        id_to=id_to,
+        user_id=user.user_id,
+    )
+    # следующая страница читается в кэш, пока пользователь читает эту
+    if paragraph_cache.READ_AHEAD_PARAGRAPHS > 0:
+        background_tasks.add_task(
+            books.prefetch_paragraphs,
+            SessionLocal,
+            id_book,
+            id_to + 1,
+            id_to + paragraph_cache.READ_AHEAD_PARAGRAPHS,
+        )
+    # статьи незнакомых слов окна и следующих абзацев - в кэш словаря
+    if prewarm.PREWARM_PARAGRAPHS > 0:
+        background_tasks.add_task(
+            prewarm.prewarmer.prewarm_book,
+            SessionLocal,
+            id_book,
+            id_from,
+            id_to + prewarm.PREWARM_PARAGRAPHS,
+            user.user_id,
+        )
+    return paragraphs
+
+
+@app.get("/api/book/study_words", response_model=list[dto.StudyWordHit])
+async def get_book_study_words(
+    id_book: int,
+    id_from: int = Query(alias="from"),
+    id_to: int = Query(alias="to"),
+    user: dto.UserContext = Depends(get_user_context),
+    db: AsyncSession = Depends(get_db),
+):
+    """Слова на изучении в окне абзацев [from, to] со смещениями в предложениях"""
+    if id_to < id_from:
+        raise HTTPException(status_code=400, detail="'to' must be >= 'from'")
+    if id_to - id_from + 1 > MAX_PARAGRAPHS_WINDOW:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Window is limited to {MAX_PARAGRAPHS_WINDOW} paragraphs",
+        )
+
+    return await books.get_study_words(
+        db,
+        id_book=id_book,
+        id_from=id_from,
+        id_to=id_to,
+        user_id=user.user_id,
+    )
+
+
+@app.get(
+    "/api/book/cache_stats",
+    response_model=dto.ParagraphCacheStats,
+    dependencies=[Depends(get_user_context)],
+)
+async def get_paragraph_cache_stats():
+    """Счётчики кэша абзацев текущего воркера"""
+    return paragraph_cache.cache.stats()
+
+
 @app.post("/api/book/paragraph")
 async def save_book_position(
-    request: Request,
     data: dto.BookPositionIn,
-    db: AsyncSession = Depends(get_db_autocommit),
+    user: dto.UserContext = Depends(get_user_context),
 ):
     await books.save_book_position(
-        db,
         id_book=data.id_book,
         new_current_paragraph=data.id_new_paragraph,
-        user_name=request.session.get("user"),
+        user_id=user.user_id,
+    )
+
+
+@app.post("/api/books/import")
+async def import_book_endpoint(
+    file: UploadFile = File(...),
+    book_name: Optional[str] = Form(None),
+    user: dto.UserContext = Depends(get_user_context),
+    db: AsyncSession = Depends(get_db),
+):
+    """Загружает книгу (.txt/.fb2/.epub) для текущего пользователя
+
+    Ответ - поток NDJSON с прогрессом загрузки, последняя строка имеет
+    stage == "done" (и id_book) либо stage == "error".
+    """
+    try:
+        fmt = readers.detect_format(file.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    name = book_name or file.filename.rsplit(".", 1)[0]
+
+    async def _progress_stream():
+        progress = dto.BookImportProgress()
+        try:
+            async for progress in importer.import_book(
+                db,
+                file.file,
+                fmt,
+                book_name=name,
+                user_id=user.user_id,
+                bytes_total=file.size,
+            ):
+                yield progress.model_dump_json() + "\n"
+            if not progress.sentences:
+                raise ValueError("No sentences found in the book")
+            await db.commit()
+            progress.stage = "done"
+        except Exception as e:
+            await db.rollback()
+            progress.stage = "error"
+            progress.detail = str(e)
+        else:
+            try:
+                await paragraph_store.export_book(db, progress.id_book)
+            except Exception:
+                # книга загружена, абзацы будут читаться из БД
+                logger.exception(
+                    "Failed to export book %s to the paragraph store",
+                    progress.id_book,
+                )
+        yield progress.model_dump_json() + "\n"
+
+    return StreamingResponse(
+        _progress_stream(), media_type="application/x-ndjson"
+    )
+
+
+@app.post("/api/vocabulary/import", response_model=dto.VocabularyImportResult)
+async def import_vocabulary_endpoint(
+    file: UploadFile = File(...),
+    kind: Literal["syllables", "phrases"] = Form("syllables"),
+    user: dto.UserContext = Depends(get_user_context),
+    db: AsyncSession = Depends(get_db_autocommit),
+):
+    """Загружает слова или фразы из .csv/.tsv или экспорта Anki (.txt)
+
+    Файл разбирается потоково, уже существующие записи пропускаются.
+    """
+    try:
+        fmt = vocabulary_readers.detect_format(file.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await vocabulary_importer.import_vocabulary(
+        db, file.file, fmt, kind, user.user_id
     )
 
 
@@ -469,11 +773,8 @@ class TTSIn(BaseModel):
     lang: Optional[str] = "en"
 
 
-@app.post("/api/text_to_speech")
-async def text_to_speech(request: Request, payload: TTSIn):
-    if not request.session.get("user"):
-        raise HTTPException(status_code=401, detail="User not authenticated")
-
+@app.post("/api/text_to_speech", dependencies=[Depends(get_user_context)])
+async def text_to_speech(payload: TTSIn):
     text = (payload.text or "").strip()
 
     if not text:
@@ -633,8 +934,8 @@ async def analyze_text_with_llm_local_ollama(payload: LLMAnalyzeIn):
 
 @app.post("/api/syllables/in_text", response_model=list[dto.Syllable])
 async def get_user_syllables_in_text_endpoint(
-    request: Request,
     payload: SyllablesInTextIn,
+    user: dto.UserContext = Depends(get_user_context),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -642,10 +943,6 @@ async def get_user_syllables_in_text_endpoint(
     Текст передаётся в теле запроса: {"text": "..."}
     Требуется авторизация по сессии.
     """
-    username = request.session.get("user")
-    if not username:
-        raise HTTPException(status_code=401, detail="Требуется авторизация")
-
     if payload.text is None:
         raise HTTPException(status_code=400, detail="Text is empty")
 
@@ -655,61 +952,99 @@ async def get_user_syllables_in_text_endpoint(
         return []
 
     return await syllables.get_user_syllables_in_text(
-        db=db, text=text, username=username
+        db=db, text=text, user_id=user.user_id
     )
 
 
-@app.get("/api/word_from_wooordhunt", response_model=dto.Syllable)
-async def word_from_wooordhunt(request: Request, word: str) -> dto.Syllable:
-    lc_link = rf"https://wooordhunt.ru/word/{word}"
-    wh = await anyio.to_thread.run_sync(parser.Wooordhunt, lc_link)
-
-    # Собираем данные не из БД, но приводим их к DTO, совместимому с моделью Syllable
-    examples_list = await anyio.to_thread.run_sync(wh.get_examples) or []
-    # Сконвертируем список примеров в строку для поля examples (Pydantic ожидает str)
+def _syllable_from_entry(word: str, entry: DictionaryEntry) -> dto.Syllable:
+    """Статья словаря в виде DTO, совместимого с моделью Syllable"""
+    examples = entry["examples"]
+    # примеры строкой для поля examples и списком для paragraphs
     examples_text = (
         "\n".join(
-            f"{item.get('example', '').strip()} — {item.get('translate', '') or ''}"
-            for item in examples_list
+            f"{item['example'].strip()} — {item['translate'] or ''}"
+            for item in examples
         )
         or None
     )
-
-    # И одновременно подготовим paragraphs как структурированный список
-    paragraphs = [
-        dto.SyllableParagraph(
-            example=item.get("example"),
-            translate=item.get("translate"),
-            sequence=idx + 1,
-        )
-        for idx, item in enumerate(examples_list)
-    ]
-
-    syllable_dto = dto.Syllable(
+    return dto.Syllable(
         syllable_id=None,
         word=word,
-        transcription=await anyio.to_thread.run_sync(wh.get_transcription),
-        translations=await anyio.to_thread.run_sync(wh.get_translation),
+        transcription=entry["transcription"],
+        translations=entry["translation"],
         examples=examples_text,
         show_count=0,
         ready=0,
         last_view=None,
         user_id=None,
-        paragraphs=paragraphs,
+        paragraphs=[
+            dto.SyllableParagraph(
+                example=item["example"],
+                translate=item["translate"],
+                sequence=idx + 1,
+            )
+            for idx, item in enumerate(examples)
+        ],
     )
 
-    return syllable_dto
+
+@app.get("/api/word_from_wooordhunt", response_model=dto.Syllable)
+async def word_from_wooordhunt(
+    word: str, db: AsyncSession = Depends(get_db_autocommit)
+) -> dto.Syllable:
+    """Статья слова с wooordhunt.ru; повторные запросы отдаются из кэша"""
+    if not word.strip():
+        raise HTTPException(status_code=400, detail="Empty word")
+    try:
+        entry = await dictionary_cache.cache.lookup(
+            db, word, fetcher.fetch_entry
+        )
+    except fetcher.FetchError as e:
+        raise HTTPException(
+            status_code=502, detail=f"Wooordhunt is unavailable: {e}"
+        )
+    return _syllable_from_entry(word, entry)
+
+
+@app.post(
+    "/api/dictionary/lookup",
+    response_model=dto.DictionaryLookupOut,
+    dependencies=[Depends(get_user_context)],
+)
+async def lookup_words(
+    payload: dto.DictionaryLookupIn,
+    db: AsyncSession = Depends(get_db_autocommit),
+):
+    """Статьи нескольких слов одним запросом
+
+    Промахи кэша загружаются с сайта параллельно (не больше
+    FETCH_CONCURRENCY сразу); слово, которое уже загружается для другого
+    запроса, не скачивается повторно.
+    """
+    entries, errors = await dictionary_cache.cache.lookup_many(
+        db, payload.words, fetcher.fetch_entry
+    )
+    words = dict.fromkeys(map(dictionary_cache.normalize, payload.words))
+    return dto.DictionaryLookupOut(
+        items=[
+            _syllable_from_entry(word, entries[word])
+            for word in words
+            if word in entries
+        ],
+        failed=list(errors),
+    )
 
 
 @app.get("/api/start_page")
-async def start_page(request: Request, db: AsyncSession = Depends(get_db)):
+async def start_page(
+    user: dto.UserContext = Depends(get_user_context),
+    db: AsyncSession = Depends(get_db),
+):
     """
     Возвращает данные для построения структуры стартовой страницы пользователя
     """
 
-    return await pages.get_start_page(
-        db=db, user_name=request.session.get("user")
-    )
+    return await pages.get_start_page(db=db, user_id=user.user_id)
 
 
 @app.get("/api/tile_icon")
@@ -781,17 +1116,14 @@ async def tile_icon(
 # ----- Tiles CRUD -----
 @app.post("/api/tiles", response_model=dto.TileDTO)
 async def create_tile_endpoint(
-    request: Request,
     payload: dto.TileCreateIn,
+    user: dto.UserContext = Depends(get_user_context),
     db: AsyncSession = Depends(get_db_autocommit),
 ):
-    username = request.session.get("user")
-    if not username:
-        raise HTTPException(status_code=401, detail="Требуется авторизация")
     try:
         tile = await pages.create_tile(
             db,
-            username,
+            user.user_id,
             row_id=payload.row_id,
             tile_index=payload.tile_index,
             name=payload.name,
@@ -807,17 +1139,14 @@ async def create_tile_endpoint(
 
 @app.put("/api/tiles", response_model=dto.TileDTO)
 async def update_tile_endpoint(
-    request: Request,
     payload: dto.TileUpdateIn,
+    user: dto.UserContext = Depends(get_user_context),
     db: AsyncSession = Depends(get_db_autocommit),
 ):
-    username = request.session.get("user")
-    if not username:
-        raise HTTPException(status_code=401, detail="Требуется авторизация")
     try:
         tile = await pages.update_tile(
             db,
-            username,
+            user.user_id,
             tile_id=payload.tile_id,
             name=payload.name,
             hyperlink=payload.hyperlink,
@@ -832,15 +1161,12 @@ async def update_tile_endpoint(
 
 @app.delete("/api/tiles/{tile_id}")
 async def delete_tile_endpoint(
-    request: Request,
     tile_id: int,
+    user: dto.UserContext = Depends(get_user_context),
     db: AsyncSession = Depends(get_db_autocommit),
 ):
-    username = request.session.get("user")
-    if not username:
-        raise HTTPException(status_code=401, detail="Требуется авторизация")
     try:
-        await pages.delete_tile(db, username, tile_id=tile_id)
+        await pages.delete_tile(db, user.user_id, tile_id=tile_id)
         return {"status": "ok"}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -856,17 +1182,14 @@ class RowCreateIn(BaseModel):
 
 @app.post("/api/rows")
 async def create_row_endpoint(
-    request: Request,
     payload: RowCreateIn,
+    user: dto.UserContext = Depends(get_user_context),
     db: AsyncSession = Depends(get_db_autocommit),
 ):
-    username = request.session.get("user")
-    if not username:
-        raise HTTPException(status_code=401, detail="Требуется авторизация")
     try:
         row = await pages.create_row(
             db,
-            username,
+            user.user_id,
             row_name=payload.row_name,
             row_type=payload.row_type or 0,
             row_index=payload.row_index or 0,
@@ -884,29 +1207,23 @@ async def create_row_endpoint(
 
 @app.delete("/api/rows/{row_id}")
 async def delete_row_endpoint(
-    request: Request,
     row_id: int,
+    user: dto.UserContext = Depends(get_user_context),
     db: AsyncSession = Depends(get_db_autocommit),
 ):
-    username = request.session.get("user")
-    if not username:
-        raise HTTPException(status_code=401, detail="Требуется авторизация")
     try:
-        await pages.delete_row(db, username, row_id=row_id)
+        await pages.delete_row(db, user.user_id, row_id=row_id)
         return {"status": "ok"}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 # ----- Icon upload -----
-@app.post("/api/icons/upload")
+@app.post("/api/icons/upload", dependencies=[Depends(get_user_context)])
 async def upload_icon(
     request: Request,
     db: AsyncSession = Depends(get_db_autocommit),
 ):
-    username = request.session.get("user")
-    if not username:
-        raise HTTPException(status_code=401, detail="Требуется авторизация")
     form = await request.form()
     file = form.get("file")
     if not file:
@@ -926,17 +1243,14 @@ async def upload_icon(
 
 @app.post("/api/tiles/order")
 async def set_tile_order_endpoint(
-    request: Request,
     payload: dto.RowTileOrderIn,
+    user: dto.UserContext = Depends(get_user_context),
     db: AsyncSession = Depends(get_db_autocommit),
 ):
-    username = request.session.get("user")
-    if not username:
-        raise HTTPException(status_code=401, detail="Требуется авторизация")
     try:
         await pages.set_row_tile_index(
             db,
-            username,
+            user.user_id,
             row_id=payload.row_id,
             tile_id=payload.tile_id,
             tile_index=payload.tile_index,
@@ -948,18 +1262,14 @@ async def set_tile_order_endpoint(
 
 @app.post("/api/syllables/learned")
 async def set_syllable_as_learned(
-        request: Request,
-        payload: dto.SyllableId,
-        db: AsyncSession = Depends(get_db_autocommit),
+    payload: dto.SyllableId,
+    user: dto.UserContext = Depends(get_user_context),
+    db: AsyncSession = Depends(get_db_autocommit),
 ):
     """Помечает слово как изученное"""
-    username = request.session.get("user")
-    if not username:
-        raise HTTPException(status_code=401, detail="Требуется авторизация")
-
     await syllables.set_syllable_as_learned(
         db=db,
-        username=username,
+        user_id=user.user_id,
         syllable_id=payload.syllable_id,
     )
 
@@ -968,18 +1278,14 @@ async def set_syllable_as_learned(
 
 @app.post("/api/syllables/unlearned")
 async def set_syllable_as_unlearned(
-        request: Request,
-        payload: dto.SyllableId,
-        db: AsyncSession = Depends(get_db_autocommit),
+    payload: dto.SyllableId,
+    user: dto.UserContext = Depends(get_user_context),
+    db: AsyncSession = Depends(get_db_autocommit),
 ):
     """Помечает слово как не изученное"""
-    username = request.session.get("user")
-    if not username:
-        raise HTTPException(status_code=401, detail="Требуется авторизация")
-
     await syllables.set_syllable_as_unlearned(
         db=db,
-        username=username,
+        user_id=user.user_id,
         syllable_id=payload.syllable_id,
     )
 
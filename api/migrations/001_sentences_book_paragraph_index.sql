@@ -0,0 +1,3 @@
+-- Индекс для выборки окна абзацев книги (/api/book/paragraphs)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_sentences_book_paragraph
+    ON sentences (id_book, id_paragraph, id_sentence);
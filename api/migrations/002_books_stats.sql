@@ -0,0 +1,62 @@
+-- Материализованная статистика книги: границы абзацев и число предложений.
+-- Раньше считалась через MIN/MAX по всем sentences пользователя на каждый
+-- запрос /api/book и /api/books.
+ALTER TABLE books ADD COLUMN IF NOT EXISTS min_paragraph integer;
+ALTER TABLE books ADD COLUMN IF NOT EXISTS max_paragraph integer;
+ALTER TABLE books
+    ADD COLUMN IF NOT EXISTS sentences_count integer NOT NULL DEFAULT 0;
+
+-- Пересчёт статистики только для книг, затронутых оператором.
+-- Триггер уровня оператора: при массовой загрузке (INSERT ... SELECT, COPY)
+-- срабатывает один раз, а не на каждое предложение.
+CREATE OR REPLACE FUNCTION books_refresh_stats() RETURNS trigger AS $$
+BEGIN
+    UPDATE books b
+    SET min_paragraph = s.min_p,
+        max_paragraph = s.max_p,
+        sentences_count = coalesce(s.cnt, 0)
+    FROM (SELECT DISTINCT id_book FROM changed) c
+    LEFT JOIN LATERAL (
+        SELECT min(id_paragraph) AS min_p,
+               max(id_paragraph) AS max_p,
+               count(*) AS cnt
+        FROM sentences
+        WHERE sentences.id_book = c.id_book
+    ) s ON true
+    WHERE b.id_book = c.id_book;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sentences_stats_ins ON sentences;
+CREATE TRIGGER sentences_stats_ins
+    AFTER INSERT ON sentences
+    REFERENCING NEW TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION books_refresh_stats();
+
+DROP TRIGGER IF EXISTS sentences_stats_upd ON sentences;
+CREATE TRIGGER sentences_stats_upd
+    AFTER UPDATE ON sentences
+    REFERENCING NEW TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION books_refresh_stats();
+
+DROP TRIGGER IF EXISTS sentences_stats_del ON sentences;
+CREATE TRIGGER sentences_stats_del
+    AFTER DELETE ON sentences
+    REFERENCING OLD TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION books_refresh_stats();
+
+-- Заполнение для уже загруженных книг
+UPDATE books b
+SET min_paragraph = s.min_p,
+    max_paragraph = s.max_p,
+    sentences_count = s.cnt
+FROM (
+    SELECT id_book,
+           min(id_paragraph) AS min_p,
+           max(id_paragraph) AS max_p,
+           count(*) AS cnt
+    FROM sentences
+    GROUP BY id_book
+) s
+WHERE b.id_book = s.id_book;
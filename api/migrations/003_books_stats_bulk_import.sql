@@ -0,0 +1,28 @@
+-- Массовая загрузка книги (book_import) пишет предложения пачками COPY и
+-- сама выставляет статистику в конце. Чтобы триггер не пересчитывал
+-- агрегаты после каждой пачки, загрузчик отключает его на время своей
+-- транзакции: SET LOCAL language_helper.skip_book_stats = 'on'.
+CREATE OR REPLACE FUNCTION books_refresh_stats() RETURNS trigger AS $$
+BEGIN
+    IF coalesce(
+        current_setting('language_helper.skip_book_stats', true), ''
+    ) = 'on' THEN
+        RETURN NULL;
+    END IF;
+
+    UPDATE books b
+    SET min_paragraph = s.min_p,
+        max_paragraph = s.max_p,
+        sentences_count = coalesce(s.cnt, 0)
+    FROM (SELECT DISTINCT id_book FROM changed) c
+    LEFT JOIN LATERAL (
+        SELECT min(id_paragraph) AS min_p,
+               max(id_paragraph) AS max_p,
+               count(*) AS cnt
+        FROM sentences
+        WHERE sentences.id_book = c.id_book
+    ) s ON true
+    WHERE b.id_book = c.id_book;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,27 @@
+-- Почасовые агрегаты журнала чтения для paragraphs_read_24h
+CREATE TABLE IF NOT EXISTS reading_activity (
+    user_id integer NOT NULL REFERENCES users (user_id),
+    id_book integer NOT NULL REFERENCES books (id_book) ON DELETE CASCADE,
+    hour timestamp NOT NULL,
+    min_paragraph integer NOT NULL,
+    max_paragraph integer NOT NULL,
+    events integer NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, id_book, hour)
+);
+
+-- Заполнение из уже накопленного журнала
+INSERT INTO reading_activity
+    (user_id, id_book, hour, min_paragraph, max_paragraph, events)
+SELECT user_id,
+       id_book,
+       date_trunc('hour', dt),
+       min(id_paragraph),
+       max(id_paragraph),
+       count(*)
+FROM reading_journal
+WHERE dt IS NOT NULL
+GROUP BY user_id, id_book, date_trunc('hour', dt)
+ON CONFLICT (user_id, id_book, hour) DO UPDATE
+SET min_paragraph = excluded.min_paragraph,
+    max_paragraph = excluded.max_paragraph,
+    events = excluded.events;
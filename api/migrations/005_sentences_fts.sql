@@ -0,0 +1,4 @@
+-- Полнотекстовый поиск по предложениям книг (/api/books/search).
+-- Выражение должно совпадать с models.sentence_tsvector.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_sentences_fts
+    ON sentences USING gin (to_tsvector('english', sentence));
@@ -0,0 +1,13 @@
+-- Поиск слов пользователя (/api/syllables/search).
+-- Подстрока: GIN-индекс pg_trgm; начало слова: btree text_pattern_ops;
+-- список и keyset-пагинация по word: обычный btree.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_syllables_word_trgm
+    ON syllables USING gin (word gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_syllables_word_prefix
+    ON syllables (user_id, ready, word text_pattern_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_syllables_user_ready_word
+    ON syllables (user_id, ready, word);
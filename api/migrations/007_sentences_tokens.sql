@@ -0,0 +1,6 @@
+-- Токены предложений и их смещения, считаются при загрузке книги
+-- (book_import.segmenter.sentence_tokens). Для уже загруженных книг:
+--     python -m book_import.retokenize --all
+-- До этого /api/book/study_words разбивает такие предложения на лету.
+ALTER TABLE sentences ADD COLUMN IF NOT EXISTS tokens text[];
+ALTER TABLE sentences ADD COLUMN IF NOT EXISTS token_starts integer[];
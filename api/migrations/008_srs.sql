@@ -0,0 +1,23 @@
+-- Интервальное повторение слов и фраз (db/srs.py, SM-2).
+-- Существующие карточки встают в очередь в прежнем порядке - по last_view.
+ALTER TABLE syllables
+    ADD COLUMN IF NOT EXISTS due_at timestamp NOT NULL
+        DEFAULT timezone('utc', now()),
+    ADD COLUMN IF NOT EXISTS interval_days double precision NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS ease double precision NOT NULL DEFAULT 2.5,
+    ADD COLUMN IF NOT EXISTS repetitions integer NOT NULL DEFAULT 0;
+
+ALTER TABLE phrases
+    ADD COLUMN IF NOT EXISTS due_at timestamp NOT NULL
+        DEFAULT timezone('utc', now()),
+    ADD COLUMN IF NOT EXISTS interval_days double precision NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS ease double precision NOT NULL DEFAULT 2.5,
+    ADD COLUMN IF NOT EXISTS repetitions integer NOT NULL DEFAULT 0;
+
+UPDATE syllables SET due_at = last_view WHERE last_view IS NOT NULL;
+UPDATE phrases SET due_at = last_view WHERE last_view IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS ix_syllables_due
+    ON syllables (user_id, ready, due_at);
+CREATE INDEX IF NOT EXISTS ix_phrases_due
+    ON phrases (user_id, ready, due_at);
@@ -0,0 +1,29 @@
+-- Дневные счётчики повторений для /api/stats/today (db/stats.py).
+-- Карточка считается один раз в день - при первом ответе за этот день.
+CREATE TABLE IF NOT EXISTS learning_activity (
+    user_id integer NOT NULL REFERENCES users (user_id),
+    day date NOT NULL,
+    phrases integer NOT NULL DEFAULT 0,
+    syllables integer NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
+
+-- Заполнение за последние дни по last_view (известен только последний
+-- показ карточки)
+INSERT INTO learning_activity (user_id, day, phrases)
+SELECT user_id, last_view::date, count(*)
+FROM phrases
+WHERE user_id IS NOT NULL
+  AND show_count > 0
+  AND last_view >= current_date - 1
+GROUP BY user_id, last_view::date
+ON CONFLICT (user_id, day) DO UPDATE SET phrases = excluded.phrases;
+
+INSERT INTO learning_activity (user_id, day, syllables)
+SELECT user_id, last_view::date, count(*)
+FROM syllables
+WHERE user_id IS NOT NULL
+  AND show_count > 0
+  AND last_view >= current_date - 1
+GROUP BY user_id, last_view::date
+ON CONFLICT (user_id, day) DO UPDATE SET syllables = excluded.syllables;
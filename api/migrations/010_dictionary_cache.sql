@@ -0,0 +1,10 @@
+-- Кэш разобранных статей Wooordhunt (wooordhunt/cache.py).
+-- fetched_at - срок годности статьи и порядок вытеснения лишних записей.
+CREATE TABLE IF NOT EXISTS dictionary_cache (
+    word text PRIMARY KEY,
+    entry jsonb NOT NULL,
+    fetched_at timestamp NOT NULL DEFAULT timezone('utc', now())
+);
+
+CREATE INDEX IF NOT EXISTS ix_dictionary_cache_fetched_at
+    ON dictionary_cache (fetched_at);
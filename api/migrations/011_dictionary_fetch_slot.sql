@@ -0,0 +1,7 @@
+-- Общее для всех воркеров время следующего фонового запроса к wooordhunt.ru
+-- (wooordhunt/prewarm.py): воркер сдвигает его на интервал и ждёт своей
+-- очереди, поэтому частота запросов не растёт с числом воркеров.
+CREATE TABLE IF NOT EXISTS dictionary_fetch_slot (
+    id smallint PRIMARY KEY,
+    next_at timestamp NOT NULL
+);
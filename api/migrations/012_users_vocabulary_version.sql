@@ -0,0 +1,4 @@
+-- Версия словаря пользователя (db/vocabulary.py): растёт в транзакции,
+-- меняющей слова, и по ней воркеры узнают, что их кэш устарел.
+ALTER TABLE users
+    ADD COLUMN IF NOT EXISTS vocabulary_version integer NOT NULL DEFAULT 0;
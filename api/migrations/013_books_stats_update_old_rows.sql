@@ -0,0 +1,46 @@
+-- UPDATE может перенести предложения в другую книгу (id_book): статистику
+-- нужно пересчитать и для книг из старых версий строк, а не только из
+-- новых. Триггер на UPDATE видит обе таблицы переходов.
+CREATE OR REPLACE FUNCTION books_refresh_stats_for(ids integer[])
+RETURNS void AS $$
+    UPDATE books b
+    SET min_paragraph = s.min_p,
+        max_paragraph = s.max_p,
+        sentences_count = coalesce(s.cnt, 0)
+    FROM (SELECT DISTINCT unnest(ids) AS id_book) c
+    LEFT JOIN LATERAL (
+        SELECT min(id_paragraph) AS min_p,
+               max(id_paragraph) AS max_p,
+               count(*) AS cnt
+        FROM sentences
+        WHERE sentences.id_book = c.id_book
+    ) s ON true
+    WHERE b.id_book = c.id_book;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION books_refresh_stats() RETURNS trigger AS $$
+BEGIN
+    IF coalesce(
+        current_setting('language_helper.skip_book_stats', true), ''
+    ) = 'on' THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM books_refresh_stats_for(ARRAY(
+            SELECT id_book FROM changed
+            UNION
+            SELECT id_book FROM changed_old
+        ));
+    ELSE
+        PERFORM books_refresh_stats_for(ARRAY(SELECT id_book FROM changed));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sentences_stats_upd ON sentences;
+CREATE TRIGGER sentences_stats_upd
+    AFTER UPDATE ON sentences
+    REFERENCING OLD TABLE AS changed_old NEW TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION books_refresh_stats();
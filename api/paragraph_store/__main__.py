@@ -0,0 +1,54 @@
+"""Выгрузка книг из БД в хранилище абзацев (PARAGRAPH_STORE_DIR)
+
+Примеры:
+    python -m paragraph_store 12 15
+    python -m paragraph_store --all
+"""
+
+import argparse
+import asyncio
+import sys
+
+from sqlalchemy import select
+
+from paragraph_store import store
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        prog="python -m paragraph_store",
+        description="Выгрузка текста книг в хранилище абзацев",
+    )
+    parser.add_argument("id_book", nargs="*", type=int, help="id книг")
+    parser.add_argument(
+        "--all", action="store_true", help="выгрузить все книги"
+    )
+    args = parser.parse_args()
+    if not args.id_book and not args.all:
+        parser.error("укажите id книг или --all")
+    return args
+
+
+async def _run(args) -> int:
+    if store.store is None:
+        print("PARAGRAPH_STORE_DIR не задан", file=sys.stderr)
+        return 1
+
+    # main импортируется здесь, чтобы --help работал без настройки БД
+    from main import SessionLocal
+    from db import models
+
+    async with SessionLocal() as db:
+        ids = args.id_book
+        if args.all:
+            ids = (
+                (await db.execute(select(models.Book.id_book))).scalars().all()
+            )
+        for id_book in ids:
+            path = await store.export_book(db, id_book)
+            print(f"{id_book}: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_run(_parse_args())))
@@ -0,0 +1,367 @@
+"""Сжатое хранилище текста книг с отображением в память
+
+Текст загруженной книги не меняется, поэтому его можно выгрузить из
+PostgreSQL в файл <id_book>.lhps и читать абзацы через mmap. Файл
+отображается в память каждым воркером uvicorn, но в памяти лежит один раз -
+в страничном кэше ОС.
+
+Формат файла:
+    [MAGIC]
+    [сжатые абзацы подряд]
+    [zdict - словарь zlib, общий для всех абзацев книги]
+    [индекс: count записей (id_paragraph, offset, length), по id_paragraph]
+    [FOOTER: zdict_offset, zdict_len, index_offset, count, user_id, MAGIC]
+
+Каждый абзац сжат отдельно с общим словарём, поэтому для чтения абзаца
+распаковывается только он.
+"""
+
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+import zlib
+from collections import OrderedDict
+from typing import Optional
+
+import anyio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import models
+
+logger = logging.getLogger(__name__)
+
+# Каталог хранилища; если не задан, хранилище выключено и текст читается из БД
+STORE_DIR = os.environ.get("PARAGRAPH_STORE_DIR")
+# Сколько файлов книг держать открытыми в воркере (mmap и дескриптор)
+MAX_OPEN_BOOKS = int(os.environ.get("PARAGRAPH_STORE_OPEN_BOOKS", "256"))
+# Сколько секунд помнить, что файла книги нет или он повреждён
+MISSING_TTL = 30.0
+MAX_MISSING = 10_000
+
+MAGIC = b"LHPS\x00\x01\x00\x00"
+_INDEX_ENTRY = struct.Struct("<iQI")
+_FOOTER = struct.Struct("<QIQIi8s")
+# Сколько текста книги берётся для словаря zlib (максимум zlib - 32 КБ)
+_ZDICT_SIZE = 32 * 1024
+# Сколько абзацев передавать в поток записи за раз
+EXPORT_BATCH = 1_000
+# Разделители предложений и id внутри абзаца
+_SENTENCE_SEP = "\x1f"
+_ID_SEP = "\x1e"
+
+Sentences = list[tuple[int, str]]
+
+# Ошибки чтения повреждённого или обрезанного файла
+_CORRUPT_ERRORS = (ValueError, struct.error, zlib.error)
+
+
+def _encode(sentences: Sentences) -> bytes:
+    return _SENTENCE_SEP.join(
+        f"{id_sentence}{_ID_SEP}{sentence}"
+        for id_sentence, sentence in sentences
+    ).encode("utf-8")
+
+
+def _decode(data: bytes) -> Sentences:
+    result = []
+    for item in data.decode("utf-8").split(_SENTENCE_SEP):
+        id_sentence, sentence = item.split(_ID_SEP, 1)
+        result.append((int(id_sentence), sentence))
+    return result
+
+
+class BookFile:
+    """Открытый через mmap файл книги"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            zdict_offset,
+            zdict_len,
+            self._index_offset,
+            self.count,
+            self.user_id,
+            magic,
+        ) = _FOOTER.unpack_from(self._mm, len(self._mm) - _FOOTER.size)
+        if (
+            magic != MAGIC
+            or self._mm[: len(MAGIC)] != MAGIC
+            or zdict_offset + zdict_len > self._index_offset
+            or self._index_offset + self.count * _INDEX_ENTRY.size
+            != len(self._mm) - _FOOTER.size
+        ):
+            self._mm.close()
+            raise ValueError(f"{path} is not a paragraph store file")
+        self._zdict = self._mm[zdict_offset : zdict_offset + zdict_len]
+
+    def close(self):
+        self._mm.close()
+
+    def _entry(self, i: int) -> tuple[int, int, int]:
+        return _INDEX_ENTRY.unpack_from(
+            self._mm, self._index_offset + i * _INDEX_ENTRY.size
+        )
+
+    def _lower_bound(self, id_paragraph: int) -> int:
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._entry(mid)[0] < id_paragraph:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _read(self, offset: int, length: int) -> Sentences:
+        decompressor = zlib.decompressobj(zdict=self._zdict)
+        return _decode(
+            decompressor.decompress(self._mm[offset : offset + length])
+            + decompressor.flush()
+        )
+
+    def paragraph(self, id_paragraph: int) -> Sentences:
+        i = self._lower_bound(id_paragraph)
+        if i < self.count:
+            found, offset, length = self._entry(i)
+            if found == id_paragraph:
+                return self._read(offset, length)
+        return []
+
+    def paragraphs(
+        self, id_from: int, id_to: int
+    ) -> list[tuple[int, Sentences]]:
+        result = []
+        for i in range(self._lower_bound(id_from), self.count):
+            id_paragraph, offset, length = self._entry(i)
+            if id_paragraph > id_to:
+                break
+            result.append((id_paragraph, self._read(offset, length)))
+        return result
+
+
+class ParagraphStore:
+    """Каталог файлов книг; файлы открываются лениво и кэшируются в процессе
+
+    Открытыми держатся последние MAX_OPEN_BOOKS книг, вытесненные
+    закрываются. Отсутствие файла (и повреждённый файл) запоминается на
+    MISSING_TTL секунд, чтобы не обращаться к диску при каждом запросе.
+    """
+
+    def __init__(self, directory: str, max_open: int = MAX_OPEN_BOOKS):
+        self.directory = directory
+        self.max_open = max_open
+        self._books: OrderedDict[int, BookFile] = OrderedDict()
+        # id_book -> до какого момента (time.monotonic) файла нет
+        self._missing: dict[int, float] = {}
+
+    def path(self, id_book: int) -> str:
+        return os.path.join(self.directory, f"{id_book}.lhps")
+
+    def book(self, id_book: int) -> Optional[BookFile]:
+        book_file = self._books.get(id_book)
+        if book_file is not None:
+            self._books.move_to_end(id_book)
+            return book_file
+        missing_until = self._missing.get(id_book)
+        if missing_until is not None and missing_until > time.monotonic():
+            return None
+        try:
+            book_file = BookFile(self.path(id_book))
+        except FileNotFoundError:
+            self._remember_missing(id_book)
+            return None
+        except (OSError, *_CORRUPT_ERRORS) as e:
+            logger.warning(
+                "Paragraph store: cannot open book %s: %s", id_book, e
+            )
+            self._remember_missing(id_book)
+            return None
+        self._missing.pop(id_book, None)
+        self._books[id_book] = book_file
+        while len(self._books) > self.max_open:
+            self._books.popitem(last=False)[1].close()
+        return book_file
+
+    def _remember_missing(self, id_book: int) -> None:
+        if len(self._missing) >= MAX_MISSING:
+            self._missing.clear()
+        self._missing[id_book] = time.monotonic() + MISSING_TTL
+
+    def discard(self, id_book: int) -> None:
+        """Закрывает повреждённый файл книги; текст читается из БД"""
+        book_file = self._books.pop(id_book, None)
+        if book_file is not None:
+            book_file.close()
+        self._remember_missing(id_book)
+
+    def writer(self, id_book: int, user_id: int) -> "BookWriter":
+        return BookWriter(self, id_book, user_id)
+
+
+class BookWriter:
+    """Пишет файл книги; абзацы добавляются по возрастанию id_paragraph
+
+    Файл пишется во временный и атомарно переименовывается при закрытии,
+    поэтому воркеры никогда не видят недописанный файл.
+    """
+
+    def __init__(self, store: ParagraphStore, id_book: int, user_id: int):
+        self._store = store
+        self._id_book = id_book
+        self._user_id = user_id
+        os.makedirs(store.directory, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(
+            dir=store.directory, suffix=".tmp"
+        )
+        self._f = os.fdopen(fd, "wb")
+        self._f.write(MAGIC)
+        self._index = bytearray()
+        # пока не набран словарь, абзацы копятся в памяти
+        self._pending: list[tuple[int, bytes]] = []
+        self._pending_size = 0
+        self._zdict: Optional[bytes] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def abort(self):
+        """Удаляет недописанный временный файл"""
+        self._f.close()
+        os.unlink(self._tmp_path)
+
+    def _write(self, id_paragraph: int, data: bytes):
+        compressor = zlib.compressobj(level=9, zdict=self._zdict)
+        block = compressor.compress(data) + compressor.flush()
+        self._index.extend(
+            _INDEX_ENTRY.pack(id_paragraph, self._f.tell(), len(block))
+        )
+        self._f.write(block)
+
+    def _flush_pending(self):
+        # словарь строится по началу книги
+        self._zdict = b"".join(data for _, data in self._pending)[-_ZDICT_SIZE:]
+        for id_paragraph, data in self._pending:
+            self._write(id_paragraph, data)
+        self._pending = []
+
+    def add(self, id_paragraph: int, sentences: Sentences):
+        data = _encode(sentences)
+        if self._zdict is not None:
+            self._write(id_paragraph, data)
+            return
+        self._pending.append((id_paragraph, data))
+        self._pending_size += len(data)
+        if self._pending_size >= _ZDICT_SIZE:
+            self._flush_pending()
+
+    def add_many(self, paragraphs: list[tuple[int, Sentences]]):
+        for id_paragraph, sentences in paragraphs:
+            self.add(id_paragraph, sentences)
+
+    def close(self) -> str:
+        if self._zdict is None:
+            self._flush_pending()
+        f = self._f
+        zdict_offset = f.tell()
+        f.write(self._zdict)
+        index_offset = f.tell()
+        f.write(self._index)
+        f.write(
+            _FOOTER.pack(
+                zdict_offset,
+                len(self._zdict),
+                index_offset,
+                len(self._index) // _INDEX_ENTRY.size,
+                self._user_id,
+                MAGIC,
+            )
+        )
+        f.close()
+        path = self._store.path(self._id_book)
+        os.replace(self._tmp_path, path)
+        # старый файл закроется, когда его перестанут читать
+        self._store._books.pop(self._id_book, None)
+        self._store._missing.pop(self._id_book, None)
+        return path
+
+
+store: Optional[ParagraphStore] = (
+    ParagraphStore(STORE_DIR) if STORE_DIR else None
+)
+
+
+def open_book(id_book: int) -> Optional[BookFile]:
+    """Файл книги, если хранилище включено и книга в него выгружена"""
+    if store is None:
+        return None
+    return store.book(id_book)
+
+
+def read_paragraphs(
+    id_book: int, id_from: int, id_to: int
+) -> Optional[tuple[int, list[tuple[int, Sentences]]]]:
+    """Владелец книги и абзацы [id_from, id_to] из её файла
+
+    None, если книги нет в хранилище или файл повреждён: тогда текст
+    читается из кэша абзацев и БД.
+    """
+    book_file = open_book(id_book)
+    if book_file is None:
+        return None
+    try:
+        return book_file.user_id, book_file.paragraphs(id_from, id_to)
+    except _CORRUPT_ERRORS as e:
+        logger.warning("Paragraph store: book %s is corrupt: %s", id_book, e)
+        store.discard(id_book)
+        return None
+
+
+async def export_book(db: AsyncSession, id_book: int) -> Optional[str]:
+    """Выгружает текст книги из БД в хранилище, возвращает путь к файлу"""
+    if store is None:
+        return None
+    user_id = (
+        await db.execute(
+            select(models.Book.user_id).where(models.Book.id_book == id_book)
+        )
+    ).scalar_one_or_none()
+    if user_id is None:
+        raise ValueError("Book not found")
+
+    result = await db.stream(
+        select(
+            models.Sentence.id_paragraph,
+            models.Sentence.id_sentence,
+            models.Sentence.sentence,
+        )
+        .where(models.Sentence.id_book == id_book)
+        .order_by(models.Sentence.id_paragraph, models.Sentence.id_sentence)
+        .execution_options(yield_per=10_000)
+    )
+    # сжатие и запись файла - в потоке, чтобы не занимать цикл событий
+    writer = await anyio.to_thread.run_sync(store.writer, id_book, user_id)
+    try:
+        batch: list[tuple[int, Sentences]] = []
+        async for id_paragraph, id_sentence, sentence in result:
+            if not batch or batch[-1][0] != id_paragraph:
+                if len(batch) >= EXPORT_BATCH:
+                    await anyio.to_thread.run_sync(writer.add_many, batch)
+                    batch = []
+                batch.append((id_paragraph, []))
+            batch[-1][1].append((id_sentence, sentence))
+        await anyio.to_thread.run_sync(writer.add_many, batch)
+        return await anyio.to_thread.run_sync(writer.close)
+    except BaseException:
+        writer.abort()
+        raise
@@ -0,0 +1,63 @@
+import pytest
+
+from language.lemmatizer import lemma
+
+
+@pytest.mark.parametrize(
+    "word, other",
+    [
+        ("note", "not"),
+        ("here", "her"),
+        ("site", "sit"),
+        ("care", "car"),
+        ("mine", "min"),
+        ("hope", "hop"),
+    ],
+)
+def test_unsuffixed_words_keep_their_key(word, other):
+    assert lemma(word) == word
+    assert lemma(other) == other
+
+
+@pytest.mark.parametrize(
+    "form, base",
+    [
+        ("died", "die"),
+        ("lied", "lie"),
+        ("freed", "free"),
+        ("agreed", "agree"),
+        ("studied", "study"),
+        ("studies", "study"),
+        ("studying", "study"),
+        ("hoped", "hope"),
+        ("hoping", "hope"),
+        ("hopes", "hope"),
+        ("hopped", "hop"),
+        ("noted", "note"),
+        ("cared", "care"),
+        ("writing", "write"),
+        ("believed", "believe"),
+        ("settled", "settle"),
+        ("closes", "close"),
+        ("quenched", "quench"),
+        ("running", "run"),
+        ("ran", "run"),
+        ("added", "add"),
+        ("opened", "open"),
+        ("treated", "treat"),
+        ("buses", "bus"),
+        ("lenses", "lens"),
+        ("gases", "gas"),
+    ],
+)
+def test_inflected_forms_share_the_base_key(form, base):
+    assert lemma(form) == lemma(base)
+
+
+@pytest.mark.parametrize("word", ["news", "string", "evening", "need"])
+def test_invariant_words(word):
+    assert lemma(word) == word
+
+
+def test_possessive():
+    assert lemma("hope's") == lemma("hope")
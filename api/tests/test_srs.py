@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+from db.srs import (
+    DEFAULT_EASE,
+    GRADE_AGAIN,
+    GRADE_GOOD,
+    RELEARN_INTERVAL,
+    next_schedule,
+)
+
+NOW = datetime(2026, 1, 10, 12, 0)
+
+
+def _review(card, grade, now):
+    """card - (interval, ease, repetitions, due_at)"""
+    return next_schedule(*card[:3], card[3], grade, now)
+
+
+def _mature(interval=10.0, repetitions=4, reviewed=NOW - timedelta(days=5)):
+    return (interval, DEFAULT_EASE, repetitions, reviewed + timedelta(interval))
+
+
+def test_new_card_learning_steps_on_time():
+    card = _review((0.0, DEFAULT_EASE, 0, None), GRADE_GOOD, NOW)
+    assert card == (1.0, DEFAULT_EASE, 1, NOW + timedelta(days=1))
+
+    card = _review(card, GRADE_GOOD, card[3])
+    assert card[:3] == (6.0, DEFAULT_EASE, 2)
+
+    card = _review(card, GRADE_GOOD, card[3])
+    assert card[:3] == (6.0 * DEFAULT_EASE, DEFAULT_EASE, 3)
+
+
+def test_early_reviews_do_not_advance_learning_steps():
+    card = _review((0.0, DEFAULT_EASE, 0, None), GRADE_GOOD, NOW)
+    now = NOW
+    for _ in range(3):
+        now += timedelta(seconds=60)
+        assert _review(card, GRADE_GOOD, now) == card
+
+
+def test_early_review_of_mature_card_keeps_schedule():
+    card = _mature()
+    assert _review(card, GRADE_GOOD, NOW) == card
+
+
+def test_review_just_before_due_keeps_schedule():
+    card = _mature()
+    assert _review(card, GRADE_GOOD, card[3] - timedelta(minutes=1)) == card
+
+
+def test_on_time_review_of_mature_card_grows_interval():
+    card = _mature()
+    now = card[3] + timedelta(hours=1)
+    card = _review(card, GRADE_GOOD, now)
+    interval = 10.0 * DEFAULT_EASE
+    assert card == (interval, DEFAULT_EASE, 5, now + timedelta(interval))
+
+
+def test_lapse_resets_card_and_relearns_soon():
+    # забытая карточка сбрасывается и до срока
+    card = _review(_mature(), GRADE_AGAIN, NOW)
+    assert card[0] == 0.0
+    assert card[1] < DEFAULT_EASE
+    assert card[2] == 0
+    assert card[3] == NOW + RELEARN_INTERVAL
+
+    # после забывания карточка снова проходит шаг в один день
+    card = _review(card, GRADE_GOOD, card[3])
+    assert card[0] == 1.0
+    assert card[2] == 1
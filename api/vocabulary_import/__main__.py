@@ -0,0 +1,62 @@
+"""Загрузка словаря или фраз из CSV/TSV или текстового экспорта Anki
+
+Примеры:
+    python -m vocabulary_import words.csv --user alice
+    python -m vocabulary_import "Deck.txt" --user alice --kind phrases
+"""
+
+import argparse
+import asyncio
+import sys
+
+import anyio
+
+from db import users
+from vocabulary_import import importer, readers
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        prog="python -m vocabulary_import",
+        description="Загрузка слов или фраз (.csv/.tsv/.txt Anki) "
+        "для пользователя",
+    )
+    parser.add_argument("path", help="путь к файлу")
+    parser.add_argument("--user", required=True, help="имя пользователя")
+    parser.add_argument(
+        "--kind",
+        choices=("syllables", "phrases"),
+        default="syllables",
+        help="что загружать: слова или фразы",
+    )
+    return parser.parse_args()
+
+
+async def _run(args) -> int:
+    # main импортируется здесь, чтобы --help работал без настройки БД
+    from main import SessionLocal
+
+    try:
+        fmt = readers.detect_format(args.path)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    async with SessionLocal() as db:
+        user_id = await users.aget_user_id(db, args.user)
+        if not user_id:
+            print(f"Пользователь '{args.user}' не найден", file=sys.stderr)
+            return 1
+        async with await anyio.open_file(args.path, "rb") as f:
+            result = await importer.import_vocabulary(
+                db, f.wrapped, fmt, args.kind, user_id
+            )
+        await db.commit()
+
+    print(
+        f"read: {result.read} added: {result.added} skipped: {result.skipped}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_run(_parse_args())))
@@ -0,0 +1,50 @@
+from itertools import islice
+from typing import BinaryIO, Literal
+
+import anyio
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import dto, phrases, syllables
+from vocabulary_import import readers
+
+# Записей в одной пачке: один SELECT дубликатов и один INSERT
+BATCH_SIZE = 1_000
+
+
+async def import_vocabulary(
+    db: AsyncSession,
+    f: BinaryIO,
+    fmt: str,
+    kind: Literal["syllables", "phrases"],
+    user_id: int,
+) -> dto.VocabularyImportResult:
+    """Потоково загружает слова или фразы в текущей транзакции сессии
+
+    Файл читается пачками по BATCH_SIZE записей, каждая пачка
+    записывается двумя запросами; записи, которые уже есть у
+    пользователя, пропускаются. Фиксация транзакции - на вызывающей
+    стороне.
+    """
+    entries = readers.iter_entries(f, fmt)
+    result = dto.VocabularyImportResult(kind=kind)
+
+    def _next_batch() -> list[readers.Entry]:
+        return list(islice(entries, BATCH_SIZE))
+
+    try:
+        while batch := await anyio.to_thread.run_sync(_next_batch):
+            result.read += len(batch)
+            if kind == "syllables":
+                result.added += await syllables.add_syllables(
+                    db,
+                    user_id,
+                    [(e.text, e.translation, e.transcription) for e in batch],
+                )
+            else:
+                result.added += await phrases.add_phrases(
+                    db, user_id, [(e.text, e.translation) for e in batch]
+                )
+    finally:
+        entries.close()
+    result.skipped = result.read - result.added
+    return result
@@ -0,0 +1,141 @@
+import csv
+import html
+import io
+import posixpath
+import re
+from typing import BinaryIO, Iterator, NamedTuple, Optional
+
+# csv/tsv - таблицы, txt - экспорт Anki "Notes in Plain Text"
+SUPPORTED_FORMATS = ("csv", "tsv", "txt")
+
+# Первая строка таблицы с такими заголовками пропускается
+HEADER_NAMES = {"word", "phrase", "front", "text", "слово", "фраза"}
+
+# Разделители Anki (#separator:...)
+ANKI_SEPARATORS = {
+    "tab": "\t",
+    "comma": ",",
+    "semicolon": ";",
+    "pipe": "|",
+    "space": " ",
+    "colon": ":",
+}
+
+_TAG_RE = re.compile(r"<[^>]*>")
+_BREAK_RE = re.compile(r"<br\s*/?>|</div>|</p>", re.IGNORECASE)
+_SPACES_RE = re.compile(r"\s+")
+
+
+class Entry(NamedTuple):
+    """Запись словаря: слово или фраза, перевод, транскрипция"""
+
+    text: str
+    translation: str = ""
+    transcription: Optional[str] = None
+
+
+def detect_format(file_name: str) -> str:
+    """Определяет формат файла словаря по расширению"""
+    ext = posixpath.splitext(file_name or "")[1].lower().lstrip(".")
+    if ext not in SUPPORTED_FORMATS:
+        raise ValueError(
+            f"Unsupported vocabulary format '{ext}', "
+            f"expected one of: {', '.join(SUPPORTED_FORMATS)}"
+        )
+    return ext
+
+
+def _strip_html(value: str) -> str:
+    value = _BREAK_RE.sub(" ", value)
+    value = _TAG_RE.sub("", value)
+    return _SPACES_RE.sub(" ", html.unescape(value)).strip()
+
+
+def _entry(fields: list[str], strip_html: bool = False) -> Optional[Entry]:
+    fields = [
+        _strip_html(field) if strip_html else field.strip() for field in fields
+    ]
+    if not fields or not fields[0]:
+        return None
+    return Entry(
+        text=fields[0],
+        translation=fields[1] if len(fields) > 1 else "",
+        transcription=(fields[2] or None) if len(fields) > 2 else None,
+    )
+
+
+def iter_entries(f: BinaryIO, fmt: str) -> Iterator[Entry]:
+    """Потоково читает записи словаря из бинарного файла"""
+    if fmt in ("csv", "tsv"):
+        return iter_table_entries(f, "\t" if fmt == "tsv" else None)
+    if fmt == "txt":
+        return iter_anki_entries(f)
+    raise ValueError(f"Unsupported vocabulary format '{fmt}'")
+
+
+def iter_table_entries(
+    f: BinaryIO, delimiter: Optional[str] = None
+) -> Iterator[Entry]:
+    """Строки таблицы: слово, перевод[, транскрипция]
+
+    Без явного разделителя выбирается самый частый из ",", ";" и
+    табуляции в первой строке.
+    """
+    text = io.TextIOWrapper(
+        f, encoding="utf-8-sig", errors="replace", newline=""
+    )
+    try:
+        first = text.readline()
+        if delimiter is None:
+            delimiter = max(",;\t", key=first.count)
+        rows = csv.reader(_chain(first, text), delimiter=delimiter)
+        for i, row in enumerate(rows):
+            if i == 0 and row and row[0].strip().lower() in HEADER_NAMES:
+                continue
+            entry = _entry(row)
+            if entry is not None:
+                yield entry
+    finally:
+        # файл закрывает вызывающая сторона
+        text.detach()
+
+
+def iter_anki_entries(f: BinaryIO) -> Iterator[Entry]:
+    """Заметки из текстового экспорта Anki
+
+    Учитывает заголовки #separator, #html и столбцы guid, типа заметки,
+    колоды и тегов: первые два оставшихся поля - лицо и оборот карточки.
+    """
+    text = io.TextIOWrapper(
+        f, encoding="utf-8-sig", errors="replace", newline=""
+    )
+    delimiter = "\t"
+    strip_html = False
+    skip_columns: set[int] = set()
+    try:
+        line = text.readline()
+        while line.startswith("#"):
+            key, _, value = line[1:].strip().partition(":")
+            key, value = key.strip().lower(), value.strip()
+            if key == "separator":
+                delimiter = ANKI_SEPARATORS.get(value.lower(), value[:1])
+            elif key == "html":
+                strip_html = value.lower() == "true"
+            elif key.endswith(" column") and value.isdigit():
+                skip_columns.add(int(value) - 1)
+            line = text.readline()
+        rows = csv.reader(_chain(line, text), delimiter=delimiter)
+        for row in rows:
+            fields = [v for i, v in enumerate(row) if i not in skip_columns]
+            entry = _entry(fields, strip_html)
+            if entry is not None:
+                yield entry
+    finally:
+        text.detach()
+
+
+def _chain(first: str, rest: Iterator[str]) -> Iterator[str]:
+    """Возвращает уже прочитанную строку перед остальными"""
+    if first:
+        yield first
+    yield from rest
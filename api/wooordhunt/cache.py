@@ -0,0 +1,296 @@
+"""Кэш разобранных статей Wooordhunt: LRU в памяти воркера перед таблицей
+dictionary_cache в PostgreSQL
+
+Статья живёт ENTRY_TTL; устаревшая статья перезапрашивается с сайта, но
+если сайт недоступен (ограничение частоты, сбой сети), отдаётся она же.
+Таблица ограничена MAX_ENTRIES записями - лишние, скачанные раньше всех,
+удаляются. Одновременные запросы одного слова в воркере ждут одну
+загрузку с сайта.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from db import models
+from wooordhunt.models import DictionaryEntry
+
+logger = logging.getLogger(__name__)
+
+ENTRY_TTL = timedelta(days=int(os.environ.get("DICTIONARY_TTL_DAYS", "30")))
+# Слова, которых нет на сайте, перепроверяются чаще
+EMPTY_ENTRY_TTL = timedelta(days=1)
+MAX_ENTRIES = int(os.environ.get("DICTIONARY_CACHE_ENTRIES", "200000"))
+MEMORY_ENTRIES = 5_000
+# Раз во сколько записей в таблицу проверять её размер
+TRIM_EVERY = 500
+# Сколько слов одного запроса загружать с сайта одновременно
+FETCH_CONCURRENCY = 4
+
+
+def normalize(word: str) -> str:
+    """Ключ кэша: слово в нижнем регистре с одиночными пробелами"""
+    return " ".join(word.lower().split())
+
+
+def _is_empty(entry: DictionaryEntry) -> bool:
+    return not (
+        entry.get("transcription")
+        or entry.get("translation")
+        or entry.get("examples")
+    )
+
+
+def _expires(entry: DictionaryEntry, fetched_at: datetime) -> datetime:
+    return fetched_at + (EMPTY_ENTRY_TTL if _is_empty(entry) else ENTRY_TTL)
+
+
+class DictionaryCache:
+    """LRU статей в памяти воркера: слово -> (статья, срок годности)"""
+
+    def __init__(self, max_entries: int = MEMORY_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[DictionaryEntry, datetime]] = (
+            OrderedDict()
+        )
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        # запросы, дождавшиеся чужой загрузки того же слова
+        self.coalesced = 0
+
+    def get(self, word: str) -> Optional[DictionaryEntry]:
+        item = self._entries.get(word)
+        if item is None or item[1] <= datetime.utcnow():
+            return None
+        self._entries.move_to_end(word)
+        return item[0]
+
+    def put(self, word: str, entry: DictionaryEntry, expires: datetime):
+        self._entries[word] = (entry, expires)
+        self._entries.move_to_end(word)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _load_many(
+        self, db: AsyncSession, words: list[str]
+    ) -> dict[str, tuple[DictionaryEntry, datetime]]:
+        table = models.DictionaryCacheEntry
+        rows = await db.execute(
+            select(table.word, table.entry, table.fetched_at).where(
+                table.word.in_(words)
+            )
+        )
+        return {word: (entry, fetched_at) for word, entry, fetched_at in rows}
+
+    async def _store_many(
+        self, db: AsyncSession, entries: dict[str, DictionaryEntry]
+    ) -> datetime:
+        fetched_at = datetime.utcnow()
+        stmt = pg_insert(models.DictionaryCacheEntry).values(
+            [
+                {"word": word, "entry": entry, "fetched_at": fetched_at}
+                for word, entry in entries.items()
+            ]
+        )
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["word"],
+                set_={
+                    "entry": stmt.excluded.entry,
+                    "fetched_at": stmt.excluded.fetched_at,
+                },
+            )
+        )
+        previous = self._writes
+        self._writes += len(entries)
+        if previous // TRIM_EVERY != self._writes // TRIM_EVERY:
+            await self._trim(db)
+        return fetched_at
+
+    async def _trim(self, db: AsyncSession) -> None:
+        table = models.DictionaryCacheEntry
+        oldest = (
+            select(table.word)
+            .order_by(table.fetched_at.desc())
+            .offset(MAX_ENTRIES)
+        )
+        await db.execute(delete(table).where(table.word.in_(oldest)))
+
+    async def _fetch_once(
+        self, word: str, fetch: Callable[[str], Awaitable[DictionaryEntry]]
+    ) -> DictionaryEntry:
+        """Один запрос к сайту на слово в пределах воркера
+
+        Параллельные запросы того же слова ждут уже идущую загрузку. Она
+        выполняется отдельной задачей, поэтому отмена одного из ожидающих
+        её не прерывает.
+        """
+        task = self._inflight.get(word)
+        if task is None:
+            task = asyncio.ensure_future(self._timed_fetch(word, fetch))
+            self._inflight[word] = task
+            task.add_done_callback(lambda done: self._done(word, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _timed_fetch(
+        self, word: str, fetch: Callable[[str], Awaitable[DictionaryEntry]]
+    ) -> DictionaryEntry:
+        started = time.monotonic()
+        entry = await fetch(word)
+        logger.debug(
+            "Wooordhunt '%s' fetched in %.2fs",
+            word,
+            time.monotonic() - started,
+        )
+        return entry
+
+    def _done(self, word: str, task: asyncio.Future) -> None:
+        if self._inflight.get(word) is task:
+            del self._inflight[word]
+        # ошибку забирают ожидающие; если все отменены - не логировать её
+        # как "never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    def fetching(self, word: str) -> bool:
+        """Загружается ли слово с сайта в этом воркере прямо сейчас"""
+        return normalize(word) in self._inflight
+
+    async def missing(self, db: AsyncSession, words: list[str]) -> list[str]:
+        """Нормализованные слова без свежей статьи в памяти и в таблице;
+        с сайта ничего не загружает"""
+        keys = [
+            key
+            for key in dict.fromkeys(normalize(word) for word in words)
+            if key and self.get(key) is None
+        ]
+        if not keys:
+            return []
+        stored = await self._load_many(db, keys)
+        now = datetime.utcnow()
+        result = []
+        for key in keys:
+            item = stored.get(key)
+            expires = _expires(*item) if item is not None else None
+            if expires is not None and expires > now:
+                self.put(key, item[0], expires)
+            else:
+                result.append(key)
+        return result
+
+    async def prefetch(
+        self,
+        session_factory: async_sessionmaker,
+        word: str,
+        fetch: Callable[[str], Awaitable[DictionaryEntry]],
+    ) -> None:
+        """Загружает статью слова с сайта и сохраняет её в кэш
+
+        Загрузка общая с параллельными запросами того же слова, сессия БД
+        открывается только для записи готовой статьи.
+        """
+        key = normalize(word)
+        entry = await self._fetch_once(key, fetch)
+        async with session_factory() as db:
+            fetched_at = await self._store_many(db, {key: entry})
+            await db.commit()
+        self.put(key, entry, _expires(entry, fetched_at))
+
+    async def lookup_many(
+        self,
+        db: AsyncSession,
+        words: list[str],
+        fetch: Callable[[str], Awaitable[DictionaryEntry]],
+        concurrency: int = FETCH_CONCURRENCY,
+    ) -> tuple[dict[str, DictionaryEntry], dict[str, BaseException]]:
+        """Статьи слов из памяти, из таблицы или с сайта через fetch
+
+        Таблица читается одним SELECT на все промахи памяти, с сайта
+        одновременно загружается не больше concurrency слов, новые статьи
+        пишутся одним INSERT. Возвращает статьи и ошибки загрузки по
+        нормализованным словам.
+        """
+        entries: dict[str, DictionaryEntry] = {}
+        misses = []
+        for key in dict.fromkeys(normalize(word) for word in words):
+            entry = self.get(key)
+            if entry is not None:
+                self.hits += 1
+                entries[key] = entry
+            elif key:
+                self.misses += 1
+                misses.append(key)
+        if not misses:
+            return entries, {}
+
+        stored = await self._load_many(db, misses)
+        now = datetime.utcnow()
+        to_fetch = []
+        for key in misses:
+            item = stored.get(key)
+            expires = _expires(*item) if item is not None else None
+            if expires is not None and expires > now:
+                self.put(key, item[0], expires)
+                entries[key] = item[0]
+            else:
+                to_fetch.append(key)
+        if not to_fetch:
+            return entries, {}
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _fetch(key: str) -> DictionaryEntry:
+            async with semaphore:
+                return await self._fetch_once(key, fetch)
+
+        results = await asyncio.gather(
+            *(_fetch(key) for key in to_fetch), return_exceptions=True
+        )
+        fetched: dict[str, DictionaryEntry] = {}
+        errors: dict[str, BaseException] = {}
+        for key, result in zip(to_fetch, results):
+            # CancelledError - не Exception, но результатом он не является
+            if not isinstance(result, BaseException):
+                fetched[key] = result
+            elif key in stored:
+                # сайт недоступен - лучше устаревшая статья, чем ошибка
+                logger.warning(
+                    "Wooordhunt fetch failed, serving stale '%s'", key
+                )
+                entries[key] = stored[key][0]
+            else:
+                errors[key] = result
+        if fetched:
+            fetched_at = await self._store_many(db, fetched)
+            for key, entry in fetched.items():
+                self.put(key, entry, _expires(entry, fetched_at))
+            entries.update(fetched)
+        return entries, errors
+
+    async def lookup(
+        self,
+        db: AsyncSession,
+        word: str,
+        fetch: Callable[[str], Awaitable[DictionaryEntry]],
+    ) -> DictionaryEntry:
+        """Статья одного слова (см. lookup_many); ошибку загрузки поднимает"""
+        key = normalize(word)
+        entries, errors = await self.lookup_many(db, [key], fetch)
+        if key in errors:
+            raise errors[key]
+        return entries[key]
+
+
+cache = DictionaryCache()
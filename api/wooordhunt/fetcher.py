@@ -0,0 +1,122 @@
+"""Загрузка страниц wooordhunt.ru одним общим httpx.AsyncClient
+
+Клиент держит соединения открытыми (keep-alive, HTTP/2, если установлен
+пакет h2), у каждого запроса есть таймауты, временные ошибки и ответы
+429/5xx повторяются с экспоненциальной задержкой. Ввод-вывод идёт в цикле
+событий; в потоке выполняется только разбор HTML, и у него свой лимит
+потоков, чтобы не занимать общий (им пользуется, например, TTS).
+"""
+
+import asyncio
+import os
+import random
+from typing import Optional
+from urllib.parse import quote
+
+import anyio
+import httpx
+
+from wooordhunt import parser
+from wooordhunt.models import DictionaryEntry
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+WOOORDHUNT_URL = "https://wooordhunt.ru/word/{}"
+TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+# Повторы при сетевых ошибках, 429 и 5xx
+RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+# Проверка сертификата сайта (WOOORDHUNT_VERIFY_SSL=0 - выключить)
+VERIFY_SSL = os.environ.get("WOOORDHUNT_VERIFY_SSL", "1") != "0"
+# Сколько страниц разбирать в потоках одновременно
+PARSE_THREADS = 4
+
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+_client: Optional[httpx.AsyncClient] = None
+_parse_limiter: Optional[anyio.CapacityLimiter] = None
+
+
+class FetchError(Exception):
+    """Сайт недоступен или ответил ошибкой после всех повторов"""
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=HTTP2,
+            timeout=TIMEOUT,
+            limits=LIMITS,
+            verify=VERIFY_SSL,
+            follow_redirects=True,
+            headers={"User-Agent": "Mozilla/5.0 (language-helper)"},
+        )
+    return _client
+
+
+async def close() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _delay(attempt: int, response: Optional[httpx.Response]) -> float:
+    retry_after = response.headers.get("Retry-After") if response else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), BACKOFF_MAX)
+    # экспоненциальная задержка со случайной добавкой
+    delay = BACKOFF_BASE * 2**attempt
+    return min(delay + random.uniform(0, delay), BACKOFF_MAX)
+
+
+async def fetch_page(word: str) -> Optional[str]:
+    """HTML страницы слова или None, если такой страницы нет (404)"""
+    url = WOOORDHUNT_URL.format(quote(word))
+    client = get_client()
+    for attempt in range(RETRIES + 1):
+        response = None
+        try:
+            response = await client.get(url)
+        except httpx.TransportError as e:
+            error = e
+        else:
+            if response.status_code == 404:
+                return None
+            if response.status_code not in _RETRY_STATUSES:
+                try:
+                    response.raise_for_status()
+                except httpx.HTTPStatusError as e:
+                    raise FetchError(str(e)) from e
+                return response.text
+            error = httpx.HTTPStatusError(
+                f"HTTP {response.status_code}",
+                request=response.request,
+                response=response,
+            )
+        if attempt == RETRIES:
+            raise FetchError(f"{url}: {error}") from error
+        await asyncio.sleep(_delay(attempt, response))
+
+
+async def fetch_entry(word: str) -> DictionaryEntry:
+    """Скачивает и разбирает статью слова"""
+    global _parse_limiter
+    page = await fetch_page(word)
+    if page is None:
+        return DictionaryEntry(
+            word=word, transcription=None, translation=None, examples=[]
+        )
+    if _parse_limiter is None:
+        _parse_limiter = anyio.CapacityLimiter(PARSE_THREADS)
+    return await anyio.to_thread.run_sync(
+        parser.parse_entry, word, page, limiter=_parse_limiter
+    )
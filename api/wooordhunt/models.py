@@ -1,4 +1,4 @@
-from typing import TypedDict
+from typing import NotRequired, TypedDict
 
 
 class Example(TypedDict):
@@ -19,3 +19,5 @@ class DictionaryEntry(TypedDict):
     transcription: str | None
     translation: str | None
     examples: list[Example]
+    # ссылка на mp3 произношения (в записях кэша до её появления нет)
+    audio: NotRequired[str | None]
@@ -1,199 +1,177 @@
-import re
-import urllib
-import urllib.request
-import requests
-from pathlib import Path
-from bs4 import BeautifulSoup as BS
-import ssl
-
-
-def reduce(lc_source: str):
-    return (
-        lc_source.replace("                ", " ")
-        .replace("                ", " ")
-        .replace("        ", " ")
-        .replace("        ", " ")
-        .replace("    ", " ")
-        .replace("    ", " ")
-        .replace("  ", " ")
-        .replace("  ", " ")
-        .replace("  ", " ")
-    )
-
+"""Разбор страницы слова wooordhunt.ru в статью словаря
 
-def cleanhtml(raw_html):
-    cleantext = re.sub(re.compile("<.*?>"), "", raw_html)
-    return cleantext
-
-
-def find_from(lc_source: str, lc_search: str, index=1):
-    val = -1
-    for i in range(0, index):
-        val = lc_source.find(lc_search, val + 1)
-    return val
-
-
-def sx(source_string="", left_split="", right_split="", index=1):
-    if source_string.count(left_split) < index:
-        return ""
-    lc_str = source_string
-    for i in range(0, index):
-        lc_str = lc_str[lc_str.find(left_split) + len(left_split) : len(lc_str)]
-    return lc_str[0 : lc_str.find(right_split)]
-
-
-def download_file(url: str, path):
-    print(f"{url} ===> {path}")
-    lc_local_file_name = path
-    r = requests.get(url, stream=True, verify=False)
-    if r.status_code == 200:
-        with open(lc_local_file_name, "wb") as f:
-            for chunk in r:
-                f.write(chunk)
-
-
-class Wooordhunt:
-    def __init__(self, lc_link: str):
-        context = ssl._create_unverified_context()
-        self.context = sx(
-            urllib.request.urlopen(lc_link, context=context)
-            .read()
-            .decode("UTF-8")
-            + "||||||",
-            '<div id="header">',
-            "||||||",
-        )
-        self.sound_path = sx(
-            self.context,
-            '<audio id="audio_us" preload="auto"> <source src="',
-            '"',
-        )
-        if len(self.sound_path) > 5:
-            path_for_sounds = (
-                Path(__file__).resolve().parent.parent / "static" / "sounds"
-            )
-            print(f"path_for_sounds:{path_for_sounds}")
-
-            # пока ничего не качаем
-            # download_file(r'http://wooordhunt.ru'+self.sound_path, path_for_sounds / sx((self.sound_path+'|')[::-1], '|', '/')[::-1])
-
-    def get_transcription(self):
-        lc_str = sx(
-            self.context, 'class="transcription">', "</span> <audio"
-        ).replace(" ", "")
-        if "<" in lc_str:
-            lc_str = "|" + sx(lc_str, "|", "|") + "|"
-        return lc_str
-
-    def get_path_on_mp3(self):
-        return "https://wooordhunt.ru" + sx(
-            self.context,
-            '<audio id="audio_us" preload="auto"> <source src="',
-            '"',
-        )
-
-    def get_translation(self):
-        lc_result_str = sx(self.context, '<div class="t_inline_en">', "</div>")
-        lc_from = "<h4 class="
-        lc_to = '<div class="gap"></div>'
-        lc_result = lc_from + sx(
-            self.context.replace("<br/>", chr(13)), lc_from, lc_to
-        ).replace("+7", chr(13))
-        lc_result = cleanhtml(lc_result)
-        lc_result = (
-            lc_result.replace("&ensp;", " ")
-            .replace("&#8595;", "")
-            .replace("Мои примеры", "")
-            .replace("<h4 class=", "")
-        )
-        lc_result = lc_result.replace("глагол - ", "- ").replace(
-            "глагол- ", "- "
-        )
-        lc_result = lc_result.replace("прилагательное -", "- ").replace(
-            "прилагательное-", "- "
-        )
-        lc_result = lc_result.replace("наречие- ", "- ").replace(
-            "наречие - ", "- "
-        )
-        lc_result = lc_result.replace("существительное-", "- ").replace(
-            "существительное -", "- "
-        )
-        return reduce(lc_result_str + chr(13) + lc_result)
-
-    def get_examples(self):
-        lc_result = ""
-        soup = BS(self.context, features="html5lib")
-        original = soup.find_all("p", {"class": "ex_o"})
-        translate = soup.find_all("p", {"class": "ex_t"})
-        examples = []
-        for i in range(min(len(original), len(translate))):
-            examples.append(
-                {
-                    "example": original[i].text.strip(),
-                    "translate": translate[i].text.strip(),
-                }
-            )
-        return examples
-
-
-def only_english_paragraphs(pc_str: str):
-    lc_russian = "йцукенгшщзхъфывапролджэячсмитьбюё"
-    lc_russian = lc_russian + lc_russian.upper()
-    lc_result = ""
-
-    lb_now_english = False
-    for lc_chr in pc_source:
-        if lb_now_english == False and lc_chr in lc_russian:
-            pass  # сейчас не английский и текущая буква не английская - просто подолжаем
+Страница проходится один раз потоковым html.parser, без построения
+дерева: по пути собираются транскрипция, ссылка на звук, краткий и полный
+перевод и примеры.
+"""
 
+import re
+from html.parser import HTMLParser
+from typing import Optional
+
+from wooordhunt.models import DictionaryEntry, Example
+
+WOOORDHUNT_ORIGIN = "https://wooordhunt.ru"
+
+# "глагол - гасить" -> "- гасить"
+_PART_OF_SPEECH = re.compile(
+    r"^(?:глагол|прилагательное|наречие|существительное)\s*-\s*"
+)
+# Строки блока перевода, которые не относятся к переводу
+_SKIP_LINES = {"Мои примеры"}
+# Всё нужное - после шапки сайта, меню и скрипты до неё не разбираются
+_CONTENT_START = '<div id="header">'
+_SKIP_CONTENT = frozenset({"script", "style"})
+
+
+def _classes(attrs: list[tuple[str, Optional[str]]]) -> set[str]:
+    for name, value in attrs:
+        if name == "class" and value:
+            return set(value.split())
+    return set()
+
+
+def _attr(attrs: list[tuple[str, Optional[str]]], key: str) -> Optional[str]:
+    for name, value in attrs:
+        if name == key:
+            return value
+    return None
+
+
+def _text(parts: list[str]) -> str:
+    return " ".join("".join(parts).split())
+
+
+class _EntryParser(HTMLParser):
+    """Собирает части статьи за один проход по странице
+
+    Захватываемый элемент (транскрипция, краткий перевод, пример)
+    запоминается тегом и глубиной вложенности одноимённых тегов, его текст
+    копится в _buffer до закрывающего тега.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.transcription: Optional[str] = None
+        self.audio: Optional[str] = None
+        self.inline: Optional[str] = None
+        self.lines: list[str] = []
+        self.originals: list[str] = []
+        self.translates: list[str] = []
+        self._capture: Optional[str] = None
+        self._capture_tag = ""
+        self._depth = 0
+        self._buffer: list[str] = []
+        self._in_audio_us = False
+        self._skip = 0
+        # блок полного перевода: от первого <h4 class> до <div class="gap">
+        self._block = "before"
+        self._line: list[str] = []
+
+    def _start_capture(self, what: str, tag: str):
+        self._capture, self._capture_tag, self._depth = what, tag, 1
+        self._buffer = []
+
+    def _finish_capture(self):
+        text = _text(self._buffer)
+        what = self._capture
+        self._capture = None
+        if what == "transcription":
+            self.transcription = text.replace(" ", "") or None
+        elif what == "inline":
+            self.inline = text or None
+        elif what == "example":
+            self.originals.append(text)
+        elif what == "translate":
+            self.translates.append(text)
+
+    def _new_line(self):
+        line = _text(self._line).replace("↓", "").strip()
+        self._line = []
+        if line and line not in _SKIP_LINES:
+            self.lines.append(_PART_OF_SPEECH.sub("- ", line))
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_CONTENT:
+            self._skip += 1
+            return
+        if self._capture is not None:
+            if tag == self._capture_tag:
+                self._depth += 1
+            return
+
+        if tag == "audio":
+            self._in_audio_us = _attr(attrs, "id") == "audio_us"
+        elif tag == "source" and self._in_audio_us and self.audio is None:
+            src = _attr(attrs, "src")
+            if src:
+                self.audio = src if "://" in src else WOOORDHUNT_ORIGIN + src
+
+        classes = _classes(attrs) if attrs else set()
         if (
-            lb_now_english == True and lc_chr in lc_russian
-        ):  # был английский, но, теперь он кончился
-            pass
-
-        if lc_chr in lc_russian:
-            lc_result = (
-                lc_result
-                + '<span class = "'
-                + lc_style_name
-                + '">'
-                + lc_chr
-                + "</span>"
-            )
-        else:
-            lc_result = lc_result + lc_chr
-    return lc_result
-
-
-# удаляет их строки все символы не подходящите для имени файла
-def Delete_from_String_all_Characters_Unsuitable_For_FileName(pc: str):
-    lc_suitable_simbols = "qwertyuiopasdfghjklzxcvbnm,.1234567890-!"
-    lc_suitable_simbols = (
-        lc_suitable_simbols + lc_suitable_simbols.upper() + " "
-    )
-    lc_result = ""
-    for ch in pc:
-        if ch in lc_suitable_simbols:
-            lc_result = lc_result + ch
-    return lc_result.strip()
-
-
-if False:
-    lo_wh = Wooordhunt(r"https://wooordhunt.ru/word/quench")
-    open("source.html", "w", encoding="utf8").write(lo_wh.context)
-    print("========================================= transcription")
-    print(lo_wh.get_transcription())
-    open("transcription.html", "w", encoding="utf8").write(
-        lo_wh.get_transcription()
+            tag == "span"
+            and "transcription" in classes
+            and self.transcription is None
+        ):
+            self._start_capture("transcription", tag)
+        elif tag == "div" and "t_inline_en" in classes and self.inline is None:
+            self._start_capture("inline", tag)
+        elif tag == "p" and "ex_o" in classes:
+            self._start_capture("example", tag)
+        elif tag == "p" and "ex_t" in classes:
+            self._start_capture("translate", tag)
+
+        if self._block == "before" and tag == "h4" and classes:
+            self._block = "inside"
+        elif self._block == "inside":
+            if tag == "div" and "gap" in classes:
+                self._new_line()
+                self._block = "after"
+            elif tag in ("br", "h4", "div", "p", "li"):
+                self._new_line()
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_CONTENT:
+            self._skip = max(0, self._skip - 1)
+            return
+        if tag == "audio":
+            self._in_audio_us = False
+        if self._capture is not None and tag == self._capture_tag:
+            self._depth -= 1
+            if self._depth == 0:
+                self._finish_capture()
+
+    def close(self):
+        super().close()
+        if self._block == "inside":
+            self._new_line()
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if self._capture is not None:
+            self._buffer.append(data)
+        elif self._block == "inside":
+            self._line.append(data)
+
+
+def parse_entry(word: str, page: str) -> DictionaryEntry:
+    """Разбирает HTML страницы слова в статью словаря"""
+    start = page.find(_CONTENT_START)
+    parser = _EntryParser()
+    parser.feed(page[start:] if start > 0 else page)
+    parser.close()
+
+    translation = "\n".join(
+        line for line in [parser.inline, *parser.lines] if line
     )
-    print("========================================= path_on_mp3")
-    print(lo_wh.get_path_on_mp3())
-    print("========================================= translation")
-    print(lo_wh.get_translation())
-    open("translation.html", "w", encoding="utf8").write(
-        lo_wh.get_translation()
+    return DictionaryEntry(
+        word=word,
+        transcription=parser.transcription,
+        translation=translation or None,
+        examples=[
+            Example(example=example, translate=translate)
+            for example, translate in zip(parser.originals, parser.translates)
+        ],
+        audio=parser.audio,
     )
-    print("========================================= examples")
-    print(lo_wh.get_examples())
-    open("examples.html", "w", encoding="utf8").write(lo_wh.get_examples())
-    print("=========================================")
@@ -0,0 +1,229 @@
+"""Фоновый прогрев кэша словаря словами читаемой книги
+
+После выдачи окна абзацев в очередь воркера ставятся уникальные слова
+окна и следующих за ним PREWARM_PARAGRAPHS абзацев, кроме частых слов и
+слов из словаря пользователя. Одна задача на воркер загружает их статьи в
+кэш (wooordhunt.cache). Очередь запросов к сайту общая для всех воркеров
+(строка dictionary_fetch_slot в БД): все вместе они обращаются к нему не
+чаще раза в PREWARM_INTERVAL секунд, а слово, которое читатель затем
+ищет, уже лежит в кэше. Очередь слов ограничена MAX_QUEUED, лишние
+отбрасываются.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import extract, func, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from db import books, models, vocabulary
+from language.lemmatizer import lemma
+from wooordhunt import cache as dictionary_cache, fetcher
+
+logger = logging.getLogger(__name__)
+
+# Сколько абзацев после окна прогревать (0 - прогрев выключен)
+PREWARM_PARAGRAPHS = int(os.environ.get("DICTIONARY_PREWARM_PARAGRAPHS", "30"))
+# Пауза между запросами прогрева к сайту, секунд (на все воркеры)
+PREWARM_INTERVAL = float(os.environ.get("DICTIONARY_PREWARM_INTERVAL", "2"))
+# Пауза после ошибки загрузки (сайт ограничивает частоту или недоступен)
+ERROR_PAUSE = 60.0
+MAX_QUEUED = 2_000
+# Сколько слов очереди проверять в кэше одним запросом
+BATCH_SIZE = 5
+MIN_LENGTH = 3
+# Сколько книг помнить для отсечения уже просмотренных абзацев
+MAX_BOOKS = 10_000
+
+_COMMON_WORDS_FILE = os.path.join(os.path.dirname(__file__), "common_words.txt")
+
+
+def _load_common_words(path: str) -> frozenset[str]:
+    with open(path, encoding="utf-8") as f:
+        return frozenset(
+            line.strip()
+            for line in f
+            if line.strip() and not line.startswith("#")
+        )
+
+
+# Служебные слова, которые читатель и так знает
+COMMON_WORDS = _load_common_words(_COMMON_WORDS_FILE)
+# Ключи словоформ служебных слов: отсеивают и "does", и "having"
+_COMMON_LEMMAS = frozenset(lemma(word) for word in COMMON_WORDS)
+
+
+def is_candidate(token: str) -> bool:
+    """Стоит ли искать токен в словаре заранее"""
+    return (
+        len(token) >= MIN_LENGTH
+        and token.isascii()
+        and token.isalpha()
+        and token not in COMMON_WORDS
+        and lemma(token) not in _COMMON_LEMMAS
+    )
+
+
+class Prewarmer:
+    """Очередь слов воркера и задача, загружающая их статьи в кэш"""
+
+    def __init__(self, max_queued: int = MAX_QUEUED):
+        self._queue: asyncio.Queue[str] = asyncio.Queue(max_queued)
+        self._queued: set[str] = set()
+        # (пользователь, книга) -> просмотренный отрезок абзацев
+        self._scanned: dict[tuple[int, int], tuple[int, int]] = {}
+        self._session_factory: Optional[async_sessionmaker] = None
+        self.fetched = 0
+        self.dropped = 0
+
+    def add(self, words: list[str]) -> int:
+        """Ставит в очередь слова, которых ещё нет в ней и в памяти кэша"""
+        added = 0
+        for word in words:
+            if (
+                word in self._queued
+                or dictionary_cache.cache.get(word) is not None
+            ):
+                continue
+            try:
+                self._queue.put_nowait(word)
+            except asyncio.QueueFull:
+                self.dropped += len(words) - added
+                break
+            self._queued.add(word)
+            added += 1
+        return added
+
+    def _unscanned(
+        self, user_id: int, id_book: int, id_from: int, id_to: int
+    ) -> int:
+        """Первый ещё не просмотренный абзац окна; запоминает окно
+
+        Окна читателя идут внахлёст вперёд, поэтому для книги хранится
+        один просмотренный отрезок, который продлевается при нахлёсте.
+        """
+        key = (user_id, id_book)
+        scanned = self._scanned.get(key)
+        if scanned is not None and scanned[0] <= id_from <= scanned[1] + 1:
+            self._scanned[key] = (scanned[0], max(scanned[1], id_to))
+            return scanned[1] + 1
+        if len(self._scanned) >= MAX_BOOKS:
+            self._scanned.clear()
+        self._scanned[key] = (id_from, id_to)
+        return id_from
+
+    async def prewarm_book(
+        self,
+        session_factory: async_sessionmaker,
+        id_book: int,
+        id_from: int,
+        id_to: int,
+        user_id: int,
+    ) -> None:
+        """Ставит в очередь новые слова окна абзацев [id_from, id_to]
+
+        Запускается фоном после выдачи окна; уже просмотренные абзацы
+        книги повторно не читаются.
+        """
+        id_from = self._unscanned(user_id, id_book, id_from, id_to)
+        if id_from > id_to:
+            return
+        try:
+            async with session_factory() as db:
+                tokens = await books.get_window_tokens(
+                    db, id_book, id_from, id_to, user_id
+                )
+                candidates = sorted(
+                    token
+                    for token in tokens
+                    if is_candidate(token)
+                    and dictionary_cache.cache.get(token) is None
+                )
+                words = await vocabulary.unknown_words(db, user_id, candidates)
+        except Exception:
+            logger.exception(
+                "Dictionary prewarm: failed to read book %s paragraphs %s-%s",
+                id_book,
+                id_from,
+                id_to,
+            )
+            return
+        added = self.add(words)
+        logger.debug(
+            "Dictionary prewarm: book %s paragraphs %s-%s, %s words queued",
+            id_book,
+            id_from,
+            id_to,
+            added,
+        )
+
+    async def _reserve_slot(self) -> float:
+        """Занимает общую для воркеров очередь к сайту и возвращает, сколько
+        секунд ждать своего запроса
+
+        Время следующего запроса сдвигается на PREWARM_INTERVAL одним
+        INSERT ... ON CONFLICT в отдельной короткой транзакции.
+        """
+        slot = models.DictionaryFetchSlot
+        now = func.timezone("utc", func.clock_timestamp())
+        step = literal(timedelta(seconds=PREWARM_INTERVAL))
+        stmt = pg_insert(slot).values(id=1, next_at=now + step)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["id"],
+            set_={"next_at": func.greatest(slot.next_at, now) + step},
+        ).returning(extract("epoch", slot.next_at - step - now))
+        async with self._session_factory() as db:
+            delay = (await db.execute(stmt)).scalar_one()
+            await db.commit()
+        return float(delay)
+
+    async def _wait_turn(self) -> None:
+        delay = await self._reserve_slot()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _prewarm(self, word: str) -> None:
+        """Загружает статью слова в свою очередь к сайту
+
+        Очереди ждёт вне кэша и без открытой сессии БД: если слово за это
+        время запросит читатель, его запрос загрузит статью сам, а прогрев
+        слово пропустит.
+        """
+        await self._wait_turn()
+        cache = dictionary_cache.cache
+        if cache.get(word) is not None or cache.fetching(word):
+            return
+        await cache.prefetch(self._session_factory, word, fetcher.fetch_entry)
+        self.fetched += 1
+
+    async def run(self, session_factory: async_sessionmaker) -> None:
+        """Бесконечно разбирает очередь; запускается в lifespan приложения
+
+        Слова, уже лежащие в таблице кэша, не загружаются, с сайта слова
+        загружаются по одному.
+        """
+        self._session_factory = session_factory
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < BATCH_SIZE and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                async with session_factory() as db:
+                    missing = await dictionary_cache.cache.missing(db, batch)
+                for word in missing:
+                    await self._prewarm(word)
+            except fetcher.FetchError as e:
+                logger.warning("Dictionary prewarm paused: %s", e)
+                await asyncio.sleep(ERROR_PAUSE)
+            except Exception:
+                logger.exception("Dictionary prewarm failed")
+                await asyncio.sleep(ERROR_PAUSE)
+            finally:
+                self._queued.difference_update(batch)
+
+
+prewarmer = Prewarmer()
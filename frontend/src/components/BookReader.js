@@ -246,13 +246,14 @@ function BookReader() {
     fetchMeta();
   }, [apiUrl, id_book]);
 
-  // Helper to fetch one paragraph and sort sentences by id_sentence
-  const fetchParagraph = async (id_paragraph) => {
-    const res = await fetch(`${apiUrl}/book/paragraph?id_book=${id_book}&id_paragraph=${id_paragraph}`, { credentials: 'include' });
-    if (!res.ok) throw new Error(`Failed to load paragraph ${id_paragraph}`);
+  // Helper to fetch a window of paragraphs [from, to] in one request
+  const fetchParagraphs = async (from, to) => {
+    const res = await fetch(`${apiUrl}/book/paragraphs?id_book=${id_book}&from=${from}&to=${to}`, { credentials: 'include' });
+    if (!res.ok) throw new Error(`Failed to load paragraphs ${from}-${to}`);
     const data = await res.json();
-    const sorted = Array.isArray(data) ? [...data].sort((a, b) => (a.id_sentence || 0) - (b.id_sentence || 0)) : [];
-    return { id_paragraph: Number(id_paragraph), sentences: sorted };
+    return Array.isArray(data)
+      ? data.map((p) => ({ id_paragraph: Number(p.id_paragraph), sentences: p.sentences || [] }))
+      : [];
   };
 
   // Load 5 paragraphs window starting at startParagraph
@@ -263,17 +264,8 @@ function BookReader() {
       setError(null);
       try {
         const start = Math.max(bookMeta.Min_Paragraph_Number, startParagraph);
-        const endExclusive = Math.min(start + 5, bookMeta.Max_Paragraph_Number + 1);
-        const ids = [];
-        for (let p = start; p < endExclusive; p++) ids.push(p);
-        const results = [];
-        for (const pid of ids) {
-          // sequential to keep it simple and avoid overloading API
-          // could be parallelized if backend supports
-          // eslint-disable-next-line no-await-in-loop
-          const para = await fetchParagraph(pid);
-          results.push(para);
-        }
+        const end = Math.min(start + 4, bookMeta.Max_Paragraph_Number);
+        const results = await fetchParagraphs(start, end);
         setParagraphs(results);
       } catch (e) {
         console.error(e);
@@ -285,7 +277,7 @@ function BookReader() {
     loadWindow();
   }, [bookMeta, startParagraph]);
 
-  // After paragraphs are loaded, fetch words-under-study present in the text
+  // After paragraphs are loaded, fetch words-under-study with their offsets
   useEffect(() => {
     const fetchStudyWords = async () => {
       try {
@@ -293,86 +285,63 @@ function BookReader() {
           setStudyMap({});
           return;
         }
-        // Concatenate visible text (limit size to be safe)
-        const text = paragraphs
-          .flatMap((p) => (p.sentences || []).map((s) => s.sentence || ''))
-          .join(' ')
-          .slice(0, 200000);
-        if (!text.trim()) {
-          setStudyMap({});
-          return;
-        }
-        const res = await fetch(`${apiUrl}/syllables/in_text`, {
-          method: 'POST',
-          credentials: 'include',
-          headers: { 'Content-Type': 'application/json', accept: 'application/json' },
-          body: JSON.stringify({ text }),
-        });
+        const from = paragraphs[0].id_paragraph;
+        const to = paragraphs[paragraphs.length - 1].id_paragraph;
+        const res = await fetch(
+          `${apiUrl}/book/study_words?id_book=${id_book}&from=${from}&to=${to}`,
+          { credentials: 'include', headers: { accept: 'application/json' } }
+        );
         if (!res.ok) {
           // don't block reading
-          console.warn('Failed to fetch syllables/in_text', res.status);
+          console.warn('Failed to fetch book/study_words', res.status);
           setStudyMap({});
           return;
         }
         const list = await res.json();
-        // Build lookup map by lowercased word
+        // Group hits by sentence id
         const map = {};
         (list || []).forEach((it) => {
-          if (it && it.word) {
-            const key = String(it.word).toLowerCase();
-            map[key] = { word: it.word, transcription: it.transcription, translations: it.translations };
+          if (it && it.id_sentence != null) {
+            (map[it.id_sentence] = map[it.id_sentence] || []).push(it);
           }
         });
         setStudyMap(map);
       } catch (e) {
-        console.warn('syllables/in_text error', e);
+        console.warn('book/study_words error', e);
         setStudyMap({});
       }
     };
     fetchStudyWords();
-  }, [paragraphs, apiUrl]);
+  }, [paragraphs, apiUrl, id_book]);
 
-  // Helpers to highlight study words in a sentence
-  const escapeRegex = (s) => s.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
-  const renderSentence = (text, keyPrefix = '') => {
+  // Highlight study words of a sentence using offsets from the server
+  const renderSentence = (text, idSentence, keyPrefix = '') => {
     if (!text) return null;
-    const words = Object.keys(studyMap || {});
-    if (!words.length) return text;
-    // Build regex to match any of the study words with unicode letter boundaries
-    const patterns = words
-      .sort((a, b) => b.length - a.length)
-      .map((w) => escapeRegex(w));
-    // Fallback to simple word boundary. Note: \b is imperfect for non-latin, but acceptable here.
-    const re = new RegExp(`(${patterns.join('|')})`, 'gi');
+    const hits = (studyMap || {})[idSentence];
+    if (!hits || !hits.length) return text;
     const out = [];
     let lastIndex = 0;
-    let idx = 0;
-    let m;
-    while ((m = re.exec(text)) !== null) {
-      const start = m.index;
-      const end = start + m[0].length;
-      if (start > lastIndex) {
-        out.push(text.slice(lastIndex, start));
+    hits.forEach((hit, idx) => {
+      // hits are sorted by start; skip ones overlapping a longer match
+      if (hit.start < lastIndex) return;
+      if (hit.start > lastIndex) {
+        out.push(text.slice(lastIndex, hit.start));
       }
-      const raw = m[0];
-      const key = String(raw).toLowerCase();
-      const info = studyMap[key] || studyMap[String(m[1] || '').toLowerCase()];
-      const title = [info?.translations || '', info?.transcription ? ` [${info.transcription}]` : '']
+      const title = [hit.translations || '', hit.transcription ? ` [${hit.transcription}]` : '']
         .join('')
         .trim();
       out.push(
         <span
-          key={`${keyPrefix}hl-${idx}-${start}`}
+          key={`${keyPrefix}hl-${idx}-${hit.start}`}
           className="study-word"
           title={title || undefined}
           style={{ color: '#fff3cd' }}
         >
-          {raw}
+          {text.slice(hit.start, hit.end)}
         </span>
       );
-      idx += 1;
-      lastIndex = end;
-    }
+      lastIndex = hit.end;
+    });
     if (lastIndex < text.length) out.push(text.slice(lastIndex));
     return out;
   };
@@ -423,8 +392,9 @@ function BookReader() {
     }
   };
 
-  // Refresh only lightweight stats (e.g., paragraphs_read_24h) after saving position
-  const refreshBookStats = async () => {
+  // Refresh only lightweight stats (e.g., paragraphs_read_24h) after saving position.
+  // The server writes positions in the background, so the value just saved wins.
+  const refreshBookStats = async (savedParagraph) => {
     try {
       const res = await fetch(`${apiUrl}/book?book_id=${id_book}`, { credentials: 'include' });
       if (!res.ok) return;
@@ -435,8 +405,7 @@ function BookReader() {
         paragraphs_read_24h: data?.paragraphs_read_24h ?? prev?.paragraphs_read_24h,
         Min_Paragraph_Number: data?.Min_Paragraph_Number ?? prev?.Min_Paragraph_Number,
         Max_Paragraph_Number: data?.Max_Paragraph_Number ?? prev?.Max_Paragraph_Number,
-        // optionally sync current_paragraph from server if needed
-        current_paragraph: data?.current_paragraph ?? prev?.current_paragraph,
+        current_paragraph: savedParagraph ?? data?.current_paragraph ?? prev?.current_paragraph,
       }));
     } catch (_) {
       // ignore silent refresh errors
@@ -461,7 +430,7 @@ function BookReader() {
         console.error('Failed to save position', res.status, txt);
       } else {
         // After a successful save, refresh stats so the 24h counter updates without full reload
-        refreshBookStats();
+        refreshBookStats(newStart);
       }
     } catch (e) {
       console.error('Error saving position', e);
@@ -555,7 +524,7 @@ function BookReader() {
                       onClick={handleSentenceClick}
                       style={{ color: idx % 2 === 0 ? 'lightgreen' : 'lightblue', cursor: 'pointer' }}
                     >
-                      {renderSentence(s.sentence, `${p.id_paragraph}-${idx}-`)}
+                      {renderSentence(s.sentence, s.id_sentence, `${p.id_paragraph}-${idx}-`)}
                     </span>
                     <button
                       type="button"
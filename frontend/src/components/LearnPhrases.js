@@ -2,11 +2,9 @@ import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../App';
 import './Phrases.css';
+import useReviewQueue, { GRADE_AGAIN, GRADE_GOOD } from './useReviewQueue';
 
 function LearnPhrases() {
-  const [currentPhrase, setCurrentPhrase] = useState(null);
-  const [loading, setLoading] = useState(true);
-  const [error, setError] = useState('');
   const [repeatedToday, setRepeatedToday] = useState(null); // { count }
   const { user } = useAuth();
   const navigate = useNavigate();
@@ -22,41 +20,15 @@ function LearnPhrases() {
 
   const fetchRepeatedToday = async () => {
     try {
-      const res = await fetch(`${apiUrl}/phrase/repeated_today`, { credentials: 'include' });
+      const res = await fetch(`${apiUrl}/stats/today`, { credentials: 'include' });
       if (!res.ok) return; // silently ignore; not critical for learning flow
-      const data = await res.json(); // { count: number }
-      setRepeatedToday(data);
+      const data = await res.json(); // { phrases, syllables, paragraphs }
+      setRepeatedToday({ count: data.phrases });
     } catch (e) {
       // ignore
     }
   };
 
-  const fetchNextPhrase = async (currentId = 0) => {
-    try {
-      setLoading(true);
-      const response = await fetch(`${apiUrl}/phrase/next?current_phrase_id=${currentId}`, {
-        credentials: 'include',
-      });
-      
-      if (!response.ok) {
-        throw new Error('Failed to fetch next phrase');
-      }
-      
-      const data = await response.json();
-      setCurrentPhrase(data);
-      setError('');
-      // Refresh repeated today counter on successful fetch of a new phrase
-      fetchRepeatedToday();
-    } catch (err) {
-      setError(err.message);
-      if (err.message.includes('401')) {
-        navigate('/login');
-      }
-    } finally {
-      setLoading(false);
-    }
-  };
-
   const cleanupAudioUrl = () => {
     if (audioUrl) URL.revokeObjectURL(audioUrl);
     setAudioUrl(null);
@@ -142,16 +114,29 @@ function LearnPhrases() {
     }
   };
 
+  // Cards come from a prefetched queue, answers are sent in batches
+  const {
+    current: currentPhrase,
+    loading,
+    error,
+    answer,
+  } = useReviewQueue('phrases', 'id_phrase', Boolean(user), fetchRepeatedToday);
+
   useEffect(() => {
     if (user) {
-      fetchNextPhrase(0);
       fetchRepeatedToday();
     }
   }, [user]);
 
-  const handleNextPhrase = () => {
+  useEffect(() => {
+    if (error && error.includes('401')) {
+      navigate('/login');
+    }
+  }, [error, navigate]);
+
+  const handleNextPhrase = (grade = GRADE_GOOD) => {
     if (currentPhrase) {
-      fetchNextPhrase(currentPhrase.id_phrase);
+      answer(grade);
     }
   };
 
@@ -194,8 +179,15 @@ function LearnPhrases() {
             <div className="translation">{currentPhrase.translation}</div>
           </div>
           
+          <button
+            onClick={() => handleNextPhrase(GRADE_AGAIN)}
+            className="next-button"
+            disabled={loading}
+          >
+            Не помню
+          </button>
           <button 
-            onClick={handleNextPhrase}
+            onClick={() => handleNextPhrase(GRADE_GOOD)}
             className="next-button"
             disabled={loading}
           >
@@ -2,13 +2,11 @@ import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../App';
 import './Phrases.css';
+import useReviewQueue, { GRADE_AGAIN, GRADE_GOOD } from './useReviewQueue';
 
 const apiUrl = process.env.REACT_APP_API_URL;
 
 function LearnSyllables() {
-  const [currentSyllable, setCurrentSyllable] = useState(null);
-  const [loading, setLoading] = useState(true);
-  const [error, setError] = useState('');
   const [repeatedToday, setRepeatedToday] = useState(null); // { count }
   const { user } = useAuth();
   const navigate = useNavigate();
@@ -23,46 +21,15 @@ function LearnSyllables() {
 
   const fetchRepeatedToday = async () => {
     try {
-      const res = await fetch(`${apiUrl}/syllable/repeated_today`, { credentials: 'include' });
+      const res = await fetch(`${apiUrl}/stats/today`, { credentials: 'include' });
       if (!res.ok) return;
-      const data = await res.json(); // { count }
-      setRepeatedToday(data);
+      const data = await res.json(); // { phrases, syllables, paragraphs }
+      setRepeatedToday({ count: data.syllables });
     } catch (e) {
       // ignore non-critical errors
     }
   };
 
-  const fetchNextSyllable = async (currentId = 0) => {
-    try {
-      setLoading(true);
-      const response = await fetch(`${apiUrl}/syllable/next?current_syllable_id=${currentId}`, {
-        credentials: 'include',
-      });
-      
-      if (!response.ok) {
-        throw new Error('Ошибка при загрузке слова');
-      }
-      
-      const data = await response.json();
-      
-      if (!data) {
-        setCurrentSyllable(null);
-        setError('Все слова изучены!');
-      } else {
-        setCurrentSyllable(data);
-        setError('');
-        fetchRepeatedToday();
-      }
-    } catch (err) {
-      setError(err.message);
-      if (err.message.includes('401')) {
-        navigate('/login');
-      }
-    } finally {
-      setLoading(false);
-    }
-  };
-
   const cleanupAudioUrl = () => {
     if (audioUrl) URL.revokeObjectURL(audioUrl);
     setAudioUrl(null);
@@ -148,20 +115,33 @@ function LearnSyllables() {
     }
   };
 
+  // Cards come from a prefetched queue, answers are sent in batches
+  const {
+    current: currentSyllable,
+    loading,
+    error,
+    answer,
+  } = useReviewQueue('syllables', 'syllable_id', Boolean(user), fetchRepeatedToday);
+
   useEffect(() => {
     if (user) {
-      fetchNextSyllable();
       fetchRepeatedToday();
     }
   }, [user]);
 
-  const handleNextSyllable = () => {
+  useEffect(() => {
+    if (error && error.includes('401')) {
+      navigate('/login');
+    }
+  }, [error, navigate]);
+
+  const handleNextSyllable = (grade = GRADE_GOOD) => {
     if (currentSyllable) {
       // Scroll page to the top when moving to the next word
       try {
         window.scrollTo({ top: 0, behavior: 'smooth' });
       } catch {}
-      fetchNextSyllable(currentSyllable.syllable_id);
+      answer(grade);
     }
   };
 
@@ -240,8 +220,15 @@ function LearnSyllables() {
             )}
           </div>
           
+          <button
+            onClick={() => handleNextSyllable(GRADE_AGAIN)}
+            className="next-button"
+            disabled={loading}
+          >
+            Не помню
+          </button>
           <button 
-            onClick={handleNextSyllable}
+            onClick={() => handleNextSyllable(GRADE_GOOD)}
             className="next-button"
             disabled={loading}
           >
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Link } from 'react-router-dom';
 import { useAuth } from '../App';
 
@@ -14,6 +14,8 @@ function SyllablesList() {
   const [wordPart, setWordPart] = useState('');
   const [isSearching, setIsSearching] = useState(false);
   const [readyStatus, setReadyStatus] = useState(0);
+  // последнее слово каждой загруженной страницы: курсор для следующей
+  const cursors = useRef([]);
 
   useEffect(() => {
     if (user) {
@@ -34,10 +36,17 @@ function SyllablesList() {
   const fetchSyllables = async (forcedPage) => {
     try {
       const currentPage = forcedPage || page;
-      const offset = (currentPage - 1) * limit;
+      if (currentPage === 1) {
+        cursors.current = [];
+      }
+      const after = cursors.current[currentPage - 2];
       const url = `${apiUrl}/syllables/search?ready=${readyStatus}&word_part=${encodeURIComponent(
         wordPart
-      )}&limit=${limit}&offset=${offset}`;
+      )}&limit=${limit}${
+        after !== undefined
+          ? `&after=${encodeURIComponent(after)}`
+          : `&offset=${(currentPage - 1) * limit}`
+      }`;
       setIsSearching(true);
       const response = await fetch(url, {
         credentials: 'include',
@@ -50,6 +59,9 @@ function SyllablesList() {
         console.log('First item:', data[0]);
       }
       setSyllables(data || []);
+      if (Array.isArray(data) && data.length > 0) {
+        cursors.current[currentPage - 1] = data[data.length - 1].word;
+      }
       // Assuming we get total count from the API in the future
       // For now, we'll just set a default total
       setTotalPages(Math.ceil(100 / limit));
@@ -0,0 +1,114 @@
+import { useState, useEffect, useRef, useCallback } from 'react';
+
+const apiUrl = process.env.REACT_APP_API_URL;
+
+// SM-2 grades sent with the reviewed card
+export const GRADE_AGAIN = 1;
+export const GRADE_GOOD = 4;
+
+const QUEUE_SIZE = 20; // cards requested per refill
+const REFILL_AT = 5; // refill when fewer cards are left
+const SYNC_AT = 10; // send answers in batches of this size
+
+/**
+ * Local queue of due cards for a learning session.
+ *
+ * Cards are prefetched in batches from `${kind}/queue`, so moving to the
+ * next card does not wait for the network. Answers are collected locally
+ * and sent to `${kind}/reviews` in batches (and when the page is hidden).
+ *
+ * kind: 'syllables' | 'phrases'; idKey: card id field name.
+ */
+export default function useReviewQueue(kind, idKey, enabled, onSynced) {
+  const [current, setCurrent] = useState(null);
+  const [loading, setLoading] = useState(true);
+  const [error, setError] = useState('');
+  const currentRef = useRef(null);
+  const onSyncedRef = useRef(onSynced);
+  onSyncedRef.current = onSynced;
+  const queue = useRef([]);
+  const pending = useRef([]); // answers not yet sent
+  const refilling = useRef(false);
+  const exhausted = useRef(false);
+
+  const show = (card) => {
+    currentRef.current = card;
+    setCurrent(card);
+  };
+
+  const sync = useCallback(async (keepalive = false) => {
+    if (!pending.current.length) return;
+    const items = pending.current;
+    pending.current = [];
+    try {
+      const res = await fetch(`${apiUrl}/${kind}/reviews`, {
+        method: 'POST',
+        credentials: 'include',
+        keepalive,
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ items }),
+      });
+      if (!res.ok) throw new Error(`Failed to send reviews: ${res.status}`);
+      if (onSyncedRef.current) onSyncedRef.current();
+    } catch (e) {
+      // keep answers for the next attempt, the server skips duplicates
+      pending.current = items.concat(pending.current);
+      console.warn(e);
+    }
+  }, [kind]);
+
+  const refill = useCallback(async () => {
+    if (refilling.current || exhausted.current) return;
+    refilling.current = true;
+    try {
+      const exclude = queue.current
+        .concat(currentRef.current ? [currentRef.current] : [])
+        .map((c) => c[idKey])
+        .concat(pending.current.map((r) => r.id));
+      const params = new URLSearchParams({ limit: String(QUEUE_SIZE) });
+      exclude.forEach((id) => params.append('exclude', String(id)));
+      const res = await fetch(`${apiUrl}/${kind}/queue?${params}`, { credentials: 'include' });
+      if (res.status === 401) throw new Error('401');
+      if (!res.ok) throw new Error('Ошибка при загрузке карточек');
+      const cards = await res.json();
+      if (cards.length < QUEUE_SIZE) exhausted.current = true;
+      queue.current = queue.current.concat(cards);
+      if (!currentRef.current) show(queue.current.shift() || null);
+      setError('');
+    } catch (e) {
+      setError(e.message);
+    } finally {
+      refilling.current = false;
+      setLoading(false);
+    }
+  }, [kind, idKey]);
+
+  const answer = useCallback((grade = GRADE_GOOD) => {
+    const card = currentRef.current;
+    if (card) {
+      pending.current.push({ id: card[idKey], grade, reviewed_at: new Date().toISOString() });
+    }
+    show(queue.current.shift() || null);
+    if (pending.current.length >= SYNC_AT) sync();
+    if (queue.current.length < REFILL_AT) {
+      // answered cards must reach the server before they can come back
+      exhausted.current = false;
+      sync().then(refill);
+    }
+  }, [idKey, sync, refill]);
+
+  useEffect(() => {
+    if (!enabled) return undefined;
+    refill();
+    const onHide = () => {
+      if (document.visibilityState === 'hidden') sync(true);
+    };
+    document.addEventListener('visibilitychange', onHide);
+    return () => {
+      document.removeEventListener('visibilitychange', onHide);
+      sync(true);
+    };
+  }, [enabled, refill, sync]);
+
+  return { current, loading, error, answer };
+}